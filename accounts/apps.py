@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from .cache import user_deleted
+        post_delete.connect(user_deleted, sender=self.get_model('CustomUser'))
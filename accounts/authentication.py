@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import acurrent_claims, current_claims, users
+from .models import CustomUser
+from ticketing_system.routers import primary_reads
+
+# Claims a token needs for ClaimsUser, besides the user id claim; see
+# CustomTokenObtainPairSerializer.add_claims().
+USER_CLAIMS = ('uid', 'email', 'role', 'is_staff', 'cv')
+
+
+def _claimed(attr, read):
+    """A ClaimsUser attribute: read from the claims until the full user is loaded"""
+    def get(self):
+        if self._wrapped is empty:
+            return read(self._claims)
+        return getattr(self._wrapped, attr)
+    return property(get)
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    The user a verified token describes, answering ``pk``, ``email``,
+    ``role``, ``is_staff``, ``is_agent`` and the authentication flags from
+    its claims until the full user is loaded. That's all permissions, ticket scoping and throttling read,
+    so most requests never load the user. JWTAuthentication only hands one
+    out while the claims match the user's current ones, active included.
+
+    Anything else (another field, a foreign key assignment, ``isinstance``)
+    loads the full user, through the users cache, the first time. Async code
+    must ``await aresolve()`` (or ``afull_user()``) before that.
+    """
+
+    def __init__(self, validated_token, load, aload):
+        self.__dict__['_claims'] = validated_token
+        self.__dict__['_aload'] = aload
+        super().__init__(load)
+
+    pk = _claimed('pk', lambda claims: claims['uid'])
+    id = _claimed('id', lambda claims: claims['uid'])
+    email = _claimed('email', lambda claims: claims['email'])
+    role = _claimed('role', lambda claims: claims['role'])
+    is_staff = _claimed('is_staff', lambda claims: claims['is_staff'])
+    is_agent = _claimed('is_agent', lambda claims: claims['role'] == CustomUser.UserRole.AGENT)
+    is_customer = _claimed('is_customer', lambda claims: claims['role'] == CustomUser.UserRole.CUSTOMER)
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+    async def aresolve(self):
+        """The full user, loaded without blocking the event loop"""
+        if self._wrapped is empty:
+            self._wrapped = await self._aload()
+        return self._wrapped
+
+
+async def afull_user(user):
+    """``request.user`` as a model instance, for async views that need one"""
+    if type(user) is ClaimsUser:
+        return await user.aresolve()
+    return user
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, with users served from the shared cache
+    (accounts.cache) instead of a query per request, plus ``aauthenticate()``
+    for async views (see ticketing_system.async_views), which doesn't block
+    the event loop.
+
+    With ``JWT_CLAIMS_AUTH`` on, tokens issued at login authenticate as a
+    ClaimsUser, so requests that only need what the token says skip the
+    user lookup. A token vouches for its user only while its claims and
+    claims version match the user's current ones (accounts.cache.claims,
+    read through from the database) and the user is active; otherwise it
+    takes the lookup, and the checks below, like tokens without those claims.
+
+    The active and password-change checks run on every lookup, against the
+    cached user as against a freshly loaded one.
+    """
+
+    def get_user(self, validated_token):
+        if self._has_user_claims(validated_token) and self._vouches(
+            validated_token, current_claims(validated_token['uid'])
+        ):
+            return self._claims_user(validated_token)
+        return self._load_user(validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """get_user() for async views"""
+        if self._has_user_claims(validated_token) and self._vouches(
+            validated_token, await acurrent_claims(validated_token['uid'])
+        ):
+            return self._claims_user(validated_token)
+        return await self._aload_user(validated_token)
+
+    def _claims_user(self, validated_token):
+        return ClaimsUser(
+            validated_token,
+            lambda: self._load_user(validated_token),
+            lambda: self._aload_user(validated_token),
+        )
+
+    def _load_user(self, validated_token):
+        user_id = self._get_user_id(validated_token)
+        user = users.get(user_id)
+        if user is None:
+            try:
+                with primary_reads():
+                    user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            users.set(user_id, user)
+        return self._check_user(user, validated_token)
+
+    async def _aload_user(self, validated_token):
+        user_id = self._get_user_id(validated_token)
+        user = await users.aget(user_id)
+        if user is None:
+            try:
+                with primary_reads():
+                    user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            await users.aset(user_id, user)
+        return self._check_user(user, validated_token)
+
+    @staticmethod
+    def _has_user_claims(validated_token):
+        return getattr(settings, 'JWT_CLAIMS_AUTH', False) and all(
+            claim in validated_token for claim in (api_settings.USER_ID_CLAIM, *USER_CLAIMS)
+        )
+
+    @staticmethod
+    def _vouches(validated_token, current):
+        # current: accounts.cache.CURRENT_CLAIMS, None for a deleted user.
+        claimed = tuple(validated_token[claim] for claim in ('cv', 'email', 'role', 'is_staff'))
+        return current is not None and current == (*claimed, True)
+
+    @staticmethod
+    def _get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    @staticmethod
+    def _check_user(user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
@@ -0,0 +1,57 @@
+"""
+JWT authentication state in the shared cache (see ticketing_system.cache):
+
+- ``users``: users loaded by accounts.authentication, keyed by the token's
+  user id claim. CustomUser.save() and user_deleted() invalidate them.
+- ``claims``: what tokens may currently claim about a user
+  (``CURRENT_CLAIMS``), keyed by pk and read through from the database. A
+  token vouches for its user on its own only while its claims match (see
+  accounts.authentication.ClaimsUser). The record of truth is the user's
+  ``claims_version`` column, bumped whenever a claimed field changes, so an
+  evicted or cleared entry costs a query, never a stale claim.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+from ticketing_system.cache import Namespace
+from ticketing_system.routers import primary_reads
+
+users = Namespace('users')
+claims = Namespace('claims')
+
+# The fields tokens make claims about (see CustomTokenObtainPairSerializer),
+# plus the password, whose change also invalidates the user's sessions.
+CLAIM_FIELDS = ('email', 'role', 'is_staff', 'is_active', 'password')
+# What the ``claims`` namespace holds per user.
+CURRENT_CLAIMS = ('claims_version', 'email', 'role', 'is_staff', 'is_active')
+
+
+def current_claims(pk):
+    """User ``pk``'s CURRENT_CLAIMS values, or None if there's no such user"""
+    values = claims.get(pk)
+    if values is None:
+        with primary_reads():
+            values = _current_claims(pk).first()
+        if values is not None:
+            claims.set(pk, values)
+    return values
+
+
+async def acurrent_claims(pk):
+    """current_claims() for async views"""
+    values = await claims.aget(pk)
+    if values is None:
+        with primary_reads():
+            values = await _current_claims(pk).afirst()
+        if values is not None:
+            await claims.aset(pk, values)
+    return values
+
+
+def user_deleted(sender, instance, using, **kwargs):
+    """post_delete receiver for the user model"""
+    users.invalidate([getattr(instance, api_settings.USER_ID_FIELD)], using=using)
+    claims.invalidate([instance.pk], using=using)
+
+
+def _current_claims(pk):
+    return get_user_model().objects.filter(pk=pk).values_list(*CURRENT_CLAIMS)
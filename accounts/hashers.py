@@ -0,0 +1,211 @@
+"""
+Password hashing on a bounded pool.
+
+PBKDF2 is meant to be slow; a login storm would otherwise have every
+worker thread hashing at once and starve the requests that share their
+CPUs. PBKDF2PasswordHasher below runs each hash (logins, registrations,
+password changes, rehashes) on a pool of ``WORKERS`` threads per process
+(hashlib releases the GIL, so threads hash in parallel), with at most
+``QUEUE_SIZE`` more waiting; beyond that an API request fails fast with a
+503 (HashingBusy, see ticketing_system.exceptions) instead of piling up.
+Other callers (the admin's login, management commands) wait their turn:
+HashingMiddleware tells them apart.
+
+``ITERATIONS`` sets the cost. Django rehashes a password with other
+parameters the next time its owner logs in, so raising it needs no
+migration.
+
+Each process publishes its pool's counters to the shared cache;
+``manage.py hashing_stats`` lists them.
+"""
+import contextvars
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher as BasePBKDF2PasswordHasher
+from django.core.cache import cache
+from rest_framework.views import APIView
+
+DEFAULTS = {
+    # PBKDF2 iterations; 0 keeps Django's default.
+    'ITERATIONS': 0,
+    # Hashes computed at once by each process.
+    'WORKERS': max(1, (os.cpu_count() or 2) // 2),
+    # Hashes waiting for a worker before new ones are refused; None: no limit.
+    'QUEUE_SIZE': 64,
+}
+
+# Seconds between two publications of a process's counters, and how long
+# they outlive it.
+PUBLISH_INTERVAL = 1
+STATS_TIMEOUT = 60
+PROCESSES_KEY = 'stats:hashing:processes'
+
+# The request being handled, set by HashingMiddleware.
+_request = contextvars.ContextVar('hashing_request', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full"""
+
+
+class HashingPool:
+    """A fixed number of hashing threads, a bounded wait for them, and counters"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._rejected = 0
+        self._waited = 0.0
+        self._published = float('-inf')
+
+    def run(self, func, *args):
+        """
+        ``func(*args)`` on a hashing thread. With the queue full, raises
+        HashingBusy in an API request; other callers wait.
+        """
+        with self._lock:
+            full = self.queue_size is not None and self._pending >= self.workers + self.queue_size
+            if full and fails_fast():
+                self._rejected += 1
+                raise HashingBusy()
+            self._pending += 1
+            self._peak_queued = max(self._peak_queued, self._pending - self.workers)
+        submitted = time.monotonic()
+
+        def task():
+            started = time.monotonic()
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    self._completed += 1
+                    self._waited += started - submitted
+
+        try:
+            return self._executor.submit(task).result()
+        finally:
+            self._publish()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'in_flight': min(self._pending, self.workers),
+                'queued': max(self._pending - self.workers, 0),
+                'peak_queued': self._peak_queued,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'mean_wait': self._waited / self._completed if self._completed else 0.0,
+            }
+
+    def _publish(self):
+        now = time.monotonic()
+        if now - self._published < PUBLISH_INTERVAL:
+            return
+        self._published = now
+        try:
+            cache.set(f'stats:hashing:{self.name}', self.stats(), STATS_TIMEOUT)
+            processes = cache.get(PROCESSES_KEY, set())
+            if self.name not in processes:
+                cache.set(PROCESSES_KEY, processes | {self.name}, None)
+        except Exception:
+            # Metrics are best effort; never fail a login over them.
+            pass
+
+
+class HashingMiddleware:
+    """Note the request being handled, so the pool can refuse API requests' hashes rather than queue them"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def fails_fast():
+    """True in an API request, whose exception handler answers HashingBusy with a 503"""
+    request = _request.get()
+    match = request.resolver_match if request is not None else None
+    return match is not None and issubclass(getattr(match.func, 'cls', type), APIView)
+
+
+def published_stats():
+    """``{process: stats}`` for every process that hashed in the last STATS_TIMEOUT seconds"""
+    processes = cache.get(PROCESSES_KEY, set())
+    stats = cache.get_many([f'stats:hashing:{name}' for name in processes])
+    live = {key.removeprefix('stats:hashing:'): value for key, value in stats.items()}
+    if set(live) != processes:
+        cache.set(PROCESSES_KEY, set(live), None)
+    return live
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _forget_pool():
+    # A forked child (a preloading server's worker, a provisioning process)
+    # inherits the pool but not its threads: build its own.
+    global _pool, _lock
+    _pool = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def get_pool():
+    """The process-wide HashingPool, built from ``settings.PASSWORD_HASHING``"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                options = get_options()
+                _pool = HashingPool(options['WORKERS'], options['QUEUE_SIZE'])
+    return _pool
+
+
+class PBKDF2PasswordHasher(BasePBKDF2PasswordHasher):
+    """Django's PBKDF2 hasher, run on the hashing pool at the configured cost"""
+
+    @property
+    def iterations(self):
+        return get_options()['ITERATIONS'] or BasePBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        return get_pool().run(super().encode, password, salt, iterations)
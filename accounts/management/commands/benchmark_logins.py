@@ -0,0 +1,135 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts import hashers
+from accounts.hashers import HashingPool
+from accounts.models import CustomUser
+from accounts.views import LoginView
+from tickets.models import Ticket
+from tickets.views import TicketViewSet
+
+PASSWORD = 'Sup3r-secret!'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure ticket list latency while concurrent logins saturate password "
+        "hashing: without logins, with a hashing thread per login (no cap) and "
+        "with the capped pool (accounts.hashers). Runs on a scratch test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=8,
+            help='Threads logging in back to back (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=2,
+            help='Threads listing tickets meanwhile (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=hashers.get_options()['WORKERS'],
+            help='Hashing threads in the capped run (default: PASSWORD_HASHING, %(default)s).',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5,
+            help='Seconds per run (default: %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        # Never touch the real data: seed a throwaway test database.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        old_pool = hashers._pool
+        try:
+            token = self._seed()
+            runs = (
+                ('no logins', 0, None),
+                ('uncapped', options['logins'], options['logins']),
+                ('capped', options['logins'], options['workers']),
+            )
+            for label, logins, workers in runs:
+                hashers._pool = HashingPool(workers or 1, queue_size=None)
+                result = self._run(token, logins, options['readers'], options['duration'])
+                self.stdout.write(
+                    f'{label:<10}{workers or "-":>4} hashing threads   '
+                    f'logins {result["logins"]:>6.1f}/s   '
+                    f'ticket list p50 {result["p50"]:>7.1f} ms  p95 {result["p95"]:>7.1f} ms'
+                )
+        finally:
+            hashers._pool = old_pool
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _seed(self):
+        user = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=make_password(PASSWORD),
+        )
+        Ticket.objects.bulk_create([
+            Ticket(user=user, title=f'Printer issue {i}', description='The printer is jammed again.')
+            for i in range(200)
+        ])
+        return str(AccessToken.for_user(user))
+
+    def _run(self, token, logins, readers, duration):
+        factory = RequestFactory()
+        # Throttling would cut the runs short.
+        login = LoginView.as_view(throttle_classes=())
+        ticket_list = TicketViewSet.as_view({'get': 'list'}, throttle_classes=())
+        deadline = time.monotonic() + duration
+        latencies = []
+        completed = []
+
+        def log_in():
+            while time.monotonic() < deadline:
+                request = factory.post(
+                    '/api/v1/accounts/login/', {'email': 'customer@example.com', 'password': PASSWORD},
+                    content_type='application/json',
+                )
+                login(request).render()
+                completed.append(1)
+
+        def read():
+            while time.monotonic() < deadline:
+                request = factory.get('/api/v1/tickets/', headers={'Authorization': f'Bearer {token}'})
+                started = time.perf_counter()
+                ticket_list(request).render()
+                latencies.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=_closing(log_in)) for _ in range(logins)]
+        threads += [threading.Thread(target=_closing(read)) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        latencies.sort()
+        return {
+            'logins': len(completed) / duration,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        }
+
+
+def _closing(func):
+    """Run ``func``, then close the thread's database connections"""
+    def run():
+        try:
+            func()
+        finally:
+            connections.close_all()
+    return run
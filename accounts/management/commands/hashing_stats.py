@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from accounts.hashers import STATS_TIMEOUT, published_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the password-hashing pool of every process that hashed in the "
+        f"last {STATS_TIMEOUT} seconds: queue depth, throughput and rejections."
+    )
+
+    def handle(self, *args, **options):
+        stats = published_stats()
+        if not stats:
+            self.stdout.write('No process has hashed a password recently.')
+        for process, values in sorted(stats.items()):
+            self.stdout.write(
+                f"{process:<30}{values['workers']:>3} workers   "
+                f"{values['in_flight']:>3} hashing   {values['queued']:>4} queued "
+                f"(peak {values['peak_queued']:>4})   {values['completed']:>8} done   "
+                f"{values['rejected']:>6} refused   mean wait {values['mean_wait'] * 1000:>7.1f} ms"
+            )
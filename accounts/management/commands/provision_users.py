@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from accounts.provisioning import FORMATS, UserImporter, init_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from an NDJSON or CSV file, validating and hashing "
+        "passwords across processes. Users whose email exists are skipped, so an "
+        "interrupted run is resumed by running it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import, or "-" for stdin.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: from the file extension, else ndjson).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=UserImporter.batch_size,
+            help='Users per bulk insert transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes hashing passwords (default: one per CPU, %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'ndjson')
+        started = time.monotonic()
+        stream = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        with stream, ProcessPoolExecutor(options['processes'], initializer=init_worker) as executor:
+            importer = UserImporter(
+                format,
+                batch_size=options['batch_size'],
+                map=partial(executor.map, chunksize=8),
+                using=options['database'],
+            )
+            for result in importer.run(stream):
+                if 'batch' in result:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(json.dumps(result))
+                elif 'summary' in result:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Created {importer.created} users in {elapsed:.1f}s "
+                        f"({importer.created / max(elapsed, 1e-9):.0f} users/s), "
+                        f"skipped {importer.skipped} existing, {importer.errors} errors."
+                    ))
+                else:
+                    self.stderr.write(json.dumps(result, default=str))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import CustomUser
+from accounts.revocation import store
+
+
+class Command(BaseCommand):
+    help = (
+        "Revoke every session (refresh token) of the given users. Their "
+        "access tokens stay valid until they expire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('emails', nargs='+', help='Emails of the users to sign out.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(email__in=options['emails'])
+        missing = set(options['emails']) - {user.email for user in users}
+        if missing:
+            raise CommandError(f"No user with email {', '.join(sorted(missing))}.")
+        for user in users:
+            store.revoke_user(user)
+            self.stdout.write(f'Revoked every session of {user.email}.')
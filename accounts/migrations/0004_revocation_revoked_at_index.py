@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usernamesequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='revocation',
+            name='revoked_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
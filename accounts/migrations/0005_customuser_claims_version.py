@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_revocation_revoked_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
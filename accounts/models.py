@@ -2,9 +2,28 @@ from typing import Any, Optional
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.auth.password_validation import validate_password
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.settings import api_settings
+from .cache import CLAIM_FIELDS, claims, users
 
-class CustomUserManager(BaseUserManager):
+class CustomUserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Update, and, if a claimed field is set, void the tokens issued so far
+        to the users updated (see CustomUser.save()).
+        """
+        if not set(CLAIM_FIELDS) & kwargs.keys():
+            return super().update(**kwargs)
+        rows = list(self.values_list('pk', api_settings.USER_ID_FIELD))
+        count = super().update(**kwargs, claims_version=F('claims_version') + 1)
+        users.invalidate({user_id for _, user_id in rows}, using=self.db)
+        claims.invalidate({pk for pk, _ in rows}, using=self.db)
+        return count
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     """
     Custom user model manager where email is the unique identifier
     for authentication instead of usernames.
@@ -18,30 +37,25 @@ class CustomUserManager(BaseUserManager):
         if not password:
             raise ValueError(_('A password must be provided'))
             
+        from .usernames import allocate
+
         email = self.normalize_email(email)
-        base_username = email.split('@')[0]
-
-        # Optimize unique username generation:
-        # Retrieve all usernames that start with the base_username in one query.
-        existing_usernames = set(
-            self.model.objects.filter(username__startswith=base_username)
-            .values_list('username', flat=True)
-        )
-        username = base_username
-        counter = 1
-        while username in existing_usernames:
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        # Create the user instance with the generated unique username.
-        user = self.model(email=email, username=username, **extra_fields)
+        base = email.split('@')[0]
+        user = self.model(email=email, username=base, **extra_fields)
         
         # Validate the password using Django's password validators.
         validate_password(password, user)
         
         user.set_password(password)
-        user.save(using=self._db)
-        return user
+
+        def save(usernames):
+            user.username = usernames[0]
+            user.save(using=self._db)
+            return user
+
+        # A unique username in a constant number of queries however common
+        # the email's local part is; see accounts.usernames.
+        return allocate([base], using=self._db, write=save)
 
     def create_superuser(self, email: str, password: Optional[str] = None, **extra_fields: Any) -> "CustomUser":
         """
@@ -84,6 +98,10 @@ class CustomUser(AbstractUser):
         default=True,
         help_text=_('Designates whether this user account is active.')
     )
+
+    # Bumped whenever a claimed field changes: tokens carrying an older
+    # version no longer vouch for the user (accounts.authentication).
+    claims_version = models.PositiveIntegerField(default=0, editable=False)
     
     # Rely on AbstractUser for:
     # - first_name
@@ -94,6 +112,43 @@ class CustomUser(AbstractUser):
     def __str__(self) -> str:
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # The key JWT authentication caches this user under; see save().
+        user._cached_as = user.__dict__.get(api_settings.USER_ID_FIELD)
+        # What its tokens claim about it; see save().
+        user._claimed = user._claim_values()
+        return user
+
+    def save(self, *args, **kwargs):
+        """
+        Save, and drop the copy JWT authentication cached (under the old id
+        too, if it changed). If a claimed field changed, bump
+        ``claims_version``, so tokens issued so far stop vouching for the
+        user (accounts.cache.claims).
+        """
+        claimed = self._claim_values()
+        changed = not self._state.adding and getattr(self, '_claimed', claimed) != claimed
+        if changed:
+            self.claims_version = F('claims_version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'claims_version'}
+        super().save(*args, **kwargs)
+        if changed:
+            # Reloaded when next read.
+            del self.__dict__['claims_version']
+        user_id = getattr(self, api_settings.USER_ID_FIELD)
+        users.invalidate({user_id, getattr(self, '_cached_as', user_id)}, using=self._state.db)
+        if changed:
+            claims.invalidate([self.pk], using=self._state.db)
+        self._cached_as = user_id
+        self._claimed = claimed
+
+    def _claim_values(self):
+        # From __dict__, so deferred fields aren't loaded.
+        return tuple(self.__dict__.get(field) for field in CLAIM_FIELDS)
+
     @property
     def is_customer(self) -> bool:
         """Return True if the user's role is CUSTOMER."""
@@ -121,3 +176,28 @@ class CustomUser(AbstractUser):
             models.Index(fields=['role']),
             # The unique 'username' field is automatically indexed.
         ]
+
+
+class UsernameSequence(models.Model):
+    """The highest numeric suffix handed out for a username base (accounts.usernames)"""
+    base = models.CharField(max_length=150, unique=True)
+    last = models.IntegerField()
+
+    def __str__(self) -> str:
+        return f'{self.base}: {self.last}'
+
+
+class Revocation(models.Model):
+    """
+    A revoked refresh token (``jti``), or, without a jti, every session
+    ``user`` started up to ``revoked_at``. Checked through
+    accounts.revocation, and worthless once ``expires_at`` passes: by then
+    the tokens it covers have expired too.
+    """
+    jti = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='revocations')
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return self.jti or f'all sessions of {self.user_id}'
@@ -0,0 +1,196 @@
+"""
+Bulk user provisioning from NDJSON or CSV.
+
+Each NDJSON line, or CSV row under a header line, is one user:
+
+    {"email": "...", "name": "...", "password": "...", "role": "CUSTOMER"}
+
+``name`` (split like RegisterSerializer does) may be given as
+``first_name``/``last_name`` instead; ``name``, ``password`` and ``role``
+are optional. Users without a password get an unusable one (they can be
+sent a reset link).
+
+Records are processed ``batch_size`` at a time: validated, checked against
+existing emails with one query, their passwords validated and hashed by
+``map`` (a process pool's, to spread PBKDF2 over every core), given
+usernames in bulk (accounts.usernames) and written with ``bulk_create`` in
+one transaction per batch. Invalid records are reported and skipped.
+
+Users whose email already exists are skipped, before any hashing, so an
+interrupted import is resumed by running it again on the same file.
+"""
+import csv
+import json
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .models import CustomUser
+from .usernames import allocate
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ProvisionedUserSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    name = serializers.CharField(required=False, allow_blank=True)
+    first_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    last_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    password = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    role = serializers.ChoiceField(choices=CustomUser.UserRole.choices, default=CustomUser.UserRole.CUSTOMER)
+
+    def validate(self, attrs):
+        name = attrs.pop('name', '')
+        if name and not (attrs.get('first_name') or attrs.get('last_name')):
+            names = name.split(' ', 1)
+            attrs['first_name'] = names[0]
+            attrs['last_name'] = names[1] if len(names) > 1 else ''
+        attrs['email'] = CustomUser.objects.normalize_email(attrs['email'])
+        return attrs
+
+
+def hash_password(user):
+    """
+    ``(hash, None)`` for a ``(password, email, first_name, last_name)``
+    tuple, or ``(None, [errors])`` if the password fails validation. Runs in
+    pool processes, so it takes and returns plain values.
+    """
+    password, email, first_name, last_name = user
+    try:
+        validate_password(password, CustomUser(email=email, first_name=first_name, last_name=last_name))
+    except DjangoValidationError as exc:
+        return None, exc.messages
+    return make_password(password), None
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer, for start methods that don't fork"""
+    if not apps.ready:
+        django.setup()
+
+
+class UserImporter:
+    """
+    Provision users from ``lines`` of NDJSON or CSV. ``run()`` yields one
+    result dict per rejected record, one per committed batch and a final
+    summary, so callers can stream the report.
+    """
+    batch_size = 1000
+
+    def __init__(self, format='ndjson', batch_size=None, map=map, using=None):
+        if format not in FORMATS:
+            raise ValueError(f'Unknown format {format!r}.')
+        self.format = format
+        self.batch_size = batch_size or self.batch_size
+        self.map = map
+        self.using = using
+        self.created = 0
+        self.skipped = 0
+        self.errors = 0
+        self._serializer = ProvisionedUserSerializer()
+
+    def run(self, lines):
+        batch = []
+        for number, record in self._records(lines):
+            batch.append((number, record))
+            if len(batch) >= self.batch_size:
+                yield from self._process_batch(batch)
+                batch = []
+        if batch:
+            yield from self._process_batch(batch)
+        yield {'summary': {'created': self.created, 'skipped': self.skipped, 'errors': self.errors}}
+
+    def _records(self, lines):
+        """``(line number, record or error string)`` for each non-blank line"""
+        lines = (line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line for line in lines)
+        if self.format == 'csv':
+            reader = csv.DictReader(lines)
+            for row in reader:
+                if any(row.values()):
+                    yield reader.line_num, {key: value for key, value in row.items() if value not in (None, '')}
+            return
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                record = f'Invalid JSON: {exc}'
+            yield number, record if isinstance(record, (dict, str)) else 'Expected an object.'
+
+    def _process_batch(self, batch):
+        users, errors = [], []
+        for number, record in batch:
+            if isinstance(record, str):
+                errors.append({'line': number, 'error': record})
+                continue
+            try:
+                users.append((number, self._serializer.run_validation(record)))
+            except ValidationError as exc:
+                errors.append({'line': number, 'error': exc.detail})
+
+        existing = set(
+            CustomUser.objects.using(self.using).order_by()
+            .filter(email__in=[user['email'] for _, user in users]).values_list('email', flat=True)
+        )
+        new, seen = [], set()
+        skipped = 0
+        for number, user in users:
+            if user['email'] in existing:
+                skipped += 1
+            elif user['email'] in seen:
+                errors.append({'line': number, 'error': {'email': 'Repeated within the batch.'}})
+            else:
+                seen.add(user['email'])
+                new.append((number, user))
+
+        hashes = self.map(hash_password, [
+            (user['password'], user['email'], user.get('first_name', ''), user.get('last_name', ''))
+            for _, user in new if user.get('password')
+        ])
+        valid = []
+        for number, user in new:
+            if user.get('password'):
+                password, problems = next(hashes)
+                if problems:
+                    errors.append({'line': number, 'error': {'password': problems}})
+                    continue
+            else:
+                password = make_password(None)
+            valid.append(CustomUser(
+                email=user['email'],
+                first_name=user.get('first_name', ''),
+                last_name=user.get('last_name', ''),
+                role=user['role'],
+                password=password,
+            ))
+
+        created = 0
+        if valid:
+            try:
+                created = self._write(valid)
+            except DatabaseError as exc:
+                lines = [number for number, _ in new]
+                errors.append({'lines': lines, 'error': f'Batch not written: {exc}'})
+
+        self.errors += len(errors)
+        self.skipped += skipped
+        self.created += created
+        errors.sort(key=lambda error: error.get('line', 0))
+        yield from errors
+        yield {'batch': {'lines': [batch[0][0], batch[-1][0]], 'created': created, 'skipped': skipped}}
+
+    def _write(self, users):
+        def create(usernames):
+            for user, username in zip(users, usernames):
+                user.username = username
+            CustomUser.objects.using(self.using).bulk_create(users)
+            return len(users)
+
+        return allocate([user.email.split('@')[0] for user in users], using=self.using, write=create)
+
@@ -0,0 +1,199 @@
+"""
+Refresh-token revocation, checked without a query per refresh.
+
+Revocations are rows of accounts.models.Revocation: one per revoked token
+(by ``jti``), and one per "revoke every session of this user". Each process
+mirrors the live ones in memory:
+
+- revoked jtis in a Bloom filter, so an unrevoked token (nearly every
+  refresh) is answered from memory; a hit is confirmed against the table,
+  since the filter has rare false positives,
+- per-user cut-offs in a dict, keyed like the token's user id claim.
+
+The mirror picks up other processes' revocations at most ``SYNC_INTERVAL``
+seconds late, with one query for the rows revoked since the last sync. Ids
+and ``revoked_at`` are both set before the row commits, so a transaction
+that commits late can land behind rows already seen: each sync re-reads the
+last ``SYNC_OVERLAP`` seconds and skips the rows it already has. A token
+refreshed twice within that window is still caught: rotating it inserts its
+jti, which is unique. Every ``REBUILD_INTERVAL`` the filter is rebuilt from
+the rows that haven't expired and the expired ones deleted, so neither grows
+without bound.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .models import CustomUser, Revocation
+
+DEFAULTS = {
+    # Revoked tokens the filter is sized for before it's rebuilt larger.
+    'CAPACITY': 100_000,
+    # False positive rate at capacity (each costs one confirming query).
+    'ERROR_RATE': 0.001,
+    # Seconds before other processes' revocations are picked up.
+    'SYNC_INTERVAL': 1,
+    # Seconds of revocations each sync reads again, for the ones committed
+    # late (and clock skew between processes).
+    'SYNC_OVERLAP': 60,
+    # Seconds between rebuilds, which also drop expired revocations.
+    'REBUILD_INTERVAL': 3600,
+}
+
+
+class BloomFilter:
+    """Set membership in constant time and space, with false positives at ``error_rate``"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, value):
+        for index in self._indexes(value):
+            self.bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(value))
+
+    def _indexes(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+
+class RevocationStore:
+    """The process's mirror of the revocation table"""
+
+    def __init__(self, **options):
+        self.options = {**DEFAULTS, **getattr(settings, 'TOKEN_REVOCATION', {}), **options}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the mirror; the next check reloads it"""
+        with self._lock:
+            self._filter = None
+            self._sessions = {}
+            self._seen = {}
+            self._watermark = None
+            self._synced = self._built = float('-inf')
+
+    def is_revoked(self, token):
+        """Whether refresh ``token`` (validated) was revoked, by jti or with its user's sessions"""
+        self._sync()
+        if self._session_revoked(token):
+            return True
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is None or jti not in self._filter:
+            return False
+        return Revocation.objects.filter(jti=jti).exists()
+
+    def revoke(self, token):
+        """
+        Revoke refresh ``token``. Returns False if it already was, which,
+        for a token just checked, means another request rotated it first.
+        """
+        # Login tokens carry the user's pk (see CustomTokenObtainPairSerializer).
+        user_pk = token.get('uid')
+        if user_pk is None:
+            user_pk = CustomUser.objects.values_list('pk', flat=True).get(
+                **{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]}
+            )
+        try:
+            with transaction.atomic():
+                revocation = Revocation.objects.create(
+                    jti=token[api_settings.JTI_CLAIM],
+                    user_id=user_pk,
+                    expires_at=_datetime(token['exp']),
+                )
+        except IntegrityError:
+            return False
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(revocation.jti)
+                self._seen[revocation.pk] = revocation.revoked_at
+        return True
+
+    def revoke_user(self, user):
+        """Revoke every session ``user`` has started so far, at the cost of one row"""
+        revocation = Revocation.objects.create(
+            user=user,
+            expires_at=timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME,
+        )
+        with self._lock:
+            self._add_session(getattr(user, api_settings.USER_ID_FIELD), revocation.revoked_at)
+
+    def _session_revoked(self, token):
+        revoked_at = self._sessions.get(token.get(api_settings.USER_ID_CLAIM))
+        if revoked_at is None:
+            return False
+        # Sessions date from the login (kept through rotation), else from
+        # the token itself.
+        started = token.get('auth_time', token.get('iat'))
+        return started is None or started <= revoked_at
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._synced < self.options['SYNC_INTERVAL']:
+            return
+        with self._lock:
+            if now - self._built >= self.options['REBUILD_INTERVAL'] or (
+                self._filter.count >= self._filter.capacity
+            ):
+                self._rebuild()
+                self._built = now
+            else:
+                overlap = timedelta(seconds=self.options['SYNC_OVERLAP'])
+                self._load(Revocation.objects.filter(revoked_at__gte=self._watermark - overlap))
+            self._synced = now
+
+    def _rebuild(self):
+        Revocation.objects.filter(expires_at__lte=timezone.now()).delete()
+        live = Revocation.objects.all()
+        count = live.count()
+        capacity = self.options['CAPACITY']
+        while capacity <= count * 2:
+            capacity *= 2
+        self._filter = BloomFilter(capacity, self.options['ERROR_RATE'])
+        self._sessions = {}
+        self._seen = {}
+        self._watermark = timezone.now()
+        self._load(live)
+
+    def _load(self, revocations):
+        rows = revocations.filter(expires_at__gt=timezone.now()).values_list(
+            'id', 'jti', f'user__{api_settings.USER_ID_FIELD}', 'revoked_at',
+        ).order_by('revoked_at')
+        for pk, jti, user_id, revoked_at in rows.iterator():
+            if pk in self._seen:
+                continue
+            if jti is None:
+                self._add_session(user_id, revoked_at)
+            else:
+                self._filter.add(jti)
+            self._seen[pk] = revoked_at
+            self._watermark = max(self._watermark, revoked_at)
+        # Only the rows the next sync reads again need remembering.
+        horizon = self._watermark - timedelta(seconds=self.options['SYNC_OVERLAP'])
+        self._seen = {pk: revoked_at for pk, revoked_at in self._seen.items() if revoked_at >= horizon}
+
+    def _add_session(self, user_id, revoked_at):
+        revoked_at = revoked_at.timestamp()
+        self._sessions[user_id] = max(self._sessions.get(user_id, revoked_at), revoked_at)
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+store = RevocationStore()
@@ -2,8 +2,15 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 from .models import CustomUser
+from .revocation import store
+from .tokens import RefreshToken
 
 class UserSerializer(serializers.ModelSerializer):
     # Return full name from first_name and last_name
@@ -61,6 +68,8 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data['user'] = UserSerializer(self.user).data
@@ -69,10 +78,76 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
+        cls.add_claims(token, user)
+        # Rotation keeps auth_time (see accounts.revocation).
+        token['auth_time'] = token.current_time.timestamp()
+        return token
+
+    @staticmethod
+    def add_claims(token, user):
+        """
+        Claim what the requests that don't need the user row read (see
+        accounts.authentication.ClaimsUser), as of ``claims_version``
+        """
         token['email'] = user.email
         token['is_staff'] = user.is_staff
         token['is_agent'] = user.is_agent
-        return token
+        token['uid'] = user.pk
+        token['role'] = user.role
+        token['cv'] = user.claims_version
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Refresh (and rotate) tokens, refusing revoked ones (see
+    accounts.revocation). Login tokens get their user claims from the user
+    as it is now, not from the refresh token.
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            user = CustomUser.objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        except (KeyError, CustomUser.DoesNotExist):
+            # Deleted, or its email (the user id claim) changed since.
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if 'uid' in refresh:
+            CustomTokenObtainPairSerializer.add_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+    everywhere = serializers.BooleanField(
+        default=False,
+        help_text=_('Revoke every session of the user, not just this one.'),
+    )
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if attrs['everywhere']:
+            try:
+                user = CustomUser.objects.only('pk', api_settings.USER_ID_FIELD).get(
+                    **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+                )
+            except CustomUser.DoesNotExist:
+                raise TokenError(_('User not found'))
+            store.revoke_user(user)
+        else:
+            store.revoke(refresh)
+        return {}
 
 
 class LoginSerializer(serializers.Serializer):
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from .hashers import HashingBusy, HashingPool, fails_fast
+from .models import CustomUser, Revocation
+from .revocation import BloomFilter, store
+from .usernames import allocate as allocate_usernames
+from .serializers import CustomTokenObtainPairSerializer
+from .tokens import RefreshToken
+from .views import UserDetailAsyncView
+
+
+class AccountQueryBudgetTests(APITestCase):
+    """Query budgets for the account endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', password=password,
+            is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        CustomUser.objects.bulk_create([
+            CustomUser(email=f'customer{i}@example.com', username=f'customer{i}', password=password)
+            for i in range(100)
+        ])
+
+    def setUp(self):
+        # Cached users and tickets are keyed by ids the test database reuses.
+        cache.clear()
+
+    def test_me(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-detail'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_me_async(self):
+        # Only the user lookup for the bearer token.
+        request = AsyncRequestFactory().get(
+            '/api/v1/accounts/me/', headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        )
+        with self.assertNumQueries(1):
+            response = async_to_sync(UserDetailAsyncView.as_view())(request)
+        self.assertEqual(response.data['email'], self.admin.email)
+
+    def test_authentication_uses_cached_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        self.client.get(reverse('user-detail'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-detail'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Saving the user drops the copy cached under the old email, so the
+        # token issued for it stops working.
+        response = self.client.patch(reverse('user-detail'), {'email': 'root@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('user-detail'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def claims_credentials(self, user):
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_authentication_from_claims(self):
+        self.claims_credentials(self.admin)
+        # The user's current claims, read through the cache once.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # From then on the claims are enough for the admin check: only the list itself.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The profile needs the user row.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-detail'))
+        self.assertEqual(response.data['email'], self.admin.email)
+
+        # Deactivating the user voids the claims of the tokens issued so far,
+        # which then go through the lookup and its checks.
+        self.admin.is_active = False
+        self.admin.save()
+        response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_demotion_outlives_the_cache(self):
+        self.claims_credentials(self.admin)
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_200_OK)
+        self.admin.role, self.admin.is_staff = CustomUser.UserRole.CUSTOMER, False
+        self.admin.save()
+        # Evicted or cleared, the cache no longer knows: the database does.
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_queryset_updates_void_claims(self):
+        self.claims_credentials(self.admin)
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_200_OK)
+        CustomUser.objects.filter(pk=self.admin.pk).update(role=CustomUser.UserRole.CUSTOMER, is_staff=False)
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_403_FORBIDDEN)
+        CustomUser.objects.filter(pk=self.admin.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_of_other_writes_are_checked(self):
+        # A write that skipped the version bump still can't vouch for a
+        # deactivated user once its cache entry is gone.
+        self.claims_credentials(self.admin)
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_200_OK)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {CustomUser._meta.db_table} SET is_active = %s WHERE id = %s', [False, self.admin.pk])
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_list(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_register(self):
+        # Email uniqueness check; username allocation in a savepoint (bump
+        # the sequence, read it, create it for a new base, check the
+        # candidate); insert.
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('register'), {
+                'email': 'new.user@example.com',
+                'password': 'Sup3r-secret!',
+                'password2': 'Sup3r-secret!',
+                'name': 'New User',
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_register_with_a_common_prefix(self):
+        # Usernames the allocator never handed out, sharing the prefix.
+        CustomUser.objects.bulk_create([
+            CustomUser(email=f'info{i}@example.net', username=f'info{i}' if i else 'info')
+            for i in range(200)
+        ])
+        user = CustomUser.objects.create_user('info@example.com', 'Sup3r-secret!')
+        self.assertEqual(user.username, 'info200')
+        # The sequence has moved past them: the next one takes no detour.
+        with self.assertNumQueries(6):
+            user = CustomUser.objects.create_user('info@example.org', 'Sup3r-secret!')
+        self.assertEqual(user.username, 'info255')
+
+    def test_register_when_another_base_takes_the_username(self):
+        from collections import deque
+        from . import usernames
+
+        CustomUser.objects.create_user('info@example.com', 'Sup3r-secret!')
+        CustomUser.objects.create_user('info@example.org', 'Sup3r-secret!')
+        # 'info' + 2 is allocated while a registration for the base 'info2'
+        # commits first.
+        CustomUser.objects.bulk_create([CustomUser(email='info2@example.com', username='info2')])
+        allocate = usernames._allocate
+        calls = []
+
+        def race(counts, using):
+            calls.append(counts)
+            return {'info': deque(['info2'])} if len(calls) == 1 else allocate(counts, using)
+
+        with mock.patch.object(usernames, '_allocate', side_effect=race):
+            user = CustomUser.objects.create_user('info@example.net', 'Sup3r-secret!')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(user.username, 'info3')
+        self.assertEqual(CustomUser.objects.filter(email='info@example.net').count(), 1)
+
+    def test_register_a_taken_email(self):
+        from . import usernames
+
+        CustomUser.objects.create_user('info@example.com', 'Sup3r-secret!')
+        # Only a username conflict is worth another allocation.
+        with mock.patch.object(usernames, '_allocate', wraps=usernames._allocate) as allocate:
+            with self.assertRaises(IntegrityError):
+                CustomUser.objects.create_user('info@example.com', 'Sup3r-secret!')
+        self.assertEqual(allocate.call_count, 1)
+
+    def test_allocate_usernames_in_bulk(self):
+        self.assertEqual(allocate_usernames(['sam', 'sam', 'sam2', 'kim']), ['sam', 'sam1', 'sam2', 'kim'])
+        CustomUser.objects.bulk_create([CustomUser(email='sam@example.com', username='sam2')])
+        self.assertEqual(allocate_usernames(['sam']), ['sam3'])
+
+    def test_login(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('login'), {
+                'email': 'admin@example.com', 'password': 'Sup3r-secret!',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_rehashes_at_the_configured_cost(self):
+        with self.settings(PASSWORD_HASHING={'ITERATIONS': 1000}):
+            self.admin.set_password('Sup3r-secret!')
+            self.admin.save()
+        with self.settings(PASSWORD_HASHING={'ITERATIONS': 2000}):
+            response = self.client.post(reverse('login'), {
+                'email': 'admin@example.com', 'password': 'Sup3r-secret!',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_login_when_hashing_is_saturated(self):
+        with mock.patch.object(HashingPool, 'run', side_effect=HashingBusy):
+            response = self.client.post(reverse('login'), {
+                'email': 'admin@example.com', 'password': 'Sup3r-secret!',
+            })
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_hashing_pool_is_bounded(self):
+        pool = HashingPool(workers=1, queue_size=1)
+        release = threading.Event()
+        waiters = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+        for waiter in waiters:
+            waiter.start()
+        while pool.stats()['queued'] < 1:
+            time.sleep(0.01)
+        # An API request is refused; anything else (a command) waits its turn.
+        with mock.patch('accounts.hashers.fails_fast', return_value=True):
+            with self.assertRaises(HashingBusy):
+                pool.run(release.wait)
+        waiters.append(threading.Thread(target=pool.run, args=(release.wait,)))
+        waiters[-1].start()
+        while pool.stats()['queued'] < 2:
+            time.sleep(0.01)
+        release.set()
+        for waiter in waiters:
+            waiter.join()
+        self.assertEqual(pool.stats(), {
+            'workers': 1, 'in_flight': 0, 'queued': 0, 'peak_queued': 2,
+            'completed': 3, 'rejected': 1, 'mean_wait': mock.ANY,
+        })
+
+    def test_only_api_requests_fail_fast(self):
+        seen = []
+        with mock.patch.object(HashingPool, 'run', lambda pool, func, *args: seen.append(fails_fast())):
+            self.client.post(reverse('login'), {'email': 'admin@example.com', 'password': 'Sup3r-secret!'})
+            self.client.post('/admin/login/', {'username': 'admin@example.com', 'password': 'Sup3r-secret!'})
+            make_password('Sup3r-secret!')
+        self.assertEqual(seen, [True, False, False])
+
+
+class TokenRevocationTests(APITestCase):
+    """Refresh token rotation, logout and the revocation store."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=make_password('Sup3r-secret!'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        # The mirror would outlive the rows each test rolls back.
+        store.reset()
+
+    def login(self):
+        response = self.client.post(reverse('login'), {
+            'email': 'customer@example.com', 'password': 'Sup3r-secret!',
+        })
+        return response.data['refresh']
+
+    def refresh(self, token):
+        return self.client.post(reverse('token-refresh'), {'refresh': token})
+
+    def test_refresh_rotates_and_revokes(self):
+        token = self.login()
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], token)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, status.HTTP_200_OK)
+        # Replaying a rotated token fails.
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_query_budget(self):
+        token = self.login()
+        self.refresh(self.login())
+        with mock.patch.dict(store.options, SYNC_INTERVAL=3600):
+            # The user's active check and the revocation insert (in a
+            # savepoint); the revocation check itself is in memory.
+            with self.assertNumQueries(4):
+                response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_replay_is_caught_before_sync(self):
+        token = self.login()
+        self.refresh(token)
+        # As seen from a process that hasn't synced the revocation yet: the
+        # rotation's insert still catches it.
+        with mock.patch.object(store, 'is_revoked', return_value=False):
+            self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout(self):
+        token = self.login()
+        response = self.client.post(reverse('logout'), {'refresh': token})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_everywhere(self):
+        first, second = self.login(), self.login()
+        response = self.client.post(reverse('logout'), {'refresh': first, 'everywhere': True})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.refresh(second).status_code, status.HTTP_401_UNAUTHORIZED)
+        # Sessions started afterwards aren't affected.
+        self.assertEqual(self.refresh(self.login()).status_code, status.HTTP_200_OK)
+
+    def test_refresh_takes_the_current_claims(self):
+        token = self.login()
+        self.user.role = CustomUser.UserRole.AGENT
+        self.user.save()
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = AccessToken(response.data['access'])
+        self.user.refresh_from_db()
+        self.assertEqual((access['role'], access['cv']), (CustomUser.UserRole.AGENT, self.user.claims_version))
+        self.assertEqual(RefreshToken(response.data['refresh'])['role'], CustomUser.UserRole.AGENT)
+
+    def test_refresh_for_a_deactivated_user(self):
+        token = self.login()
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_for_a_deleted_user(self):
+        token = self.login()
+        self.user.delete()
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_sync_picks_up_late_commits(self):
+        expires_at = timezone.now() + timedelta(days=1)
+        first, late = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        with mock.patch.dict(store.options, SYNC_INTERVAL=0):
+            Revocation.objects.create(id=1000, jti=first['jti'], user=self.user, expires_at=expires_at)
+            self.assertTrue(store.is_revoked(first))
+            # Numbered and timed before the row already synced, committed after.
+            Revocation.objects.create(
+                id=999, jti=late['jti'], user=self.user, expires_at=expires_at,
+                revoked_at=timezone.now() - timedelta(seconds=5),
+            )
+            self.assertTrue(store.is_revoked(late))
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(PASSWORD_HASHING={'ITERATIONS': 1000})
+class UserImportTests(APITestCase):
+    """Bulk provisioning through the admin API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, body, content_type='application/x-ndjson'):
+        response = self.client.generic('POST', reverse('user-import'), body, content_type=content_type)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_import_ndjson(self):
+        body = '\n'.join([
+            json.dumps({'email': 'ann@example.com', 'name': 'Ann Lee', 'password': 'Tr0ub4dor&3'}),
+            json.dumps({'email': 'ann@example.org', 'role': 'AGENT'}),
+            json.dumps({'email': 'bob@example.com', 'password': '123'}),
+            '{',
+        ])
+        report = self.post(body)
+        self.assertEqual([result.get('line') for result in report[:2]], [3, 4])
+        self.assertEqual(report[-1], {'summary': {'created': 2, 'skipped': 0, 'errors': 2}})
+
+        ann = CustomUser.objects.get(email='ann@example.com')
+        self.assertEqual((ann.username, ann.first_name, ann.last_name), ('ann', 'Ann', 'Lee'))
+        self.assertTrue(ann.check_password('Tr0ub4dor&3'))
+        agent = CustomUser.objects.get(email='ann@example.org')
+        self.assertEqual((agent.username, agent.role), ('ann1', CustomUser.UserRole.AGENT))
+        self.assertFalse(agent.has_usable_password())
+
+        # Sending it again resumes: the users already created are skipped.
+        report = self.post(body)
+        self.assertEqual(report[-1], {'summary': {'created': 0, 'skipped': 2, 'errors': 2}})
+
+    def test_import_csv(self):
+        report = self.post(
+            'email,first_name,last_name\ncai@example.com,Cai,Wu\n\ndee@example.com,,\n', content_type='text/csv'
+        )
+        self.assertEqual(report[-1], {'summary': {'created': 2, 'skipped': 0, 'errors': 0}})
+        self.assertEqual(CustomUser.objects.get(email='cai@example.com').last_name, 'Wu')
+
+    def test_admin_only(self):
+        self.client.force_authenticate(CustomUser.objects.create(email='eve@example.com', username='eve'))
+        response = self.client.post(reverse('user-import'), '', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
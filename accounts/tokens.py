@@ -0,0 +1,22 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from .revocation import store
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    simplejwt's RefreshToken, checked against the revocation store
+    (accounts.revocation) instead of the token_blacklist app's tables.
+    """
+
+    def verify(self):
+        super().verify()
+        if store.is_revoked(self):
+            raise TokenError(_('Token is revoked'))
+
+    def blacklist(self):
+        """Revoke the token; TokenRefreshSerializer calls this after rotating it"""
+        if not store.revoke(self):
+            # Someone refreshed it first: a replayed token.
+            raise TokenError(_('Token is revoked'))
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.urls import path
+from ticketing_system.async_views import hot_path
 from .views import (
     UserDetailView,
+    UserDetailAsyncView,
     RegisterView,
     LoginView,
-    UserListView
+    RefreshView,
+    LogoutView,
+    UserListView,
+    UserImportView,
 )
 
 urlpatterns = [
@@ -11,7 +17,15 @@ urlpatterns = [
     path('me/', UserDetailView.as_view(), name='user-detail'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', RefreshView.as_view(), name='token-refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     
     # Admin endpoints
     path('users/', UserListView.as_view(), name='user-list'),
-]
\ No newline at end of file
+    path('users/import/', UserImportView.as_view(), name='user-import'),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('me/', hot_path(UserDetailAsyncView.as_view(), UserDetailView.as_view()), name='user-detail'),
+    ] + urlpatterns
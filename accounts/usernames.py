@@ -0,0 +1,122 @@
+"""
+Unique usernames derived from email local parts: ``info``, ``info1``,
+``info2``...
+
+Each base has a UsernameSequence row holding the highest suffix handed out,
+so allocating is an increment, not a scan of the usernames sharing the
+prefix. The increment locks the row until the transaction ends, so
+concurrent registrations get distinct suffixes without retrying.
+
+Usernames the sequence doesn't know about (created before it, through
+bulk_create, or a base like ``info2`` that is also ``info`` plus a suffix)
+are skipped: candidates are checked in one query, and a base that keeps
+hitting taken ones reserves twice as many each round, so even a base with
+thousands of untracked usernames resolves in a logarithmic number of
+queries. ``allocate()`` takes a whole batch (an import) at once, in a few
+queries per 200 distinct bases.
+
+Different bases don't lock each other out, so ``info`` (suffix 2) and
+``info2`` can hand out ``info2`` to concurrent registrations. Callers insert
+their users through ``allocate(..., write=...)``, in the allocation's
+transaction: if the insert hits a username taken in between, the
+transaction is rolled back and the allocation, which now skips it, retried.
+Any other IntegrityError (a duplicate email, say) is the caller's, raised
+at once.
+"""
+from collections import Counter, defaultdict, deque
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from .models import CustomUser, UsernameSequence
+
+# Leaves room for the suffix within CustomUser.username's 150 characters.
+MAX_BASE_LENGTH = 140
+CHUNK_SIZE = 200
+# Conflicts: a concurrent allocation creating the same new base, or
+# inserting a username from another base first.
+ATTEMPTS = 3
+
+
+def allocate(bases, using=None, write=None):
+    """
+    Free usernames for ``bases`` (email local parts, one per user, repeats
+    allowed), in order. With ``write``, return ``write(usernames)`` instead,
+    called in the allocation's transaction and retried with fresh usernames
+    if it raises IntegrityError because one of them was taken meanwhile.
+    """
+    bases = [base[:MAX_BASE_LENGTH] for base in bases]
+    for attempt in range(ATTEMPTS):
+        usernames = None
+        try:
+            with transaction.atomic(using=using):
+                free = _allocate(Counter(bases), using)
+                usernames = [free[base].popleft() for base in bases]
+                return write(usernames) if write else usernames
+        except IntegrityError:
+            # Before the write, only a new base's sequence can conflict;
+            # after, a username must have been taken for a retry to help.
+            if attempt == ATTEMPTS - 1 or (usernames is not None and not _any_taken(usernames, using)):
+                raise
+
+
+def username(base, suffix):
+    return f'{base}{suffix}' if suffix else base
+
+
+def _allocate(counts, using):
+    """``{base: deque of usernames}``, ``counts[base]`` free usernames per base"""
+    free = defaultdict(deque)
+    # Usernames given to earlier bases of this batch: ``info2`` can come
+    # from ``info`` and from ``info2``.
+    claimed = set()
+    wanted = counts
+    while wanted:
+        reserved = {}
+        for chunk in _chunks(list(wanted)):
+            reserved.update(_reserve({base: wanted[base] for base in chunk}, using))
+        candidates = [username(base, suffix) for base, suffixes in reserved.items() for suffix in suffixes]
+        taken = set()
+        for chunk in _chunks(candidates):
+            taken.update(
+                CustomUser.objects.using(using).filter(username__in=chunk).order_by().values_list('username', flat=True)
+            )
+        short = {}
+        for base, suffixes in reserved.items():
+            names = [
+                name for name in (username(base, suffix) for suffix in suffixes)
+                if name not in taken and name not in claimed
+            ]
+            need = counts[base] - len(free[base])
+            free[base].extend(names[:need])
+            claimed.update(names[:need])
+            if len(names) < need:
+                # Skip past the untracked usernames in ever larger steps.
+                short[base] = max(need, 2 * wanted[base])
+        wanted = short
+    return free
+
+
+def _reserve(counts, using):
+    """Reserve ``counts[base]`` consecutive suffixes per base: ``{base: range}``"""
+    sequences = UsernameSequence.objects.using(using)
+    sequences.filter(base__in=counts).update(
+        last=F('last') + Case(*(When(base=base, then=Value(count)) for base, count in counts.items()))
+    )
+    reserved = {
+        base: range(last - counts[base] + 1, last + 1)
+        for base, last in sequences.filter(base__in=counts).values_list('base', 'last')
+    }
+    new = [base for base in counts if base not in reserved]
+    sequences.bulk_create([UsernameSequence(base=base, last=counts[base] - 1) for base in new])
+    reserved.update((base, range(counts[base])) for base in new)
+    return reserved
+
+
+def _any_taken(usernames, using):
+    users = CustomUser.objects.using(using)
+    return any(users.filter(username__in=chunk).exists() for chunk in _chunks(list(set(usernames))))
+
+
+def _chunks(items):
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
@@ -1,12 +1,26 @@
-from rest_framework import generics, permissions
-from rest_framework_simplejwt.views import TokenObtainPairView
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from drf_yasg.utils import no_body, swagger_auto_schema
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenViewBase
 from .serializers import (
     UserSerializer,
     RegisterSerializer,
-    CustomTokenObtainPairSerializer
+    CustomTokenObtainPairSerializer,
+    LogoutSerializer,
+    TokenRefreshSerializer,
 )
+from .authentication import afull_user
+from .hashers import get_options as get_hashing_options
+from .provisioning import UserImporter
 from .models import CustomUser
 from .permissions import IsOwnerOrAdmin
+from ticketing_system.async_views import AsyncGenericAPIView
 
 class UserDetailView(generics.RetrieveUpdateAPIView):
     """
@@ -32,10 +46,86 @@ class LoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
     permission_classes = [permissions.AllowAny]
 
+class RefreshView(TokenRefreshView):
+    """
+    POST: Exchange a refresh token for a new access token (and, rotated, a
+    new refresh token; the old one is revoked)
+    """
+    serializer_class = TokenRefreshSerializer
+
+class LogoutView(TokenViewBase):
+    """
+    POST: Revoke a refresh token, or with ``everywhere``, every session of its user
+    """
+    serializer_class = LogoutSerializer
+
+    def post(self, request, *args, **kwargs):
+        super().post(request, *args, **kwargs)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserListView(generics.ListAPIView):
     """
     GET: List all users (admin only)
     """
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.IsAdminUser]
\ No newline at end of file
+    permission_classes = [permissions.IsAdminUser]
+
+class UserImportView(APIView):
+    """
+    POST: Provision users in bulk from NDJSON (or CSV, sent as ``text/csv``)
+    in the request body (admin only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Admin only. Stream NDJSON (or, with Content-Type text/csv, CSV) user "
+            "records in the request body; the response streams NDJSON results "
+            "(per-record errors, per-batch counts, summary). Existing emails are "
+            "skipped, so a failed import can be sent again."
+        ),
+        request_body=no_body
+    )
+    def post(self, request):
+        format = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+        return StreamingHttpResponse(self._report(format, request.stream or []), content_type='application/x-ndjson')
+
+    @staticmethod
+    def _report(format, lines):
+        # As many hashes at once as the hashing pool runs (accounts.hashers),
+        # which logins share: an import can't starve them of it.
+        with ThreadPoolExecutor(get_hashing_options()['WORKERS']) as executor:
+            importer = UserImporter(format, map=executor.map)
+            for result in importer.run(lines):
+                yield json.dumps(result, default=str) + '\n'
+
+
+class UserDetailAsyncView(AsyncGenericAPIView):
+    """
+    Async version of UserDetailView (see ticketing_system.async_views),
+    routed in its place when ASYNC_VIEWS is on. Reads need no query beyond
+    authentication.
+    """
+    serializer_class = UserSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+
+    async def get(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await afull_user(request.user)).data)
+
+    async def put(self, request, *args, **kwargs):
+        return await self._update(request, partial=False)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self._update(request, partial=True)
+
+    async def _update(self, request, partial):
+        serializer = self.get_serializer(await afull_user(request.user), data=request.data, partial=partial)
+        # Validation queries too (the unique email check): run it with the save.
+        await sync_to_async(self._save)(serializer)
+        return Response(serializer.data)
+
+    @staticmethod
+    def _save(serializer):
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
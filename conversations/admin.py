@@ -1,5 +1,7 @@
 # conversations/admin.py
 from django.contrib import admin
+from django.db.models import Q
+from tickets import search
 from .models import Message
 
 @admin.register(Message)
@@ -7,3 +9,15 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ('ticket', 'sender', 'created_at')
     search_fields = ('ticket__title', 'sender__username', 'content')
     list_filter = ('ticket', 'sender')
+    search_results_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the full-text index for message content; ticket titles and
+        sender usernames match as before
+        """
+        search_term = search_term.strip()
+        if not search_term or not search.supports_full_text(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        ids = search.rank_messages(queryset, search_term, limit=self.search_results_limit)
+        return queryset.filter(Q(pk__in=ids) | Q(ticket__title__icontains=search_term) | Q(sender__username__icontains=search_term)), False
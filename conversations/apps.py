@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, pre_delete
 
 
 class ConversationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'conversations'
+
+    def ready(self):
+        from .models import sender_deleted, sender_deleting
+        pre_delete.connect(sender_deleting, sender=settings.AUTH_USER_MODEL)
+        post_delete.connect(sender_deleted, sender=settings.AUTH_USER_MODEL)
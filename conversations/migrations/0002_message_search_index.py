@@ -0,0 +1,22 @@
+from django.db import migrations
+from tickets.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor, 'conversations_message')
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor, 'conversations_message')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0001_initial'),
+        ('tickets', '0003_ticket_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
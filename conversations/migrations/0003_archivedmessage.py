@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0002_message_search_index'),
+        ('tickets', '0006_archivedticket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField(verbose_name='content')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('is_admin_response', models.BooleanField(default=False, verbose_name='admin response')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to=settings.AUTH_USER_MODEL, verbose_name='sender')),
+                ('ticket', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='tickets.archivedticket', verbose_name='ticket')),
+            ],
+            options={
+                'verbose_name': 'archived message',
+                'verbose_name_plural': 'archived messages',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['ticket', 'created_at'], name='conversatio_ticket__557ce4_idx')],
+            },
+        ),
+    ]
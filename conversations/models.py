@@ -1,8 +1,25 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from tickets import cache as ticket_cache, events as ticket_events, stats as ticket_stats
 from tickets.models import Ticket
 
+class MessageQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the messages and rebuild the counters of the affected tickets"""
+        with transaction.atomic(using=self.db, savepoint=False):
+            ticket_ids = set(self.values_list('ticket_id', flat=True))
+            result = super().delete()
+            Ticket.objects.using(self.db).filter(pk__in=ticket_ids).refresh_conversation_counters()
+            ticket_cache.invalidate(ticket_ids, using=self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Message(models.Model):
     ticket = models.ForeignKey(
         Ticket,
@@ -30,6 +47,8 @@ class Message(models.Model):
         help_text=_('Indicates official staff response')
     )
 
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at'] 
         indexes = [
@@ -40,4 +59,100 @@ class Message(models.Model):
         verbose_name_plural = _('messages')
 
     def __str__(self):
-        return f"Message #{self.id} on Ticket #{self.ticket_id}"
\ No newline at end of file
+        return f"Message #{self.id} on Ticket #{self.ticket_id}"
+
+    def save(self, *args, **kwargs):
+        """
+        Insert the message and bump its ticket's counters (and, for its first
+        staff response, the statistics) in one transaction, drop the ticket's
+        cached copy, then announce the message to the ticket's live stream
+        once committed.
+        """
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+            counters = {
+                'message_count': F('message_count') + 1,
+                'last_message_at': _latest('last_message_at', self.created_at),
+            }
+            if self.is_admin_response:
+                counters['last_staff_response_at'] = _latest('last_staff_response_at', self.created_at)
+            Ticket.objects.using(self._state.db).filter(pk=self.ticket_id).update(**counters)
+            if self.is_admin_response:
+                ticket_stats.first_response(self.ticket_id, self.sender_id, self.created_at, using=self._state.db)
+            ticket_cache.invalidate([self.ticket_id], using=self._state.db)
+            ticket_events.message_created(self, using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            result = super().delete(*args, **kwargs)
+            Ticket.objects.using(self._state.db).filter(
+                pk=self.ticket_id
+            ).refresh_conversation_counters()
+            ticket_cache.invalidate([self.ticket_id], using=self._state.db)
+        return result
+
+
+def sender_deleting(sender, instance, using, **kwargs):
+    """
+    pre_delete receiver for the user model. The user's messages go in the
+    same cascade, deleted in bulk without Message.delete(): note the
+    tickets whose counters sender_deleted() must then rebuild.
+    """
+    instance._message_ticket_ids = set(
+        Message.objects.using(using).filter(sender=instance).order_by().values_list('ticket_id', flat=True).distinct()
+    )
+
+
+def sender_deleted(sender, instance, using, **kwargs):
+    """post_delete receiver for the user model"""
+    ticket_ids = getattr(instance, '_message_ticket_ids', None)
+    if ticket_ids:
+        Ticket.objects.using(using).filter(pk__in=ticket_ids).refresh_conversation_counters()
+        ticket_cache.invalidate(ticket_ids, using=using)
+
+
+def _latest(field, value):
+    """SQL for max(field, value) that treats a NULL field as older"""
+    return Greatest(Coalesce(field, Value(value)), Value(value))
+
+
+class ArchivedMessage(models.Model):
+    """
+    A message of an archived ticket (tickets.archive), under its original
+    id, indexed for its thread only. Read-only; MessageSerializer renders
+    it like a Message.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    ticket = models.ForeignKey(
+        'tickets.ArchivedTicket',
+        on_delete=models.CASCADE,
+        related_name='messages',
+        # Covered by the (ticket, created_at) index.
+        db_index=False,
+        verbose_name=_('ticket'),
+    )
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_messages',
+        verbose_name=_('sender'),
+    )
+    content = models.TextField(_('content'))
+    created_at = models.DateTimeField(_('created at'))
+    updated_at = models.DateTimeField(_('updated at'))
+    is_admin_response = models.BooleanField(_('admin response'), default=False)
+
+    COPIED_FIELDS = ('id', 'ticket_id', 'sender_id', 'content', 'created_at', 'updated_at', 'is_admin_response')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ticket', 'created_at']),
+        ]
+        verbose_name = _('archived message')
+        verbose_name_plural = _('archived messages')
+
+    def __str__(self):
+        return f"Archived message #{self.id} on Ticket #{self.ticket_id}"
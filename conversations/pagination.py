@@ -0,0 +1,151 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from ticketing_system.pagination import KeysetPagination
+
+
+class MessagePagination(KeysetPagination):
+    """
+    Keyset pagination for a ticket's thread, newest first, plus an
+    incremental ``since`` mode for polling clients.
+
+    Every response carries a ``since`` token marking the newest message the
+    client has seen. ``?since=<token>`` returns only messages the client
+    hasn't seen, oldest first, as a single range scan on the
+    ``(ticket, created_at)`` index. A poll with nothing new answers
+    ``204 No Content``.
+
+    ``created_at`` is taken before the message's transaction commits, so a
+    message can become visible after a newer one was already polled. The
+    scan therefore starts ``since_overlap`` before the newest message seen,
+    and the token lists the ids seen within that window, which are skipped.
+    A token from the head of the list also starts no earlier than the
+    page's oldest message, since older ones are one ``next`` link away.
+    """
+    ordering = '-created_at'
+    since_query_param = 'since'
+    since_query_description = _('Only return messages newer than this token.')
+    since_ordering = ('created_at', 'id')
+    since_overlap = timedelta(seconds=30)
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.since = request.query_params.get(self.since_query_param)
+        if self.since is None:
+            return super().get_page_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.cursor_query_param
+        )
+        self.ordering = self.since_ordering
+        self.cursor = None
+
+        self.newest, self.floor, self.seen = self._decode_since(self.since, queryset)
+        queryset = queryset.order_by(*self.ordering).filter(
+            created_at__gte=self.newest - self.since_overlap
+        ).exclude(pk__in=self.seen)
+        if self.floor is not None:
+            queryset = queryset.filter(self._keyset_filter(self.ordering, self.floor))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        if self.since is None:
+            return super().set_page(results)
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        self.has_previous = False
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.since is not None:
+            if not data:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response({
+                'next': self.get_next_link(),
+                'since': self._since_token(self.page, self.newest, self.floor, self.seen),
+                'results': data,
+            })
+
+        # Only the head of the thread knows which message is the newest.
+        since = None
+        if self.page and not self.has_previous:
+            oldest = self.page[-1]
+            since = self._since_token(self.page, floor=(oldest.created_at, oldest.pk) if self.has_next else None)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'since': since,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.since is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.base_url, self.since_query_param,
+            self._since_token(self.page, self.newest, self.floor, self.seen),
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['since'] = {
+            'type': 'string',
+            'nullable': True,
+            'description': str(self.since_query_description),
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.since_query_param,
+            'required': False,
+            'in': 'query',
+            'description': str(self.since_query_description),
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+    def _since_token(self, messages, newest=None, floor=None, seen=None):
+        """
+        The token after ``messages``: the newest creation time seen, the
+        ``(created_at, id)`` position everything up to which was seen (or
+        None), and the ids seen since ``since_overlap`` before the newest,
+        with their creation times
+        """
+        seen = {**(seen or {}), **{message.pk: message.created_at for message in messages}}
+        newest = max(filter(None, (newest, *seen.values())))
+        start = newest - self.since_overlap
+        if floor is not None and floor[0] < start:
+            floor = None
+        token = json.dumps([
+            newest.isoformat(),
+            [floor[0].isoformat(), floor[1]] if floor is not None else None,
+            [[pk, created_at.isoformat()] for pk, created_at in sorted(seen.items()) if created_at >= start],
+        ], separators=(',', ':'))
+        return urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+    def _decode_since(self, token, queryset):
+        """A since token's newest creation time, floor and ``{id: created_at}`` of the messages seen"""
+        field = queryset.model._meta.get_field('created_at')
+        try:
+            newest, floor, window = json.loads(urlsafe_b64decode(token.encode('ascii')))
+            newest = field.to_python(newest)
+            if floor is not None:
+                floor = [field.to_python(floor[0]), int(floor[1])]
+            seen = {int(pk): field.to_python(created_at) for pk, created_at in window}
+            if None in (newest, *(floor or ()), *seen.values()):
+                raise ValueError
+        except (ValueError, TypeError, IndexError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return newest, floor, seen
@@ -1,21 +1,67 @@
-from rest_framework.permissions import BasePermission
-from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from django.http import Http404
 from django.utils.translation import gettext_lazy as _
-from tickets.models import Ticket
+from tickets.models import ArchivedTicket, Ticket
+
+_UNRESOLVED = object()
+
+
+def get_request_ticket(request, view):
+    """
+    Resolve the ticket named in the URL once per request.
+
+    The access rule (owner, staff or agent) is folded into the lookup, so a
+    single query both loads the ticket and authorizes it. The result is
+    cached on the request for the permission check and the view to share.
+    Raises Http404 when the ticket doesn't exist or the user can't see it.
+    An archived ticket (tickets.archive) is looked up next, and returned as
+    a read-only Ticket.
+    """
+    ticket = getattr(request, '_ticket', _UNRESOLVED)
+    if ticket is _UNRESOLVED:
+        ticket = _request_ticket_queryset(request, view).first()
+        if ticket is None:
+            ticket = _as_ticket(_request_ticket_queryset(request, view, ArchivedTicket).first())
+        request._ticket = ticket
+    return _found(ticket)
+
+
+async def aget_request_ticket(request, view):
+    """get_request_ticket() for async views"""
+    ticket = getattr(request, '_ticket', _UNRESOLVED)
+    if ticket is _UNRESOLVED:
+        ticket = await _request_ticket_queryset(request, view).afirst()
+        if ticket is None:
+            ticket = _as_ticket(await _request_ticket_queryset(request, view, ArchivedTicket).afirst())
+        request._ticket = ticket
+    return _found(ticket)
+
+
+def _request_ticket_queryset(request, view, model=Ticket):
+    return model.objects.accessible_to(request.user).filter(pk=view.kwargs.get('ticket_pk'))
+
+
+def _as_ticket(archived):
+    return archived.as_ticket() if archived is not None else None
+
+
+def _found(ticket):
+    if ticket is None:
+        raise Http404(_('Ticket not found or access denied.'))
+    return ticket
+
 
 class HasTicketAccess(BasePermission):
     """Verify user has access to the ticket's messages"""
     
     def has_permission(self, request, view):
-        ticket = get_object_or_404(
-            Ticket, 
-            pk=view.kwargs.get('ticket_pk')
-        )
-        return (
-            request.user == ticket.user or
-            request.user.is_staff or
-            request.user.is_agent
-        )
+        if not request.user.is_authenticated:
+            return False
+        ticket = get_request_ticket(request, view)
+        if ticket.archived and request.method not in SAFE_METHODS:
+            raise PermissionDenied(_('Archived tickets are read-only.'))
+        return True
 
     def has_object_permission(self, request, view, obj):
-        return self.has_permission(request, view)
\ No newline at end of file
+        return self.has_permission(request, view)
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import json
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import AsyncRequestFactory
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser
+from tickets.models import Ticket
+from .models import Message
+from .views import MessageAsyncView
+
+
+class MessageQueryBudgetTests(APITestCase):
+    """
+    Query budgets for the message endpoints, measured on a thread longer than
+    one page with messages from many different senders.
+    """
+    PAGE_SIZE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        senders = CustomUser.objects.bulk_create([
+            CustomUser(email=f'customer{i}@example.com', username=f'customer{i}', password=password)
+            for i in range(20)
+        ])
+        cls.customer = senders[0]
+        cls.ticket = Ticket.objects.create(user=cls.customer, title='Printer', description='Jammed')
+        Message.objects.bulk_create([
+            Message(ticket=cls.ticket, sender=senders[i % len(senders)], content=f'Message {i}')
+            for i in range(cls.PAGE_SIZE * 2)
+        ])
+        cls.url = f'/api/v1/tickets/{cls.ticket.pk}/messages/'
+
+    def setUp(self):
+        # Cached users and tickets are keyed by ids the test database reuses.
+        cache.clear()
+
+    def test_list(self):
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_list_next_page(self):
+        self.client.force_authenticate(self.agent)
+        next_url = self.client.get(self.url).data['next']
+        with self.assertNumQueries(2):
+            response = self.client.get(next_url)
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_since_poll(self):
+        self.client.force_authenticate(self.customer)
+        since = self.client.get(self.url).data['since']
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_create(self):
+        # Ticket lookup, insert, and the ticket's conversation counters;
+        # as its first staff response, also the ticket's first_response_at,
+        # a read of the ticket and an upsert per statistics table (days and
+        # agents).
+        self.client.force_authenticate(self.agent)
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, {'content': 'On it.'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['is_admin_response'])
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.message_count, 1)
+        self.assertIsNotNone(self.ticket.last_staff_response_at)
+
+    def test_conditional_list(self):
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get(self.url)['ETag']
+        # The ticket lookup the access check needs anyway, and the page's
+        # senders, without the messages.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(self.url, {'content': 'Any news?'})
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['content'], 'Any news?')
+
+        # A sender's new name shows in the thread; the ticket didn't change.
+        etag = response['ETag']
+        CustomUser.objects.filter(pk=self.customer.pk).update(first_name='Renamed')
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Renamed', {message['sender']['name'] for message in response.data['results']})
+
+
+class MessageAsyncViewTests(MessageQueryBudgetTests):
+    """
+    The same thread through MessageAsyncView. A request's first budget
+    includes the user lookup for the bearer token, which force_authenticate
+    skips above; after that the user comes from the cache.
+    """
+
+    def call(self, method, user, data=None, headers=None):
+        headers = {**(headers or {}), 'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        if method == 'post':
+            request = AsyncRequestFactory().post(
+                self.url, json.dumps(data), content_type='application/json', headers=headers
+            )
+        else:
+            request = AsyncRequestFactory().get(self.url, data, headers=headers)
+        return async_to_sync(MessageAsyncView.as_view())(request, ticket_pk=self.ticket.pk)
+
+    def test_list(self):
+        with self.assertNumQueries(3):
+            response = self.call('get', self.customer)
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_list_next_page(self):
+        cursor = parse_qs(urlparse(self.call('get', self.agent).data['next']).query)['cursor'][0]
+        with self.assertNumQueries(2):
+            response = self.call('get', self.agent, {'cursor': cursor})
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_since_poll(self):
+        since = self.call('get', self.customer).data['since']
+        with self.assertNumQueries(2):
+            response = self.call('get', self.customer, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_create(self):
+        with self.assertNumQueries(8):
+            response = self.call('post', self.agent, {'content': 'On it.'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['is_admin_response'])
+
+    def test_conditional_list(self):
+        etag = self.call('get', self.customer)['ETag']
+        with self.assertNumQueries(2):
+            response = self.call('get', self.customer, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.call('post', self.customer, {'content': 'Any news?'})
+        response = self.call('get', self.customer, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_other_customers_ticket(self):
+        other = CustomUser.objects.get(email='customer1@example.com')
+        response = self.call('get', other)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MessagePollingTests(APITestCase):
+    """The ``since`` mode of MessagePagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create(email='customer@example.com', username='customer')
+        cls.ticket = Ticket.objects.create(user=cls.customer, title='Printer', description='Jammed')
+        cls.url = f'/api/v1/tickets/{cls.ticket.pk}/messages/'
+        for i in range(3):
+            Message.objects.create(ticket=cls.ticket, sender=cls.customer, content=f'Message {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.customer)
+
+    def post(self, content):
+        return Message.objects.create(ticket=self.ticket, sender=self.customer, content=content)
+
+    def poll(self, since, expected):
+        response = self.client.get(self.url, {'since': since})
+        if not expected:
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            return since
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['content'] for m in response.data['results']], expected)
+        return response.data['since']
+
+    def test_poll(self):
+        since = self.client.get(self.url).data['since']
+        since = self.poll(since, [])
+        self.post('Any news?')
+        self.post('Hello?')
+        since = self.poll(since, ['Any news?', 'Hello?'])
+        self.poll(since, [])
+
+    def test_late_commit(self):
+        since = self.client.get(self.url).data['since']
+        newest = Message.objects.latest('created_at', 'id')
+        # Created before the newest message the client saw, committed after.
+        late = self.post('Late')
+        Message.objects.filter(pk=late.pk).update(created_at=newest.created_at - timedelta(seconds=5))
+        since = self.poll(since, ['Late'])
+        self.poll(since, [])
+        self.post('Later')
+        self.poll(since, ['Later'])
+
+    def test_poll_in_pages(self):
+        since = self.client.get(self.url).data['since']
+        for i in range(5):
+            self.post(f'New {i}')
+        response = self.client.get(self.url, {'since': since, 'page_size': 2})
+        seen = [m['content'] for m in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [m['content'] for m in response.data['results']]
+        self.assertEqual(seen, [f'New {i}' for i in range(5)])
+        self.poll(response.data['since'], [])
+
+    def test_invalid_token(self):
+        for token in ('not-a-token', urlsafe_b64encode(b'["yesterday",[]]').decode(), urlsafe_b64encode(b'[1]').decode()):
+            with self.subTest(token=token):
+                response = self.client.get(self.url, {'since': token})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MessageCounterTests(APITestCase):
+    """The ticket counters Message maintains, on every way a message comes and goes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(email='customer@example.com', username='customer')
+        cls.ticket = Ticket.objects.create(user=cls.customer, title='Printer', description='Jammed')
+
+    def post(self, sender, content):
+        return Message.objects.create(
+            ticket=self.ticket, sender=sender, content=content, is_admin_response=sender == self.agent,
+        )
+
+    def assertCounters(self, *messages):
+        self.ticket.refresh_from_db()
+        staff = [m for m in messages if m.is_admin_response]
+        self.assertEqual(
+            (self.ticket.message_count, self.ticket.last_message_at, self.ticket.last_staff_response_at),
+            (
+                len(messages),
+                max((m.created_at for m in messages), default=None),
+                max((m.created_at for m in staff), default=None),
+            ),
+        )
+
+    def test_create(self):
+        question = self.post(self.customer, 'Any news?')
+        self.assertCounters(question)
+        answer = self.post(self.agent, 'On it.')
+        self.assertCounters(question, answer)
+
+    def test_delete(self):
+        question = self.post(self.customer, 'Any news?')
+        answer = self.post(self.agent, 'On it.')
+        follow_up = self.post(self.customer, 'Thanks.')
+        answer.delete()
+        self.assertCounters(question, follow_up)
+        Message.objects.filter(pk=follow_up.pk).delete()
+        self.assertCounters(question)
+
+    def test_sender_deleted(self):
+        question = self.post(self.customer, 'Any news?')
+        self.post(self.agent, 'On it.')
+        self.post(self.agent, 'Fixed.')
+        # Cached with the agent's replies counted.
+        self.client.force_authenticate(self.customer)
+        self.client.get(f'/api/v1/tickets/{self.ticket.pk}/')
+
+        # The agent's messages go in the user's cascade, not through Message.delete().
+        self.agent.delete()
+        self.assertCounters(question)
+        response = self.client.get(f'/api/v1/tickets/{self.ticket.pk}/')
+        self.assertEqual(response.data['message_count'], 1)
+        self.assertIsNone(response.data['last_staff_response_at'])
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MessageViewSet
+from ticketing_system.async_views import hot_path
+from .views import MessageViewSet, MessageAsyncView
 
 router = DefaultRouter()
 router.register(r'', MessageViewSet, basename='message')
@@ -10,4 +12,12 @@ app_name = 'conversations'
 # Versioning handled in project URLs
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('', hot_path(
+            MessageAsyncView.as_view(),
+            MessageViewSet.as_view({'get': 'list', 'post': 'create'}),
+        ), name='message-list'),
+    ] + urlpatterns
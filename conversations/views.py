@@ -1,27 +1,90 @@
-from rest_framework import viewsets, mixins
-from rest_framework.exceptions import NotFound
-from django.utils.translation import gettext_lazy as _
-from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
+from rest_framework import viewsets, mixins, status
+from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import Message
+from .models import ArchivedMessage, Message
 from .serializers import MessageSerializer
-from .permissions import HasTicketAccess
-from tickets.models import Ticket
-from django.http import Http404
+from .permissions import HasTicketAccess, aget_request_ticket, get_request_ticket
+from .pagination import MessagePagination
+from ticketing_system import conditional
+from ticketing_system.async_views import AsyncGenericAPIView
 
 
-class MessageViewSet(mixins.ListModelMixin,
+class MessageViewMixin:
+    """Configuration shared by MessageViewSet and MessageAsyncView"""
+    serializer_class = MessageSerializer
+    permission_classes = [HasTicketAccess]
+    pagination_class = MessagePagination
+    # What MessageSerializer shows of a message's sender.
+    sender_fields = (
+        'sender_id', 'sender__email', 'sender__first_name', 'sender__last_name', 'sender__is_staff', 'sender__role',
+    )
+
+    def get_queryset(self):
+        """Messages ordered by creation date (newest first)"""
+        # An archived ticket's thread was archived with it.
+        model = ArchivedMessage if self._get_ticket().archived else Message
+        return model.objects.filter(
+            ticket_id=self.kwargs['ticket_pk']
+        ).select_related('sender').order_by('-created_at')
+
+    def get_serializer_context(self):
+        """Add ticket to context for validation"""
+        context = super().get_serializer_context()
+        context['ticket'] = self._get_ticket()
+        return context
+
+    def perform_create(self, serializer):
+        """Auto-set sender and admin response flag"""
+        serializer.save(
+            ticket=self._get_ticket(),
+            sender=self.request.user,
+            is_admin_response=(
+                self.request.user.is_staff or 
+                self.request.user.is_agent
+            )
+        )
+
+    def get_validators(self, senders):
+        """
+        ``(ETag, Last-Modified)`` of the thread, from the ticket row the
+        permission check already loaded: its counters move with every new or
+        deleted message (messages aren't edited through the API). The page's
+        ``sender_fields`` rows, or its messages, cover the nested sender
+        profiles, which change without touching the ticket.
+        """
+        ticket = self._get_ticket()
+        senders = sorted({
+            row if isinstance(row, tuple) else conditional.field_values(row, self.sender_fields) for row in senders
+        })
+        etag = conditional.make_etag(
+            self.request, ticket.pk, ticket.updated_at, ticket.message_count, ticket.last_message_at, senders
+        )
+        return etag, max(filter(None, (ticket.updated_at, ticket.last_message_at)))
+
+    def get_validator_queryset(self, queryset):
+        """``sender_fields`` of the requested page: its index scan, without the payload"""
+        return self.paginator.get_page_queryset(queryset, self.request, self).values_list(*self.sender_fields)
+
+    def _get_ticket(self):
+        """Ticket resolved (and authorized) once per request by HasTicketAccess"""
+        return get_request_ticket(self.request, self)
+
+
+class MessageViewSet(MessageViewMixin,
+                     mixins.ListModelMixin,
                      mixins.CreateModelMixin,
                      viewsets.GenericViewSet):
     """
     ViewSet for managing ticket messages.
     """
-    serializer_class = MessageSerializer
-    permission_classes = [HasTicketAccess]
 
     @swagger_auto_schema(
-        operation_description="Get all messages for a specific ticket",
+        operation_description=(
+            "Get the messages for a specific ticket, newest first. "
+            "Pass the returned `since` token back to fetch only newer messages."
+        ),
         manual_parameters=[
             openapi.Parameter(
                 'ticket_pk',
@@ -29,12 +92,29 @@ class MessageViewSet(mixins.ListModelMixin,
                 description="ID of the ticket",
                 type=openapi.TYPE_INTEGER,
                 required=True
+            ),
+            openapi.Parameter(
+                'since',
+                openapi.IN_QUERY,
+                description="Only return messages newer than this token (oldest first); 204 if none",
+                type=openapi.TYPE_STRING,
+                required=False
             )
         ]
     )
     def list(self, request, *args, **kwargs):
-        """Get all messages for a specific ticket"""
-        return super().list(request, *args, **kwargs)
+        """Get a page of messages for a specific ticket; 304 if the client's copy is current"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if conditional.is_conditional(request):
+            senders = list(self.get_validator_queryset(queryset))
+            response = conditional.not_modified(request, *self.get_validators(senders))
+            if response is not None:
+                return response
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        return conditional.set_validators(response, *self.get_validators(page))
 
     @swagger_auto_schema(
         operation_description="Create a new message for a specific ticket",
@@ -53,34 +133,35 @@ class MessageViewSet(mixins.ListModelMixin,
         """Create a new message for a specific ticket"""
         return super().create(request, *args, **kwargs)
 
-    def get_queryset(self):
-        """Messages ordered by creation date (newest first)"""
-        return Message.objects.filter(
-            ticket_id=self.kwargs['ticket_pk']
-        ).select_related('sender').order_by('-created_at')
 
-    def get_serializer_context(self):
-        """Add ticket to context for validation"""
-        context = super().get_serializer_context()
-        context['ticket'] = self._get_ticket()
-        return context
+class MessageAsyncView(MessageViewMixin, AsyncGenericAPIView):
+    """
+    Async list/create of a ticket's messages (see ticketing_system.async_views),
+    routed in place of MessageViewSet when ASYNC_VIEWS is on.
+    """
 
-    def perform_create(self, serializer):
-        """Auto-set sender and admin response flag"""
-        serializer.save(
-            ticket=self._get_ticket(),
-            sender=self.request.user,
-            is_admin_response=(
-                self.request.user.is_staff or 
-                self.request.user.is_agent
-            )
-        )
+    async def acheck_permissions(self, request):
+        # Load the ticket HasTicketAccess checks, without blocking the loop.
+        if request.user.is_authenticated:
+            await aget_request_ticket(request, self)
+        await super().acheck_permissions(request)
 
-    def _get_ticket(self):
-        """Retrieve and cache the ticket instance for the request lifecycle"""
-        if not hasattr(self, '_ticket'):
-            try:
-                self._ticket = Ticket.objects.get(pk=self.kwargs['ticket_pk'])
-            except Ticket.DoesNotExist:
-                raise Http404(_('Ticket not found or access denied.'))  # Custom error message
-        return self._ticket
\ No newline at end of file
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if conditional.is_conditional(request):
+            senders = [row async for row in self.get_validator_queryset(queryset)]
+            response = conditional.not_modified(request, *self.get_validators(senders))
+            if response is not None:
+                return response
+
+        page = await self.apaginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        return conditional.set_validators(response, *self.get_validators(page))
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # The insert and counter update share a transaction: run them in a thread.
+        await sync_to_async(self.perform_create)(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
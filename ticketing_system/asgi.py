@@ -2,6 +2,9 @@
 ASGI config for ticketing_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The Server-Sent Events streams (tickets.streams) need it, e.g.:
+
+    uvicorn ticketing_system.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
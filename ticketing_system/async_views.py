@@ -0,0 +1,155 @@
+"""
+Async counterparts of DRF's APIView/GenericAPIView for the hot read paths.
+
+DRF views are synchronous: under ASGI, Django runs each one in its single
+sync thread, so one slow query holds up every other request in the
+process. These views run on the event loop instead. Everything DRF does
+in memory (content negotiation, parsing, permissions, throttles,
+serialization, exception handling) is reused as-is; the steps that touch
+the database are awaited through Django's async ORM:
+
+- authentication, via an authenticator's ``aauthenticate()``
+  (accounts.authentication.JWTAuthentication),
+- filter backends that define ``afilter_queryset()``,
+- pagination classes that define ``apaginate_queryset()``,
+- object lookup, via ``aget_object()``.
+
+Writes still need a transaction, which the async ORM doesn't offer; views
+run them with ``sync_to_async``.
+
+The URL modules route the hot paths to these views when
+``settings.ASYNC_VIEWS`` is on, through ``hot_path()``.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework import exceptions
+from rest_framework.generics import GenericAPIView
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers (``async def get`` etc.) run on the event loop"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """initial(), with authentication and permission checks awaited"""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await self.acheck_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Request._authenticate() for async views: authenticators with an
+        ``aauthenticate()`` are awaited, others run in a thread.
+        """
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None)
+            try:
+                if authenticate is not None:
+                    user_auth_tuple = await authenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def acheck_permissions(self, request):
+        """
+        Permission classes run as-is, so they must not query the database;
+        views whose permissions need data load it here first.
+        """
+        self.check_permissions(request)
+
+
+class AsyncGenericAPIView(AsyncAPIView, GenericAPIView):
+    """GenericAPIView with async filtering, pagination and object lookup"""
+
+    async def afilter_queryset(self, queryset):
+        for backend in list(self.filter_backends):
+            backend = backend()
+            if hasattr(backend, 'afilter_queryset'):
+                queryset = await backend.afilter_queryset(self.request, queryset, self)
+            else:
+                queryset = backend.filter_queryset(self.request, queryset, self)
+        return queryset
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def hot_path(async_view, sync_view):
+    """
+    Route a URL to ``async_view``, passing the HTTP methods its class doesn't
+    implement on to ``sync_view`` (run in a thread, as Django would).
+    """
+    methods = {
+        method.upper() for method in async_view.view_class.http_method_names
+        if hasattr(async_view.view_class, method) and method != 'options'
+    }
+    run_sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in methods or request.method == 'OPTIONS':
+            return await async_view(request, *args, **kwargs)
+        return await run_sync_view(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    # Class attributes (e.g. read_from_replica) apply to the routed URL.
+    view.cls = async_view.cls
+    return view
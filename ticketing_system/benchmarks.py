@@ -0,0 +1,306 @@
+"""
+End-to-end API benchmarks: realistic request mixes driven in-process
+through the full Django stack (middleware, URL routing, authentication,
+throttling, serializers) against a seeded database.
+
+Each mix (MIXES) draws its requests from weighted operations (OPERATIONS)
+with a seeded random generator, so two runs send the same requests. A run
+records, per operation, p50/p95/p99 latency over the timed requests, and,
+in a separate pass that doesn't slow those down, the SQL queries and peak
+Python memory (tracemalloc) per request; per mix, the throughput.
+
+The report is plain JSON. compare() checks a report against a baseline
+from another commit and returns the regressions beyond the thresholds.
+
+``manage.py benchmark_api`` seeds a scratch database (ticketing_system.seeding)
+and runs it.
+"""
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import count
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.throttling import SimpleRateThrottle
+from accounts.serializers import CustomTokenObtainPairSerializer
+from tickets.models import Ticket
+from .seeding import PASSWORD
+
+REPORT_VERSION = 1
+SEARCH_TERMS = ('printer', 'vpn', 'password', 'invoice', 'slow')
+
+# Operation name: (method, who sends it). The paths and bodies are built by
+# Runner.request().
+OPERATIONS = {
+    'ticket-list': ('GET', 'agent'),
+    'ticket-filter': ('GET', 'agent'),
+    'ticket-search': ('GET', 'agent'),
+    'ticket-detail': ('GET', 'agent'),
+    'ticket-queue': ('GET', 'agent'),
+    'message-list': ('GET', 'agent'),
+    'message-create': ('POST', 'agent'),
+    'my-ticket-list': ('GET', 'customer'),
+    'my-ticket-detail': ('GET', 'customer'),
+    'my-message-list': ('GET', 'customer'),
+    'my-message-create': ('POST', 'customer'),
+    'ticket-create': ('POST', 'customer'),
+    'login': ('POST', None),
+    'register': ('POST', None),
+}
+
+# Mix name: {operation: weight}.
+MIXES = {
+    'agent': {
+        'ticket-list': 20, 'ticket-filter': 15, 'ticket-search': 10, 'ticket-detail': 20,
+        'ticket-queue': 5, 'message-list': 20, 'message-create': 10,
+    },
+    'customer': {
+        'my-ticket-list': 30, 'my-ticket-detail': 25, 'my-message-list': 25,
+        'my-message-create': 15, 'ticket-create': 5,
+    },
+    'auth': {'login': 90, 'register': 10},
+}
+
+# Share of --requests (and warm-up requests) a mix sends: a login hashes a
+# password, which takes about half a second.
+MIX_SCALE = {'auth': 0.1}
+
+# Percent slower (latency), slower (throughput) or bigger (memory), and
+# queries more, than the baseline before compare() reports a regression.
+THRESHOLDS = {'latency': 25.0, 'memory': 25.0, 'queries': 0}
+
+
+def fixtures():
+    """Runner's fixtures, picked from a seeded database"""
+    User = get_user_model()
+    agent = User.objects.filter(role=User.UserRole.AGENT).order_by('pk').first()
+    customers = User.objects.filter(role=User.UserRole.CUSTOMER, tickets__isnull=False).distinct().order_by('pk')[:50]
+    tickets = {}
+    for user_id, ticket_id in Ticket.objects.filter(user__in=list(customers)).values_list('user_id', 'pk'):
+        tickets.setdefault(user_id, []).append(ticket_id)
+    if agent is None or not tickets:
+        raise BenchmarkError('The benchmark needs at least one agent, customer and ticket.')
+    return {
+        'agent': agent,
+        'customers': {user: tickets[user.pk] for user in customers},
+        'ticket_ids': list(Ticket.objects.values_list('pk', flat=True)),
+        'login': customers[0].email,
+    }
+
+
+class Runner:
+    """
+    Send the mixes' requests as ``fixtures``' users (see fixtures()):
+    ``agent`` (a user), ``customers`` ({user: [their ticket ids]}),
+    ``ticket_ids`` (all), and ``login`` (an email whose password is
+    seeding.PASSWORD).
+    """
+
+    def __init__(self, fixtures, seed=0):
+        self.client = Client()
+        self.random = random.Random(seed)
+        self.registrations = count()
+        self.agent = _bearer(fixtures['agent'])
+        self.customers = [(_bearer(user), ids) for user, ids in fixtures['customers'].items()]
+        self.ticket_ids = fixtures['ticket_ids']
+        self.login = fixtures['login']
+
+    def run(self, requests=500, warmup=20, profile_requests=20, mixes=None):
+        """The report's results for ``requests`` timed requests per mix (see MIX_SCALE)"""
+        operations = {}
+        results = {'mixes': {}, 'operations': operations}
+        with unthrottled():
+            # Meant for a private cache (see benchmark_api), not the shared one.
+            cache.clear()
+            for mix in mixes or MIXES:
+                scale = MIX_SCALE.get(mix, 1)
+                for _ in range(round(warmup * scale)):
+                    self.send(self.pick(mix))
+                total = max(round(requests * scale), 1)
+                latencies = {}
+                started = time.perf_counter()
+                for _ in range(total):
+                    name = self.pick(mix)
+                    request_started = time.perf_counter()
+                    self.send(name)
+                    latencies.setdefault(name, []).append(time.perf_counter() - request_started)
+                elapsed = time.perf_counter() - started
+                results['mixes'][mix] = {
+                    'requests': total,
+                    'seconds': round(elapsed, 3),
+                    'throughput': round(total / elapsed, 1),
+                }
+                for name, samples in latencies.items():
+                    operations.setdefault(name, []).extend(samples)
+
+            for name, samples in list(operations.items()):
+                queries, peaks = self.profile(name, min(profile_requests, len(samples)))
+                operations[name] = {
+                    'count': len(samples),
+                    **_percentiles(samples),
+                    'queries': statistics.median(queries),
+                    'peak_memory_kib': round(max(peaks) / 1024, 1),
+                }
+        return results
+
+    def profile(self, name, requests):
+        """Queries and peak traced memory of ``requests`` requests to ``name``"""
+        queries, peaks = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(max(requests, 1)):
+                with CaptureQueriesContext(connection) as captured:
+                    tracemalloc.reset_peak()
+                    self.send(name)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                queries.append(len(captured))
+        finally:
+            tracemalloc.stop()
+        return queries, peaks
+
+    def pick(self, mix):
+        names, weights = zip(*MIXES[mix].items())
+        return self.random.choices(names, weights)[0]
+
+    def send(self, name):
+        method, path, data, headers = self.request(name)
+        # Over HTTPS, or production settings (SECURE_SSL_REDIRECT) would
+        # answer every request with a redirect.
+        if method == 'GET':
+            response = self.client.get(path, data, headers=headers, secure=True)
+        else:
+            response = self.client.post(
+                path, json.dumps(data), content_type='application/json', headers=headers, secure=True,
+            )
+        if response.status_code >= 300:
+            raise BenchmarkError(f'{name}: {method} {path} returned {response.status_code}: {response.content[:200]!r}')
+        # Streaming responses only do their work when read.
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def request(self, name):
+        """``(method, path, data, headers)`` for the next ``name`` request"""
+        method, actor = OPERATIONS[name]
+        rng = self.random
+        headers = {}
+        if actor == 'agent':
+            headers = self.agent
+            ticket_id = rng.choice(self.ticket_ids)
+        elif actor == 'customer':
+            headers, ticket_ids = rng.choice(self.customers)
+            ticket_id = rng.choice(ticket_ids)
+
+        if name in ('ticket-list', 'my-ticket-list'):
+            return method, '/api/v1/tickets/', {}, headers
+        if name == 'ticket-filter':
+            data = {'status': rng.choice(('open', 'pending')), 'priority': rng.choice(('low', 'medium', 'high'))}
+            return method, '/api/v1/tickets/', dict(data, ordering='-updated_at'), headers
+        if name == 'ticket-search':
+            return method, '/api/v1/tickets/', {'search': rng.choice(SEARCH_TERMS)}, headers
+        if name in ('ticket-detail', 'my-ticket-detail'):
+            return method, f'/api/v1/tickets/{ticket_id}/', {}, headers
+        if name == 'ticket-queue':
+            return method, '/api/v1/tickets/queue/', {}, headers
+        if name in ('message-list', 'my-message-list'):
+            return method, f'/api/v1/tickets/{ticket_id}/messages/', {}, headers
+        if name in ('message-create', 'my-message-create'):
+            return method, f'/api/v1/tickets/{ticket_id}/messages/', {'content': 'Any news on this?'}, headers
+        if name == 'ticket-create':
+            return method, '/api/v1/tickets/', {'title': 'Printer jammed', 'description': 'Again.'}, headers
+        if name == 'login':
+            return method, '/api/v1/accounts/login/', {'email': self.login, 'password': PASSWORD}, headers
+        if name == 'register':
+            email = f'bench{next(self.registrations)}-{rng.getrandbits(48):x}@register.example.com'
+            data = {'email': email, 'name': 'Bench Mark', 'password': PASSWORD, 'password2': PASSWORD}
+            return method, '/api/v1/accounts/register/', data, headers
+        raise ValueError(f'Unknown operation {name!r}.')
+
+
+class BenchmarkError(Exception):
+    """The benchmark can't run, or one of its requests failed"""
+
+
+def environment():
+    """What a report was measured on, for telling comparable reports apart"""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare(baseline, report, thresholds=None):
+    """
+    ``(rows, regressions)``: a row per metric found in both reports
+    (``(metric, baseline, current, change in percent)``), and the rows
+    past ``thresholds`` (default THRESHOLDS)
+    """
+    thresholds = {**THRESHOLDS, **(thresholds or {})}
+    rows, regressions = [], []
+
+    def check(metric, old, new, limit, higher_is_worse=True, absolute=False):
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((metric, old, new, change))
+        worse = (new - old) if absolute else change
+        if not higher_is_worse:
+            worse = -worse
+        if worse > limit:
+            regressions.append(rows[-1])
+
+    for mix, current in report['mixes'].items():
+        old = baseline['mixes'].get(mix)
+        if old:
+            check(f'{mix} throughput', old['throughput'], current['throughput'],
+                  thresholds['latency'], higher_is_worse=False)
+    for name, current in report['operations'].items():
+        old = baseline['operations'].get(name)
+        if not old:
+            continue
+        for percentile in ('p50_ms', 'p95_ms'):
+            check(f'{name} {percentile}', old[percentile], current[percentile], thresholds['latency'])
+        check(f'{name} queries', old['queries'], current['queries'], thresholds['queries'], absolute=True)
+        check(f'{name} peak_memory_kib', old['peak_memory_kib'], current['peak_memory_kib'], thresholds['memory'])
+    return rows, regressions
+
+
+@contextmanager
+def unthrottled():
+    """
+    Lift DRF's throttle rates while benchmarking, keeping the throttles'
+    cache traffic in the measurement (the rates are read at import time,
+    so override_settings can't)
+    """
+    rates = SimpleRateThrottle.THROTTLE_RATES
+    SimpleRateThrottle.THROTTLE_RATES = {scope: f'{10 ** 9}/second' for scope in rates}
+    try:
+        yield
+    finally:
+        SimpleRateThrottle.THROTTLE_RATES = rates
+
+
+def _bearer(user):
+    # A login's token, with the claims that spare authentication a query.
+    token = CustomTokenObtainPairSerializer.get_token(user).access_token
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+    }
@@ -0,0 +1,126 @@
+"""
+Namespaced access to the shared cache (``settings.CACHES['default']``).
+
+The cache holds DRF's throttle counters (so every worker enforces the same
+limits) and the hot lookups below, each in its own namespace:
+
+- ``users``: users loaded by JWT authentication (accounts.authentication),
+- ``claims``: what users' tokens may currently claim (accounts.cache),
+- ``tickets``: serialized tickets for the detail endpoint (tickets.cache).
+
+A namespace prefixes its keys with its name and stores entries for the
+number of seconds ``settings.CACHE_NAMESPACES`` gives it, so an entry
+missed by invalidation (e.g. after a raw ``QuerySet.update()``) still
+expires. Writers call ``invalidate()``, which drops entries right away and
+again when the transaction commits, so a concurrent reader can't put back
+the row as it was before the commit.
+
+Hits and misses are counted per process and added to shared counters every
+``METRICS_FLUSH`` lookups; ``manage.py cache_stats`` reports them.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+DEFAULT_TIMEOUT = 60
+METRICS_FLUSH = 100
+
+
+class Namespace:
+    """A slice of the shared cache with its own key prefix, TTL and metrics"""
+
+    def __init__(self, name, alias=DEFAULT_CACHE_ALIAS):
+        self.name = name
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'CACHE_NAMESPACES', {}).get(self.name, DEFAULT_TIMEOUT)
+
+    def key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key):
+        value = self.cache.get(self.key(key))
+        self._flush(self._record(value is not None))
+        return value
+
+    async def aget(self, key):
+        value = await self.cache.aget(self.key(key))
+        await self._aflush(self._record(value is not None))
+        return value
+
+    def set(self, key, value):
+        self.cache.set(self.key(key), value, self.timeout)
+
+    async def aset(self, key, value):
+        await self.cache.aset(self.key(key), value, self.timeout)
+
+    def delete_many(self, keys):
+        keys = [self.key(key) for key in keys]
+        if keys:
+            self.cache.delete_many(keys)
+
+    def invalidate(self, keys, using=None):
+        """Drop the entries for ``keys`` now and once the current transaction commits"""
+        keys = list(keys)
+        self.delete_many(keys)
+        if connections[using or DEFAULT_DB_ALIAS].in_atomic_block:
+            transaction.on_commit(lambda: self.delete_many(keys), using=using)
+
+    def stats(self):
+        """Shared ``{'hits': n, 'misses': n}`` across every process (flushed lookups only)"""
+        values = self.cache.get_many([self._stat_key('hits'), self._stat_key('misses')])
+        return {
+            'hits': values.get(self._stat_key('hits'), 0),
+            'misses': values.get(self._stat_key('misses'), 0),
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many([self._stat_key('hits'), self._stat_key('misses')])
+
+    def _record(self, hit):
+        """Count a lookup; return the counts due for flushing, if any"""
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            if self._hits + self._misses < METRICS_FLUSH:
+                return None
+            counts = {'hits': self._hits, 'misses': self._misses}
+            self._hits = self._misses = 0
+            return counts
+
+    def _flush(self, counts):
+        for stat, count in (counts or {}).items():
+            if count:
+                key = self._stat_key(stat)
+                self.cache.add(key, 0, timeout=None)
+                try:
+                    self.cache.incr(key, count)
+                except ValueError:
+                    # Evicted in between; losing a sample is fine.
+                    pass
+
+    async def _aflush(self, counts):
+        for stat, count in (counts or {}).items():
+            if count:
+                key = self._stat_key(stat)
+                await self.cache.aadd(key, 0, timeout=None)
+                try:
+                    await self.cache.aincr(key, count)
+                except ValueError:
+                    pass
+
+    def _stat_key(self, stat):
+        return f'stats:{self.name}:{stat}'
@@ -0,0 +1,81 @@
+"""
+Conditional GET (``ETag`` / ``Last-Modified``) for API views.
+
+Django's ConditionalGetMiddleware hashes the rendered body, so it saves
+bandwidth but none of the work. Here views compute their validators from
+the few columns a representation depends on, fetched with a narrow query
+(or already loaded for the permission check), and answer a matching
+``If-None-Match`` / ``If-Modified-Since`` with ``304 Not Modified`` before
+any serializer runs:
+
+    validators = (etag, last_modified)
+    response = conditional.not_modified(request, *validators)
+    if response is None:
+        response = conditional.set_validators(<the full response>, *validators)
+
+ETags are strong: they cover the request URL (and so its pagination links),
+the negotiated media type and language, and every value the body is built
+from. ``Last-Modified`` has one-second resolution and can't see deletions;
+clients should prefer ``If-None-Match``.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+
+def is_conditional(request):
+    """True when the request carries a validator worth checking before serializing"""
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def make_etag(request, *parts):
+    """Strong ETag for the representation of ``parts`` at this URL"""
+    key = repr((
+        request.build_absolute_uri(),
+        getattr(request, 'accepted_media_type', None),
+        get_language(),
+        parts,
+    ))
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+def field_values(obj, fields):
+    """
+    The values of ``fields`` (``values_list()`` names, ``__`` spans
+    relations) on a model instance, in the shape ``values_list()`` returns
+    them, so an ETag can be computed either way.
+    """
+    values = []
+    for name in fields:
+        value = obj
+        for attr in name.split('__'):
+            value = getattr(value, attr)
+        values.append(value)
+    return tuple(values)
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 response when the client's copy is current, else None"""
+    if not is_conditional(request):
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """Add ``ETag``/``Last-Modified`` to a successful response"""
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
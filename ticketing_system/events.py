@@ -0,0 +1,243 @@
+"""
+In-process event broadcaster for the Server-Sent Events streams.
+
+Sync code (views, model saves) calls ``publish(channel, event)``; async SSE
+views ``subscribe(channel)`` and receive every event published on that
+channel until they ``unsubscribe()``. Each subscriber is a small bounded
+queue on the server's event loop, so an idle connection costs one parked
+coroutine: no thread, no database connection, no polling.
+
+Where events travel between processes is up to the backend, chosen with
+``EVENT_STREAMS['BACKEND']``:
+
+- ``LocalBackend`` (default): events only reach subscribers in the same
+  process. Enough for a single ASGI worker.
+- ``RedisBackend``: events go through Redis pub/sub, so every worker (and
+  any WSGI process that publishes) shares them. Needs the ``redis`` package.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'ticketing_system.events.LocalBackend',
+    'OPTIONS': {},
+    # Events buffered per subscriber; a client that falls this far behind
+    # is disconnected (it can reconnect and catch up) rather than letting
+    # the buffer grow without bound.
+    'QUEUE_SIZE': 100,
+    # Seconds between keep-alive comments on an idle stream.
+    'HEARTBEAT': 15,
+}
+
+
+class Subscription:
+    """One stream's view of a channel: a bounded queue of events"""
+
+    def __init__(self, channel, size):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.full():
+            # Too far behind: drop the backlog and wake the reader to hang up.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Next event, or None if nothing arrived within ``timeout`` seconds.
+        Raises ConnectionResetError once the subscriber has fallen behind.
+        """
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self.overflowed:
+            raise ConnectionResetError('Subscriber fell behind.')
+        return event
+
+
+class Broadcaster:
+    """Fans events out from a backend to the subscriptions of this process"""
+
+    def __init__(self, backend, queue_size=DEFAULTS['QUEUE_SIZE'], heartbeat=DEFAULTS['HEARTBEAT']):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.loop = None
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, event):
+        """Publish ``event`` (a JSON-serializable dict) from any thread"""
+        self.backend.publish(channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    async def subscribe(self, channel):
+        """
+        Start receiving ``channel``'s events. Always pair with unsubscribe()
+        in a ``finally`` block.
+        """
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(channel, self.queue_size)
+        first = not self._subscriptions[channel]
+        self._subscriptions[channel].add(subscription)
+        if first:
+            await self.backend.subscribe(self, channel)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        # Synchronous on purpose: streaming responses are often closed by
+        # garbage collection, where a finally block can't await.
+        subscribers = self._subscriptions.get(subscription.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.channel]
+            self.backend.unsubscribe(self, subscription.channel)
+
+    def deliver(self, channel, data):
+        """
+        Hand a published payload to the local subscribers of ``channel``.
+        Safe to call from any thread; returns immediately.
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(channel, data)
+        else:
+            loop.call_soon_threadsafe(self._deliver, channel, data)
+
+    def _deliver(self, channel, data):
+        subscribers = self._subscriptions.get(channel)
+        if not subscribers:
+            return
+        event = json.loads(data)
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class LocalBackend:
+    """Deliver events to subscribers in this process only"""
+
+    def __init__(self, **options):
+        self.broadcaster = None
+
+    def publish(self, channel, data):
+        if self.broadcaster is not None:
+            self.broadcaster.deliver(channel, data)
+
+    async def subscribe(self, broadcaster, channel):
+        self.broadcaster = broadcaster
+
+    def unsubscribe(self, broadcaster, channel):
+        pass
+
+
+class RedisBackend:
+    """
+    Share events between processes through Redis pub/sub.
+
+    Each process keeps one pub/sub connection, subscribed to exactly the
+    channels its streams are listening on, whatever the number of streams.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='ticketing:events:', **options):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured(
+                "EVENT_STREAMS['BACKEND'] is RedisBackend but the redis package is not installed."
+            )
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._async_client = redis.asyncio.Redis.from_url(url)
+        self._pubsub = None
+        self._reader = None
+
+    def publish(self, channel, data):
+        try:
+            self._client.publish(self.prefix + channel, data)
+        except Exception:
+            # Live updates are best effort; never fail the write that
+            # triggered them.
+            logger.exception('Could not publish event on %s', channel)
+
+    async def subscribe(self, broadcaster, channel):
+        if self._pubsub is None:
+            self._pubsub = self._async_client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.prefix + channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read(broadcaster))
+
+    def unsubscribe(self, broadcaster, channel):
+        broadcaster.loop.create_task(self._pubsub.unsubscribe(self.prefix + channel))
+
+    async def _read(self, broadcaster):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Event stream connection to Redis failed; retrying')
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                # Nothing subscribed right now; don't spin.
+                await asyncio.sleep(0.1)
+                continue
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = message['data']
+            if isinstance(data, bytes):
+                data = data.decode()
+            broadcaster.deliver(channel[len(self.prefix):], data)
+
+
+_broadcaster = None
+_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """The process-wide Broadcaster, built from ``settings.EVENT_STREAMS``"""
+    global _broadcaster
+    if _broadcaster is None:
+        with _lock:
+            if _broadcaster is None:
+                config = {**DEFAULTS, **getattr(settings, 'EVENT_STREAMS', {})}
+                backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+                _broadcaster = Broadcaster(backend, config['QUEUE_SIZE'], config['HEARTBEAT'])
+    return _broadcaster
+
+
+def publish(channel, event, using=None):
+    """
+    Publish ``event`` on ``channel`` once the current transaction commits,
+    so subscribers never see a change that was rolled back.
+    """
+    transaction.on_commit(lambda: get_broadcaster().publish(channel, event), using=using)
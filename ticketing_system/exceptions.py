@@ -0,0 +1,19 @@
+"""The API's exception handler (``REST_FRAMEWORK['EXCEPTION_HANDLER']``)"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+from accounts.hashers import HashingBusy
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins in progress, try again in a moment.')
+    default_code = 'hashing_busy'
+
+
+def exception_handler(exc, context):
+    """DRF's handler, also answering a full password hashing queue with a 503"""
+    if isinstance(exc, HashingBusy):
+        exc = HashingUnavailable()
+    return drf_exception_handler(exc, context)
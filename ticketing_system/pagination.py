@@ -0,0 +1,179 @@
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import GeneratedField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset ("seek") pagination over ``(<ordering fields>, id)``.
+
+    DRF's CursorPagination positions on the first ordering field only and
+    steps over ties with an OFFSET. Here the cursor carries the value of
+    every ordering field plus the primary key, so the next page is always
+    a single range scan from the previous position:
+
+        WHERE created_at <= :v AND (created_at < :v OR (created_at = :v AND id < :id))
+        ORDER BY created_at DESC, id DESC LIMIT :page_size + 1
+
+    One extra row is fetched to tell whether a following page exists, so no
+    COUNT(*) is ever issued and page N costs the same as page 1.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-created_at'
+    tiebreaker = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: the page is fetched with the async ORM"""
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        The (lazy) queryset for the requested page, including one extra row
+        to detect a following page, or None when pagination is disabled.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor.reverse if self.cursor else False
+        self.current_position = self.cursor.position if self.cursor else None
+
+        ordering = _reverse_keyset(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.current_position is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(ordering, self._decode_position(self.current_position, queryset))
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Take the rows fetched with get_page_queryset() and work out the links"""
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.current_position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Extend the requested ordering with the primary key so that every
+        position in the result set is unique.
+        """
+        ordering = super().get_ordering(request, queryset, view)
+        if any(field.lstrip('-') in (self.tiebreaker, 'pk') for field in ordering):
+            return ordering
+        direction = '-' if ordering[0].startswith('-') else ''
+        return ordering + (direction + self.tiebreaker,)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            # An empty backwards page: resume from where the client came in.
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [
+            instance[field.lstrip('-')] if isinstance(instance, dict)
+            else getattr(instance, field.lstrip('-'))
+            for field in ordering
+        ]
+        return json.dumps(values, default=_encode_value, separators=(',', ':'))
+
+    def _decode_position(self, position, queryset):
+        """Turn a cursor position back into typed values, one per ordering field."""
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                _get_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _keyset_filter(ordering, values):
+        """
+        Build the lexicographic "strictly after ``values``" predicate for
+        ``ordering``. The leading column is also bounded on its own so the
+        planner can drive the scan off an index on that column.
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= equal_prefix & Q(**{name + lookup: value})
+            equal_prefix &= Q(**{name: value})
+
+        leading = ordering[0]
+        bound = '__lte' if leading.startswith('-') else '__gte'
+        return Q(**{leading.lstrip('-') + bound: values[0]}) & condition
+
+
+def _get_field(queryset, name):
+    # Annotations (e.g. a search rank) can be part of the ordering too.
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    if name == 'pk':
+        return queryset.model._meta.pk
+    field = queryset.model._meta.get_field(name)
+    if isinstance(field, GeneratedField):
+        return field.output_field
+    return field
+
+
+def _encode_value(value):
+    # Full precision on purpose: DjangoJSONEncoder truncates datetimes to
+    # milliseconds, which would make the cursor skip or repeat rows.
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _reverse_keyset(ordering):
+    return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
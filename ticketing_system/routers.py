@@ -0,0 +1,174 @@
+"""
+Read/write splitting across ``settings.DATABASE_REPLICAS``.
+
+ReplicaRoutingMiddleware picks one replica per GET/HEAD/OPTIONS request and
+ReplicaRouter sends that request's reads to it; everything else (writes,
+reads in other requests, in transactions or outside requests, such as
+management commands) goes to the primary, ``default``.
+
+Replicas lag, so a client that has just written is pinned to the primary
+for ``DATABASE_PIN_SECONDS`` and reads its own writes: the pin is keyed by
+the request's credentials (Authorization header, else session cookie, or
+the new session cookie the response sets, as a login's does) and kept in
+the shared cache's ``pins`` namespace, so every worker honours it.
+A request that writes reads from the primary for the rest of its course.
+
+Views that must always read from the primary set ``read_from_replica =
+False`` (or are wrapped in ``read_from_primary``); a block of code can use
+``primary_reads()``. Reads that fill the shared cache use the latter, so a
+lagging replica can't put back a row that was just invalidated.
+
+With no replicas configured the router stays out of the way.
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .cache import Namespace
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+pins = Namespace('pins')
+
+_routing = contextvars.ContextVar('database_routing', default=None)
+_primary = contextvars.ContextVar('database_primary_reads', default=False)
+
+
+class _Routing:
+    """Where the current request reads from, and whether it has written"""
+
+    def __init__(self, request, replica):
+        self.request = request
+        self.replica = replica
+        self.wrote = False
+
+    def read_alias(self):
+        if self.replica is None or self.wrote:
+            return DEFAULT_DB_ALIAS
+        match = self.request.resolver_match
+        if match is not None and not _reads_from_replica(match.func):
+            self.replica = None
+            return DEFAULT_DB_ALIAS
+        return self.replica
+
+
+class ReplicaRouter:
+    """Reads to the request's replica, writes (and migrations) to the primary"""
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None:
+            return None
+        if _primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Not None: an instance read from a replica must be saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route the request's reads (see the module docstring) and pin clients that write"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        key = client_key(request)
+        pinned = key is not None and request.method in SAFE_METHODS and pins.get(key) is not None
+        routing = self._routing(request, pinned)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        key = client_key(request, response) if routing.wrote else None
+        if key is not None:
+            pins.set(key, True)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        key = client_key(request)
+        pinned = key is not None and request.method in SAFE_METHODS and await pins.aget(key) is not None
+        routing = self._routing(request, pinned)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        key = client_key(request, response) if routing.wrote else None
+        if key is not None:
+            await pins.aset(key, True)
+        return response
+
+    @staticmethod
+    def _routing(request, pinned):
+        if request.method not in SAFE_METHODS or pinned:
+            return _Routing(request, None)
+        return _Routing(request, random.choice(settings.DATABASE_REPLICAS))
+
+
+def client_key(request, response=None):
+    """
+    A digest of the request's credentials, or None for an anonymous request.
+    Given the response, a session cookie it sets replaces the request's.
+    """
+    session = response.cookies.get(settings.SESSION_COOKIE_NAME) if response is not None else None
+    credentials = request.headers.get('Authorization') or (
+        session.value if session is not None else request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return hashlib.blake2b(credentials.encode(), digest_size=16).hexdigest()
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary within the block"""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def _reads_from_replica(view):
+    # The flag is on the view function (read_from_primary) or its class.
+    if hasattr(view, 'read_from_replica'):
+        return view.read_from_replica
+    return getattr(getattr(view, 'cls', None), 'read_from_replica', True)
+
+
+def read_from_primary(view):
+    """Mark a view (function or class) as always reading from the primary"""
+    view.read_from_replica = False
+    return view
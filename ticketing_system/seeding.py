@@ -0,0 +1,268 @@
+"""
+Deterministic synthetic data for benchmarks: customers, agents and admins,
+tickets spread over a time window with realistic status and priority mixes,
+and message threads whose lengths follow a long-tailed (log-normal)
+distribution: most tickets get a few replies, a few get hundreds.
+
+The same seed, sizes and ``until`` produce the same rows. Everything is
+written with ``bulk_create``, one transaction per batch, with foreign keys
+set as ids. What the other write paths maintain (conversation counters,
+closed and first-response times, the statistics rollups) is computed while
+generating rather than fixed up afterwards, so each batch costs its INSERTs
+and nothing else, and memory stays bounded by the batch size.
+
+``manage.py seed_data`` runs it. Seeded users share the password
+``PASSWORD``, so benchmarks can log in as any of them.
+"""
+import math
+import random
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import UTC, date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from conversations.models import Message
+from tickets import stats
+from tickets.models import Ticket
+
+EMAIL_DOMAIN = 'seed.example.com'
+PASSWORD = 'Seed-passw0rd!'
+BATCH_SIZE = 2000
+
+PRIORITY_WEIGHTS = {'low': 50, 'medium': 35, 'high': 15}
+# Mean hours to the first staff response, by priority.
+FIRST_RESPONSE_HOURS = {'low': 12, 'medium': 4, 'high': 1}
+# Mean hours between later messages, and from the last one to closing.
+REPLY_HOURS = 8
+CLOSE_HOURS = 12
+# Tickets older than this are closed CLOSED_SHARE of the time; younger ones
+# proportionally less.
+SETTLED_DAYS = 14
+CLOSED_SHARE = 0.9
+# Spread of the thread lengths' log-normal distribution: 1.2 puts about 1%
+# of threads above 15 times the mean.
+THREAD_SIGMA = 1.2
+
+FIRST_NAMES = (
+    'Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken',
+    'Frances', 'Edsger', 'Radia', 'Guido', 'Katherine', 'Tim', 'Hedy', 'Bjarne',
+)
+LAST_NAMES = (
+    'Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov',
+    'Thompson', 'Allen', 'Dijkstra', 'Perlman', 'van Rossum', 'Johnson', 'Lee',
+)
+SUBJECTS = (
+    'Printer', 'VPN', 'Laptop', 'Email', 'Password reset', 'Invoice', 'Wi-Fi',
+    'Monitor', 'Calendar', 'Shared drive', 'Phone', 'Badge reader', 'Payroll',
+)
+PROBLEMS = (
+    'not working', 'keeps disconnecting', 'very slow', 'shows an error',
+    'needs replacing', 'access denied', 'stopped syncing', 'request',
+)
+DETAILS = (
+    'It started this morning.', 'Restarting did not help.', 'Colleagues have the same issue.',
+    'This blocks my work.', 'It happens a few times a day.', 'I attached a screenshot.',
+    'It worked fine yesterday.', 'Nothing changed on my side.',
+)
+CUSTOMER_REPLIES = (
+    'Any update on this?', 'Still happening, unfortunately.', 'Thanks, that fixed it.',
+    'I tried that, no luck.', 'Here are the details you asked for.', 'It is back again.',
+)
+STAFF_REPLIES = (
+    'Thanks for reporting, looking into it.', 'Could you send the exact error message?',
+    'We have applied a fix, please try again.', 'Escalated to the network team.',
+    'Please restart and let us know.', 'A replacement is on its way.',
+)
+
+
+class Seeder:
+    """
+    Seed ``customers``, ``agents`` and ``admins``, then ``tickets`` created
+    over the ``days`` before ``until`` (default: today, midnight) with
+    ``messages`` messages between them in all.
+
+    ``run()`` yields ``{'users': n}`` once, ``{'tickets': n, 'messages': m}``
+    per committed batch and ``{'statistics': rows}`` at the end.
+    """
+
+    def __init__(self, customers=1000, agents=20, admins=2, tickets=10000, messages=100000,
+                 days=365, seed=0, until=None, batch_size=BATCH_SIZE, using=None):
+        self.customers = customers
+        self.agents = agents
+        self.admins = admins
+        self.tickets = tickets
+        self.messages = messages
+        self.days = days
+        self.until = until or timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.batch_size = batch_size
+        self.using = using
+        self.random = random.Random(seed)
+
+    def run(self):
+        User = get_user_model()
+        users = self._create_users(User)
+        yield {'users': sum(len(ids) for ids in users.values())}
+        rollup = stats.Rollup()
+        yield from self._create_tickets(
+            users[User.UserRole.CUSTOMER], users[User.UserRole.AGENT] or users[User.UserRole.ADMIN], rollup,
+        )
+        with transaction.atomic(using=self.using):
+            rows = len(rollup.deltas)
+            rollup.apply(self.using)
+        yield {'statistics': rows}
+
+    def _create_users(self, User):
+        password = make_password(PASSWORD)
+        start = self.until - timedelta(days=self.days)
+        roles = (
+            (User.UserRole.CUSTOMER, 'customer', self.customers),
+            (User.UserRole.AGENT, 'agent', self.agents),
+            (User.UserRole.ADMIN, 'admin', self.admins),
+        )
+        users = {}
+        for role, prefix, count in roles:
+            ids = users[role] = []
+            for first in range(0, count, self.batch_size):
+                batch = [
+                    User(
+                        email=f'{prefix}{i}@{EMAIL_DOMAIN}',
+                        username=f'{prefix}{i}',
+                        password=password,
+                        first_name=self.random.choice(FIRST_NAMES),
+                        last_name=self.random.choice(LAST_NAMES),
+                        role=role,
+                        is_staff=role == User.UserRole.ADMIN,
+                        date_joined=start - timedelta(days=self.random.uniform(0, 365)),
+                    )
+                    for i in range(first, min(first + self.batch_size, count))
+                ]
+                with transaction.atomic(using=self.using):
+                    ids.extend(user.pk for user in User.objects.using(self.using).bulk_create(batch))
+        return users
+
+    def _create_tickets(self, customers, staff, rollup):
+        if self.tickets and not customers:
+            raise ValueError('Tickets need at least one customer.')
+        if self.messages and not staff:
+            raise ValueError('Messages need at least one agent or admin.')
+        window = self.days * 86400
+        # Sorted, so ids grow with creation time like real ones.
+        offsets = sorted(self.random.random() * window for _ in range(self.tickets))
+        lengths = self._thread_lengths()
+        for first in range(0, self.tickets, self.batch_size):
+            tickets, messages = [], []
+            for i in range(first, min(first + self.batch_size, self.tickets)):
+                created_at = self.until - timedelta(seconds=window - offsets[i])
+                ticket, thread = self._ticket(created_at, lengths[i], customers, staff)
+                tickets.append(ticket)
+                messages.append(thread)
+            with transaction.atomic(using=self.using), explicit_timestamps(Ticket, Message):
+                Ticket.objects.using(self.using).bulk_create(tickets)
+                for ticket, thread in zip(tickets, messages):
+                    for message in thread:
+                        message.ticket_id = ticket.pk
+                    rollup.add(stats.Facts.of(ticket, first_responder_id=ticket._first_responder_id))
+                messages = [message for thread in messages for message in thread]
+                Message.objects.using(self.using).bulk_create(messages, batch_size=self.batch_size)
+            yield {'tickets': len(tickets), 'messages': len(messages)}
+
+    def _thread_lengths(self):
+        """Long-tailed thread lengths adding up to exactly ``messages``"""
+        if not self.tickets:
+            return []
+        weights = [self.random.lognormvariate(0, THREAD_SIGMA) for _ in range(self.tickets)]
+        scale = self.messages / math.fsum(weights)
+        lengths = [int(weight * scale) for weight in weights]
+        for i in self.random.sample(range(self.tickets), self.messages - sum(lengths)):
+            lengths[i] += 1
+        return lengths
+
+    def _ticket(self, created_at, length, customers, staff):
+        """An unsaved ticket and its thread, with the ticket's derived fields filled in"""
+        rng = self.random
+        priority = rng.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()))[0]
+        owner = rng.choice(customers)
+        agent = rng.choice(staff) if length else None
+        # The first reply is the staff's, later ones either side's; the
+        # gaps between them are exponential.
+        gaps, senders = [], []
+        for index in range(length):
+            gaps.append(rng.expovariate(1 / (REPLY_HOURS if index else FIRST_RESPONSE_HOURS[priority])))
+            senders.append(not index or rng.random() < 0.5)
+        span = (self.until - created_at).total_seconds() / 3600
+        times = list(accumulate(gaps))
+        if times and times[-1] > span:
+            # Squeeze threads that would run past ``until``.
+            times = [value * span / times[-1] * 0.99 for value in times]
+        thread = [
+            Message(
+                sender_id=agent if is_staff else owner,
+                content=rng.choice(STAFF_REPLIES if is_staff else CUSTOMER_REPLIES),
+                is_admin_response=is_staff,
+                created_at=created_at + timedelta(hours=value),
+                updated_at=created_at + timedelta(hours=value),
+            )
+            for is_staff, value in zip(senders, times)
+        ]
+
+        last_at = thread[-1].created_at if thread else None
+        settled = min(1, (self.until - created_at).days / SETTLED_DAYS)
+        if rng.random() < CLOSED_SHARE * settled:
+            status = Ticket.Status.CLOSED
+            closed_at = min((last_at or created_at) + timedelta(hours=rng.expovariate(1 / CLOSE_HOURS)), self.until)
+        else:
+            # Waiting on the customer after a staff reply, on the staff otherwise.
+            status = Ticket.Status.PENDING if thread and senders[-1] else Ticket.Status.OPEN
+            closed_at = None
+        staff_times = [message.created_at for message in thread if message.is_admin_response]
+        ticket = Ticket(
+            user_id=owner,
+            title=f'{rng.choice(SUBJECTS)} {rng.choice(PROBLEMS)}',
+            description=' '.join(rng.sample(DETAILS, rng.randint(1, 3))),
+            status=status,
+            priority=priority,
+            created_at=created_at,
+            updated_at=closed_at or last_at or created_at,
+            message_count=length,
+            last_message_at=last_at,
+            last_staff_response_at=staff_times[-1] if staff_times else None,
+            closed_at=closed_at,
+            first_response_at=staff_times[0] if staff_times else None,
+        )
+        ticket._first_responder_id = agent if staff_times else None
+        return ticket, thread
+
+
+def already_seeded(using=None):
+    """Whether seeded users exist (their emails would clash)"""
+    return get_user_model().objects.using(using).filter(email__endswith=f'@{EMAIL_DOMAIN}').exists()
+
+
+def parse_until(value):
+    """A ``YYYY-MM-DD`` option as the ``until`` it means: that day's midnight (UTC), like the default's"""
+    return datetime.combine(date.fromisoformat(value), datetime.min.time(), tzinfo=UTC)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Have bulk_create keep the created_at/updated_at given to the models'
+    instances instead of stamping the current time (auto_now/auto_now_add).
+    Process-wide while it lasts, so keep it around the writes alone, never
+    across a yield: for commands, not for serving requests.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
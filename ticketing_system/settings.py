@@ -1,7 +1,8 @@
 from pathlib import Path
 from datetime import timedelta
 import os
-from decouple import config
+import tempfile
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,12 +39,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ticketing_system.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.hashers.HashingMiddleware',
 ]
 TEMPLATES = [
     {
@@ -68,6 +71,12 @@ TEMPLATES = [
 
 ROOT_URLCONF = 'ticketing_system.urls'
 WSGI_APPLICATION = 'ticketing_system.wsgi.application'
+ASGI_APPLICATION = 'ticketing_system.asgi.application'
+
+# Serve the hot read paths with async views (ticketing_system.async_views).
+# Only worth it under an ASGI server; under WSGI each async view would need
+# an event loop of its own.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
 
 
 # Authentication & Authorization
@@ -78,12 +87,13 @@ AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.AutoSchema',
+    'EXCEPTION_HANDLER': 'ticketing_system.exceptions.exception_handler',
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle'
@@ -100,6 +110,7 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'email',
     'USER_ID_CLAIM': 'email',
     'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.CustomTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
@@ -107,15 +118,134 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Revoked refresh tokens (rotation, logout) are kept in accounts.revocation,
+# not the token_blacklist app. See DEFAULTS there for the other options.
+TOKEN_REVOCATION = {
+    'SYNC_INTERVAL': config('TOKEN_REVOCATION_SYNC_INTERVAL', default=1, cast=float),
+}
+
+# Authenticate tokens issued at login from their claims, without loading the
+# user unless the view needs more than the claims (accounts.authentication).
+JWT_CLAIMS_AUTH = config('JWT_CLAIMS_AUTH', default=True, cast=bool)
+
+
+# Live events (Server-Sent Events, see ticketing_system.events). Use
+# ticketing_system.events.RedisBackend when running several workers.
+EVENT_STREAMS = {
+    'BACKEND': config('EVENT_STREAMS_BACKEND', default='ticketing_system.events.LocalBackend'),
+    'OPTIONS': {'url': config('REDIS_URL', default='redis://localhost:6379/0')},
+}
+
+
+# Shared cache: DRF throttle counters, JWT user lookups and ticket detail
+# reads (see ticketing_system.cache). Set CACHE_URL to a Redis-protocol
+# server (redis://...) when running several workers or hosts; without it a
+# file-based cache, shared by the processes of this host, stands in.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'ticketing',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'ticketing_system_cache')),
+            'KEY_PREFIX': 'ticketing',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Closed tickets untouched for this long move to the archive tables
+# (tickets.archive, `manage.py archive_tickets`).
+TICKET_ARCHIVE_AFTER = timedelta(days=config('TICKET_ARCHIVE_AFTER_DAYS', default=180, cast=int))
+
+# Most tickets a ?search= returns, best matches first (tickets.filters);
+# responses cut short carry a Search-Limit header.
+TICKET_SEARCH_MAX_RESULTS = config('TICKET_SEARCH_MAX_RESULTS', default=1000, cast=int)
+
+# Seconds an entry lives in each cache namespace (ticketing_system.cache).
+CACHE_NAMESPACES = {
+    'users': config('CACHE_USERS_TTL', default=300, cast=int),
+    'tickets': config('CACHE_TICKETS_TTL', default=60, cast=int),
+    # Read through from the users table; see accounts.cache.
+    'claims': config('CACHE_CLAIMS_TTL', default=300, cast=int),
+    # How long a client that wrote reads from the primary (ticketing_system.routers).
+    'pins': config('DATABASE_PIN_SECONDS', default=5, cast=int),
+}
+
+# The test suite gets a private, throwaway cache (ticketing_system.test_runner).
+TEST_RUNNER = 'ticketing_system.test_runner.TestRunner'
+
 
 # Database
+# SQLite, set up on connect for several workers sharing the file: in WAL
+# mode readers don't wait for the writer, and transactions take the write
+# lock when they begin (BEGIN IMMEDIATE), so a writer queues for up to
+# SQLITE_BUSY_TIMEOUT seconds instead of failing with "database is locked"
+# when a read turns into a write. `manage.py sqlite_maintenance`
+# checkpoints, analyzes and vacuums it.
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    # NORMAL is safe in WAL mode; a power loss can only drop the last commits.
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    # Negative: KiB of page cache per connection.
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections (and their page cache) across requests.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=float),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# Read replicas (ticketing_system.routers): GET requests read from one of
+# these aliases. SQLITE_REPLICAS lists database files standing in for
+# replicas; `manage.py sync_replicas` copies the primary into them.
+DATABASE_REPLICAS = []
+for number, path in enumerate(config('SQLITE_REPLICAS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        # Tests read their writes back from the test database.
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['ticketing_system.routers.ReplicaRouter']
+
+
+# Password hashing: PBKDF2 on a bounded pool (accounts.hashers). Passwords
+# hashed with other parameters are rehashed at their owner's next login.
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHING = {
+    'ITERATIONS': config('PASSWORD_HASH_ITERATIONS', default=0, cast=int),
+    'WORKERS': config('PASSWORD_HASH_WORKERS', default=max(1, (os.cpu_count() or 2) // 2), cast=int),
+    'QUEUE_SIZE': config('PASSWORD_HASH_QUEUE_SIZE', default=64, cast=int),
+}
+
 
 # Password Validation
 AUTH_PASSWORD_VALIDATORS = [
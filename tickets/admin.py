@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import Ticket
+from . import search
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
@@ -9,6 +11,8 @@ class TicketAdmin(admin.ModelAdmin):
         'user', 
         'status', 
         'priority', 
+        'message_count',
+        'last_message_at',
         'created_at'
     ]
     
@@ -24,13 +28,27 @@ class TicketAdmin(admin.ModelAdmin):
         'user__email'
     ]
     
+    search_results_limit = 1000
+
     readonly_fields = [
         'created_at', 
-        'updated_at'
+        'updated_at',
+        'message_count',
+        'last_message_at',
+        'last_staff_response_at'
     ]
     
     fieldsets = (
         (None, {'fields': ('user', 'title', 'description')}),
         ('Status', {'fields': ('status', 'priority')}),
+        ('Conversation', {'fields': ('message_count', 'last_message_at', 'last_staff_response_at')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
-    )
\ No newline at end of file
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Use the full-text index for text and a prefix match for the owner's email"""
+        search_term = search_term.strip()
+        if not search_term or not search.supports_full_text(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        ids = search.rank_tickets(queryset, search_term, limit=self.search_results_limit)
+        return queryset.filter(Q(pk__in=ids) | Q(user__email__istartswith=search_term)), False
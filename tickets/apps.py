@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
 
 
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        from . import stats
+        from .cache import owner_saved, ticket_deleted
+        from .search import ensure_search_indexes
+        post_migrate.connect(ensure_search_indexes, sender=self)
+        post_delete.connect(ticket_deleted, sender=self.get_model('Ticket'))
+        pre_delete.connect(stats.ticket_deleting, sender=self.get_model('Ticket'))
+        post_delete.connect(stats.ticket_deleted, sender=self.get_model('Ticket'))
+        post_save.connect(owner_saved, sender=settings.AUTH_USER_MODEL)
@@ -0,0 +1,78 @@
+"""
+Hot/cold archival of closed tickets.
+
+Tickets closed before a cut-off, with no message since, move with their
+messages from ``tickets_ticket``/``conversations_message`` to the
+compact ArchivedTicket/ArchivedMessage tables, ``batch_size`` tickets per
+transaction. They keep their ids, so the ticket detail and message list
+endpoints still serve them, read-only; they leave the ticket list, the work
+queue and full-text search, and stop weighing on the hot tables' indexes.
+
+``manage.py archive_tickets`` runs it; the cut-off defaults to
+``settings.TICKET_ARCHIVE_AFTER``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from conversations.models import ArchivedMessage, Message
+from . import stats
+from .models import ArchivedTicket, Ticket
+
+BATCH_SIZE = 500
+MESSAGE_CHUNK_SIZE = 2000
+
+
+def archive_cutoff():
+    """Tickets closed before this are due for archival"""
+    return timezone.now() - getattr(settings, 'TICKET_ARCHIVE_AFTER', timedelta(days=180))
+
+
+def archive_closed_tickets(before=None, batch_size=BATCH_SIZE, using=None):
+    """
+    Archive the tickets closed, and last written to, before ``before``
+    (default: archive_cutoff()). Yields ``(tickets, messages)`` archived per
+    committed batch.
+    """
+    before = before or archive_cutoff()
+    due = Ticket.objects.using(using).filter(
+        # New messages don't touch updated_at; a closed ticket can still
+        # get replies. Imports may leave closed_at unknown.
+        Q(closed_at__lt=before) | Q(closed_at__isnull=True, updated_at__lt=before),
+        Q(last_message_at__lt=before) | Q(last_message_at__isnull=True),
+        status=Ticket.Status.CLOSED,
+    ).order_by()
+    while True:
+        with transaction.atomic(using=using):
+            # Locked (where the backend can) so a ticket reopened meanwhile
+            # isn't archived; SQLite's BEGIN IMMEDIATE already excludes writers.
+            tickets = list(due.select_for_update()[:batch_size])
+            if not tickets:
+                return
+            ids = [ticket.pk for ticket in tickets]
+            ArchivedTicket.objects.using(using).bulk_create([ArchivedTicket.from_ticket(ticket) for ticket in tickets])
+            messages = _archive_messages(ids, using)
+            # Messages go with their tickets (the cascade deletes them in
+            # one statement); post_delete drops the tickets' cached copies.
+            # Archived tickets still count: the rollups stay as they are.
+            with stats.kept():
+                Ticket.objects.using(using).filter(pk__in=ids).delete()
+        yield len(ids), messages
+
+
+def _archive_messages(ticket_ids, using):
+    rows = Message.objects.using(using).filter(ticket_id__in=ticket_ids).order_by().values_list(
+        *ArchivedMessage.COPIED_FIELDS
+    )
+    archived = 0
+    chunk = []
+    for row in rows.iterator(chunk_size=MESSAGE_CHUNK_SIZE):
+        chunk.append(ArchivedMessage(**dict(zip(ArchivedMessage.COPIED_FIELDS, row))))
+        if len(chunk) >= MESSAGE_CHUNK_SIZE:
+            archived += len(ArchivedMessage.objects.using(using).bulk_create(chunk))
+            chunk = []
+    if chunk:
+        archived += len(ArchivedMessage.objects.using(using).bulk_create(chunk))
+    return archived
@@ -0,0 +1,36 @@
+"""
+Serialized tickets for the detail endpoint, in the shared cache (see
+ticketing_system.cache), keyed by ticket id.
+
+An entry holds TicketSerializer's output, the row of
+``TicketViewMixin.etag_fields`` its validators come from, and the language
+it was rendered in. Every write that changes what the serializer reads
+invalidates it: Ticket.save(), ticket deletes, bulk updates, new and
+deleted messages, the importer, refresh_ticket_counters and changes to the
+ticket owner's profile.
+"""
+from django.apps import apps
+from ticketing_system.cache import Namespace
+
+tickets = Namespace('tickets')
+
+# The user fields UserSerializer nests into every ticket.
+OWNER_FIELDS = {'email', 'first_name', 'last_name', 'is_staff', 'role'}
+
+
+def invalidate(ids, using=None):
+    tickets.invalidate(ids, using)
+
+
+def ticket_deleted(sender, instance, using, **kwargs):
+    """post_delete receiver for Ticket"""
+    invalidate([instance.pk], using)
+
+
+def owner_saved(sender, instance, created, using, update_fields, **kwargs):
+    """post_save receiver for the user model"""
+    if created or (update_fields is not None and not OWNER_FIELDS & set(update_fields)):
+        return
+    for model in ('Ticket', 'ArchivedTicket'):
+        tickets = apps.get_model('tickets', model).objects.using(using).filter(user=instance)
+        invalidate(tickets.values_list('pk', flat=True), using)
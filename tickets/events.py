@@ -0,0 +1,56 @@
+"""
+Live ticket events, pushed to the Server-Sent Events streams in
+tickets.streams through the broadcaster in ticketing_system.events.
+
+Channels:
+
+- ``ticket.<id>``: ``message.created`` and ``ticket.updated`` for one ticket.
+- ``queue``: ``ticket.created`` and ``ticket.updated`` for the agent work queue.
+
+Events are published when the surrounding transaction commits.
+"""
+from ticketing_system.events import publish
+
+QUEUE_CHANNEL = 'queue'
+
+
+def ticket_channel(ticket_id):
+    return f'ticket.{ticket_id}'
+
+
+def ticket_created(ticket, using=None):
+    publish(QUEUE_CHANNEL, {'event': 'ticket.created', 'data': _ticket_data(ticket)}, using)
+
+
+def ticket_updated(ticket, using=None):
+    tickets_updated([ticket.pk], _ticket_data(ticket), using)
+
+
+def tickets_updated(ids, changes, using=None):
+    """One ``ticket.updated`` per ticket in ``ids``, all carrying ``changes``"""
+    for pk in ids:
+        event = {'event': 'ticket.updated', 'data': {**changes, 'id': pk}}
+        publish(ticket_channel(pk), event, using)
+        publish(QUEUE_CHANNEL, event, using)
+
+
+def message_created(message, using=None):
+    # Same shape as the messages endpoint returns.
+    from conversations.serializers import MessageSerializer
+    publish(ticket_channel(message.ticket_id), {
+        'event': 'message.created',
+        'id': message.pk,
+        'data': MessageSerializer(message).data,
+    }, using)
+
+
+def _ticket_data(ticket):
+    return {
+        'id': ticket.pk,
+        'user': ticket.user_id,
+        'title': ticket.title,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'created_at': ticket.created_at,
+        'updated_at': ticket.updated_at,
+    }
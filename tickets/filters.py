@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+from . import search
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the database full-text index (see tickets.search)
+    instead of ``icontains`` scans.
+
+    Matches on the ticket title/description or any of its messages and
+    annotates ``search_rank`` (0 is the best match) for RelevanceOrderingFilter
+    and the keyset paginator. At most ``max_results`` tickets are returned
+    (settings.TICKET_SEARCH_MAX_RESULTS); a search that matches more sets
+    ``view.search_limit``, which the ticket views report in a
+    ``Search-Limit`` header.
+    """
+
+    @property
+    def max_results(self):
+        return settings.TICKET_SEARCH_MAX_RESULTS
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term or not search.supports_full_text(queryset.db):
+            return self._filter(request, queryset, view, term, None)
+        # One more than the limit tells whether it cut anything off.
+        return self._filter(request, queryset, view, term,
+                            search.rank_tickets(queryset, term, limit=self.max_results + 1))
+
+    async def afilter_queryset(self, request, queryset, view):
+        """filter_queryset() for async views; the ranking query has no async API"""
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term or not search.supports_full_text(queryset.db):
+            return self._filter(request, queryset, view, term, None)
+        ids = await sync_to_async(search.rank_tickets)(queryset, term, limit=self.max_results + 1)
+        return self._filter(request, queryset, view, term, ids)
+
+    def _filter(self, request, queryset, view, term, ids):
+        if not term:
+            return queryset
+
+        if ids is None:
+            queryset = super().filter_queryset(request, queryset, view)
+            return queryset.annotate(search_rank=Value(0, output_field=IntegerField()))
+
+        if len(ids) > self.max_results:
+            ids = ids[:self.max_results]
+            view.search_limit = self.max_results
+        if not ids:
+            return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+        return queryset.filter(pk__in=ids).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(ids)],
+                output_field=IntegerField(),
+            )
+        )
+
+
+class RelevanceOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that defaults to relevance when a search is active.
+
+    ``view.ordering_aliases`` maps a public ordering name to the column that
+    actually sorts it (e.g. ``priority`` to ``priority_rank``).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if (
+            not request.query_params.get(self.ordering_param)
+            and 'search_rank' in queryset.query.annotations
+        ):
+            return ['search_rank']
+        ordering = super().get_ordering(request, queryset, view)
+        aliases = getattr(view, 'ordering_aliases', {})
+        if not ordering or not aliases:
+            return ordering
+        return [
+            ('-' if term.startswith('-') else '') + aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
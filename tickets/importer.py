@@ -0,0 +1,349 @@
+"""
+Streaming NDJSON import of tickets and messages.
+
+Every line is one JSON record:
+
+    {"type": "ticket", "user": "<owner email>", "title": "...", "description": "...",
+     "status": "closed", "priority": "medium", "created_at": "<ISO 8601>",
+     "closed_at": "<ISO 8601>",
+     "messages": [{"sender": "<email>", "content": "...", "created_at": "..."}]}
+
+    {"type": "message", "ticket": <existing ticket id>, "sender": "<email>",
+     "content": "...", "created_at": "..."}
+
+``status``, ``priority``, ``created_at``, ``closed_at`` and ``messages`` are
+optional. ``closed_at`` (closed tickets with a ``created_at`` only) is when
+the ticket was closed; a closed ticket without one counts as closed in the
+statistics, with no resolution time. A ticket line is imported together
+with its inline thread or not at all.
+
+Lines are read lazily and processed ``batch_size`` at a time: each batch is
+validated with TicketSerializer/MessageSerializer rules, resolved with one
+user and one ticket lookup, and written with ``bulk_create`` in its own
+transaction. Invalid lines are reported and skipped without affecting the
+rest of the batch, so memory stays bounded by the batch size. If the
+database refuses the batch, its records are written one by one, and the
+lines refused are reported.
+"""
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from conversations.models import Message
+from conversations.serializers import MessageSerializer
+from . import cache, stats
+from .models import Ticket
+from .serializers import TicketSerializer
+
+
+class RecordError(Exception):
+    """A line that can't be imported; ``detail`` is reported back as-is"""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class NDJSONImporter:
+    """
+    Import NDJSON records on behalf of ``actor``, the staff user whose
+    permissions apply to ticket fields (e.g. closing tickets).
+
+    ``run()`` yields one result dict per rejected line, one per committed
+    batch and a final summary, so callers can stream the report.
+    """
+    batch_size = 500
+
+    def __init__(self, actor, batch_size=None, using=None):
+        self.actor = actor
+        self.batch_size = batch_size or self.batch_size
+        self.using = using
+        self.tickets = 0
+        self.messages = 0
+        self.errors = 0
+        # Like ListSerializer's child: one serializer instance validates many
+        # records, so fields are built once instead of once per line.
+        self._ticket_serializer = TicketSerializer(context=self._context(actor))
+        self._message_serializers = {}
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            if not line.strip():
+                continue
+            batch.append((number, line))
+            if len(batch) >= self.batch_size:
+                yield from self._process_batch(batch)
+                batch = []
+        if batch:
+            yield from self._process_batch(batch)
+        yield {
+            'summary': {'tickets': self.tickets, 'messages': self.messages, 'errors': self.errors},
+        }
+
+    def _process_batch(self, batch):
+        records, errors = [], []
+        for number, line in batch:
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict) or record.get('type') not in ('ticket', 'message'):
+                    raise RecordError('Expected an object with "type" set to "ticket" or "message".')
+                records.append((number, record))
+            except ValueError as exc:
+                errors.append({'line': number, 'error': f'Invalid JSON: {exc}'})
+            except RecordError as exc:
+                errors.append({'line': number, 'error': exc.detail})
+
+        users = self._load_users(records)
+        tickets = self._load_tickets(records)
+        self._message_serializers.clear()
+
+        built = []
+        for number, record in records:
+            try:
+                if record['type'] == 'ticket':
+                    built.append((number, self._build_ticket(record, users)))
+                else:
+                    ticket = tickets.get(record['ticket']) if _is_id(record.get('ticket')) else None
+                    built.append((number, self._build_message(record, ticket, users)))
+            except RecordError as exc:
+                errors.append({'line': number, 'error': exc.detail})
+
+        committed = {'tickets': 0, 'messages': 0}
+        if built:
+            try:
+                committed = self._write(
+                    [obj for _, obj in built if isinstance(obj, Ticket)],
+                    [obj for _, obj in built if isinstance(obj, Message)],
+                )
+            except DatabaseError:
+                committed = self._write_each(built, errors)
+
+        self.errors += len(errors)
+        self.tickets += committed['tickets']
+        self.messages += committed['messages']
+        errors.sort(key=lambda error: error.get('line', 0))
+        yield from errors
+        yield {'batch': {'lines': [batch[0][0], batch[-1][0]], **committed}}
+
+    def _load_users(self, records):
+        """Owners and senders of the whole batch in one query, keyed by email"""
+        emails = set()
+        for _, record in records:
+            emails.add(record.get('user') if record['type'] == 'ticket' else record.get('sender'))
+            messages = record.get('messages')
+            for message in messages if isinstance(messages, list) else []:
+                if isinstance(message, dict):
+                    emails.add(message.get('sender'))
+        emails = {email for email in emails if isinstance(email, str)}
+        User = get_user_model()
+        return {
+            user.email: user
+            for user in User.objects.using(self.using).filter(email__in=emails, is_active=True)
+        }
+
+    def _load_tickets(self, records):
+        """Existing tickets referenced by message lines, in one query"""
+        ids = {
+            record['ticket'] for _, record in records
+            if record['type'] == 'message' and _is_id(record.get('ticket'))
+        }
+        if not ids:
+            return {}
+        return Ticket.objects.using(self.using).only('pk', 'user_id').in_bulk(ids)
+
+    def _build_ticket(self, record, users):
+        owner = self._get_user(users, record.get('user'), 'user')
+        ticket = Ticket(user=owner, **self._validate(self._ticket_serializer, record))
+        ticket._import_created_at = self._parse_timestamp(record)
+        ticket._import_closed_at = self._parse_timestamp(record, 'closed_at')
+        if ticket._import_closed_at is not None:
+            if ticket.status != Ticket.Status.CLOSED:
+                raise RecordError({'closed_at': 'Only closed tickets have a closing time.'})
+            if ticket._import_created_at is None:
+                raise RecordError({'closed_at': 'Requires created_at.'})
+            if ticket._import_closed_at < ticket._import_created_at:
+                raise RecordError({'closed_at': 'Must not be before created_at.'})
+
+        messages = record.get('messages') or []
+        if not isinstance(messages, list):
+            raise RecordError({'messages': 'Expected a list.'})
+        ticket._import_messages = [
+            self._build_message(message, ticket, users, field=f'messages[{index}]')
+            for index, message in enumerate(messages)
+        ]
+        return ticket
+
+    def _build_message(self, record, ticket, users, field=None):
+        def error(detail):
+            return RecordError({field: detail} if field else detail)
+
+        if not isinstance(record, dict):
+            raise error('Expected an object.')
+        if ticket is None:
+            raise error({'ticket': 'Ticket not found.'})
+        try:
+            sender = self._get_user(users, record.get('sender'), 'sender')
+        except RecordError as exc:
+            raise error(exc.detail)
+
+        # Same access rule as HasTicketAccess: owner, staff or agent.
+        is_staff_sender = sender.is_staff or sender.is_agent
+        if not (is_staff_sender or ticket.user_id == sender.id):
+            raise error({'sender': 'Sender has no access to this ticket.'})
+
+        serializer = self._message_serializers.get(sender.pk)
+        if serializer is None:
+            serializer = MessageSerializer(context=self._context(sender))
+            self._message_serializers[sender.pk] = serializer
+        try:
+            validated_data = self._validate(serializer, record)
+        except RecordError as exc:
+            raise error(exc.detail)
+        message = Message(
+            ticket=ticket if ticket.pk else None,
+            sender=sender,
+            content=validated_data['content'],
+            is_admin_response=is_staff_sender,
+        )
+        try:
+            message._import_created_at = self._parse_timestamp(record)
+        except RecordError as exc:
+            raise error(exc.detail)
+        return message
+
+    def _write(self, tickets, messages):
+        with transaction.atomic(using=self.using):
+            Ticket.objects.using(self.using).bulk_create(tickets)
+            for ticket in tickets:
+                for message in ticket._import_messages:
+                    message.ticket = ticket
+                messages.extend(ticket._import_messages)
+            Message.objects.using(self.using).bulk_create(messages)
+            self._restore_timestamps(Ticket, tickets)
+            self._restore_timestamps(Message, messages)
+            # bulk_create bypasses Message.save(), so rebuild the counters
+            # of every ticket the batch touched in one statement.
+            touched = {message.ticket_id for message in messages}
+            Ticket.objects.using(self.using).filter(pk__in=touched).refresh_conversation_counters()
+            self._record_stats(tickets, messages)
+            cache.invalidate(touched, using=self.using)
+        return {'tickets': len(tickets), 'messages': len(messages)}
+
+    def _write_each(self, built, errors):
+        """
+        Write the records of a batch the database refused one at a time (a
+        ticket with its thread), reporting the lines it refuses again
+        """
+        committed = {'tickets': 0, 'messages': 0}
+        for number, obj in built:
+            tickets, messages = ([obj], []) if isinstance(obj, Ticket) else ([], [obj])
+            # Forget what the failed attempt assigned.
+            for unsaved in (*tickets, *messages, *(message for ticket in tickets for message in ticket._import_messages)):
+                unsaved.pk = None
+                unsaved._state.adding = True
+            try:
+                written = self._write(tickets, messages)
+            except DatabaseError as exc:
+                errors.append({'line': number, 'error': f'Not written: {exc}'})
+            else:
+                for key, count in written.items():
+                    committed[key] += count
+        return committed
+
+    def _record_stats(self, tickets, messages):
+        """
+        bulk_create bypasses Ticket.save() and Message.save() too: set
+        closed_at on closed new tickets (as given, if given) and
+        first_response_at where the batch brings a ticket's first staff
+        response, and add the batch to the statistics rollups (tickets.stats).
+        """
+        first = {}
+        for message in messages:
+            if message.is_admin_response:
+                earliest = first.get(message.ticket_id)
+                if earliest is None or message.created_at < earliest[0]:
+                    first[message.ticket_id] = (message.created_at, message.sender_id)
+
+        rollup = stats.Rollup()
+        new_ids = {ticket.pk for ticket in tickets}
+        answered = []
+        if first.keys() - new_ids:
+            # Existing tickets keep the first response they have.
+            rows = Ticket.objects.using(self.using).filter(
+                pk__in=first.keys() - new_ids, first_response_at__isnull=True,
+            ).values_list('pk', 'created_at', 'priority', 'status')
+            for pk, created_at, priority, status in rows:
+                responded_at, sender_id = first[pk]
+                rollup.add_first_response(stats.Facts(created_at, priority, status, None, responded_at, sender_id))
+                answered.append(Ticket(pk=pk, first_response_at=responded_at))
+        for ticket in tickets:
+            ticket.closed_at = ticket._import_closed_at
+            ticket.first_response_at, first_responder_id = first.get(ticket.pk, (None, None))
+            rollup.add(stats.Facts.of(ticket, first_responder_id=first_responder_id))
+
+        model = Ticket.objects.using(self.using)
+        if answered:
+            model.bulk_update(answered, ['first_response_at'], batch_size=self.batch_size)
+        changed = [ticket for ticket in tickets if ticket.closed_at or ticket.first_response_at]
+        if changed:
+            model.bulk_update(changed, ['closed_at', 'first_response_at'], batch_size=self.batch_size)
+        rollup.apply(self.using)
+
+    def _restore_timestamps(self, model, objs):
+        """
+        bulk_create always stamps auto_now_add fields with the current time;
+        put historical timestamps back with one bulk UPDATE. A closed
+        ticket was last updated when it was closed.
+        """
+        dated = [obj for obj in objs if obj._import_created_at]
+        for obj in dated:
+            obj.created_at = obj._import_created_at
+            obj.updated_at = getattr(obj, '_import_closed_at', None) or obj._import_created_at
+        if dated:
+            model.objects.using(self.using).bulk_update(
+                dated, ['created_at', 'updated_at'], batch_size=self.batch_size
+            )
+
+    @staticmethod
+    def _validate(serializer, record):
+        try:
+            return serializer.run_validation(record)
+        except ValidationError as exc:
+            raise RecordError(exc.detail)
+
+    @staticmethod
+    def _get_user(users, email, field):
+        if not isinstance(email, str) or not email:
+            raise RecordError({field: 'This field is required.'})
+        try:
+            return users[email]
+        except KeyError:
+            raise RecordError({field: f'No active user with email {email}.'})
+
+    @staticmethod
+    def _parse_timestamp(record, field='created_at'):
+        value = record.get(field)
+        if value is None:
+            return None
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None:
+            raise RecordError({field: 'Expected an ISO 8601 datetime.'})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @staticmethod
+    def _context(user):
+        # The serializers only read ``request.user`` from their context.
+        return {'request': SimpleNamespace(user=user)}
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
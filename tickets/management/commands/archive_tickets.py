@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from tickets.archive import BATCH_SIZE, archive_closed_tickets
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed tickets last updated before the cut-off, with their "
+        "messages, to the archive tables, one batch per transaction. "
+        "Archived tickets stay readable through the ticket and message "
+        "endpoints. Safe to interrupt and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.TICKET_ARCHIVE_AFTER.days,
+            help='Archive tickets closed more than this many days ago (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Tickets per transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['older_than_days'])
+        started = time.monotonic()
+        tickets = messages = 0
+        for batch_tickets, batch_messages in archive_closed_tickets(
+            before, batch_size=options['batch_size'], using=options['database'],
+        ):
+            tickets += batch_tickets
+            messages += batch_messages
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Archived {tickets} tickets, {messages} messages')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {tickets} tickets closed before {before:%Y-%m-%d} '
+            f'and {messages} messages in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,209 @@
+import json
+import subprocess
+import sys
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from ticketing_system import benchmarks
+from ticketing_system.seeding import Seeder, parse_until
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API end to end, in process: seed a scratch test "
+        "database (seed_data), drive the ticket, message and account "
+        "endpoints with weighted request mixes, and report p50/p95/p99 "
+        "latency, SQL queries and peak memory per endpoint and throughput "
+        "per mix. --output writes the report as JSON; --compare checks it "
+        "against a baseline report and fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=500, help='Default: %(default)s.')
+        parser.add_argument('--agents', type=int, default=10, help='Default: %(default)s.')
+        parser.add_argument('--tickets', type=int, default=5000, help='Default: %(default)s.')
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=50000,
+            help='Messages in all, spread over the tickets (default: %(default)s).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: %(default)s).')
+        parser.add_argument(
+            '--until',
+            type=parse_until,
+            default='2026-01-01',
+            metavar='YYYY-MM-DD',
+            help='End of the seeded time window, fixed so runs on any day seed the same rows (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Timed requests per mix; the auth mix sends a tenth, logins being slow (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=20,
+            help='Untimed requests before each mix (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--profile-requests',
+            type=int,
+            default=20,
+            help='Requests per endpoint for counting queries and memory (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--mix',
+            action='append',
+            choices=tuple(benchmarks.MIXES),
+            help='Mix to run; repeat for several (default: all).',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file ("-": standard output).')
+        parser.add_argument('--compare', help='Baseline JSON report to compare against.')
+        parser.add_argument(
+            '--latency-threshold',
+            type=float,
+            default=benchmarks.THRESHOLDS['latency'],
+            help='Percent slower (latency or throughput) that fails --compare (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--memory-threshold',
+            type=float,
+            default=benchmarks.THRESHOLDS['memory'],
+            help='Percent more peak memory that fails --compare (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--query-threshold',
+            type=float,
+            default=benchmarks.THRESHOLDS['queries'],
+            help='Queries per request more that fails --compare (default: %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read the baseline report: {exc}')
+            if baseline.get('version') != benchmarks.REPORT_VERSION:
+                raise CommandError('The baseline report has another format version.')
+
+        sizes = {name: options[name] for name in ('customers', 'agents', 'tickets', 'messages')}
+        with scratch_environment():
+            self.stderr.write(f'Seeding {sizes}...')
+            for _ in Seeder(**sizes, admins=1, seed=options['seed'], until=options['until']).run():
+                pass
+            try:
+                runner = benchmarks.Runner(benchmarks.fixtures(), seed=options['seed'])
+                results = runner.run(
+                    requests=options['requests'], warmup=options['warmup'],
+                    profile_requests=options['profile_requests'], mixes=options['mix'],
+                )
+            except benchmarks.BenchmarkError as exc:
+                raise CommandError(exc)
+
+        report = {
+            'version': benchmarks.REPORT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'commit': _commit(),
+            'environment': benchmarks.environment(),
+            'settings': {
+                **sizes, 'seed': options['seed'], 'until': options['until'].date().isoformat(),
+                'requests': options['requests'],
+                'async_views': settings.ASYNC_VIEWS,
+            },
+            **results,
+        }
+        self._print(report)
+        if options['output'] == '-':
+            json.dump(report, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        elif options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stderr.write(f"Report written to {options['output']}.")
+
+        if baseline is not None:
+            self._compare(baseline, report, {
+                'latency': options['latency_threshold'],
+                'memory': options['memory_threshold'],
+                'queries': options['query_threshold'],
+            })
+
+    def _print(self, report):
+        # The human-readable summary goes to stderr, so --output - stays valid JSON.
+        write = self.stderr.write
+        write(f'{"":<20}{"requests":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"peak KiB":>10}')
+        for name, result in sorted(report['operations'].items()):
+            write(
+                f'{name:<20}{result["count"]:>9}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["queries"]:>9g}{result["peak_memory_kib"]:>10.1f}'
+            )
+        for mix, result in report['mixes'].items():
+            write(f'{mix} mix: {result["throughput"]:.1f} req/s ({result["requests"]} requests)')
+
+    def _compare(self, baseline, report, thresholds):
+        for key in ('environment', 'settings'):
+            if baseline.get(key) != report[key]:
+                self.stderr.write(self.style.WARNING(
+                    f'The baseline was measured with another {key}: {baseline.get(key)}'
+                ))
+        rows, regressions = benchmarks.compare(baseline, report, thresholds)
+        self.stderr.write(f'\nAgainst {baseline.get("commit") or "the baseline"}:')
+        for metric, old, new, change in rows:
+            flag = '  REGRESSION' if (metric, old, new, change) in regressions else ''
+            self.stderr.write(f'{metric:<32}{old:>10g}{new:>10g}{change:>+9.1f}%{flag}')
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) past the thresholds.')
+        self.stderr.write(self.style.SUCCESS('No regressions past the thresholds.'))
+
+
+@contextmanager
+def scratch_environment():
+    """
+    Never touch the real data: a throwaway test database, with the replica
+    aliases (ticketing_system.routers) reading from it too, and a private
+    cache, so the seeded rows can't reach the shared cache's namespaces and
+    clearing it spares the live entries.
+    """
+    setup_test_environment()
+    cache_settings = override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark-api',
+        }
+    })
+    cache_settings.enable()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    replicas = {alias: connections[alias].settings_dict for alias in settings.DATABASE_REPLICAS}
+    for alias in replicas:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias, settings_dict in replicas.items():
+            connections[alias].close()
+            connections[alias].settings_dict = settings_dict
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        cache_settings.disable()
+        teardown_test_environment()
+
+
+def _commit():
+    """The checked-out git commit, if there is one"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,166 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from conversations.models import Message
+from conversations.views import MessageViewSet
+from tickets.archive import archive_closed_tickets
+from tickets.models import Ticket
+from tickets.views import TicketViewSet
+
+OPERATIONS = (
+    ('list high priority', 'get', '/api/v1/tickets/', {'priority': 'high'}),
+    ('search', 'get', '/api/v1/tickets/', {'search': 'printer'}),
+    ('list open by update', 'get', '/api/v1/tickets/', {'status': 'open', 'ordering': '-updated_at'}),
+    ('work queue', 'get', '/api/v1/tickets/queue/', {}),
+    ('create ticket', 'post', '/api/v1/tickets/', {'title': 'Printer jammed', 'description': 'Again.'}),
+    ('post message', 'post', None, {'content': 'On it.'}),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the hot ticket endpoints with years of closed tickets in the "
+        "hot tables, then again after archiving them (tickets.archive). Runs "
+        "on a scratch test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickets',
+            type=int,
+            default=20000,
+            help='Tickets to seed (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--closed',
+            type=float,
+            default=0.9,
+            help='Share of them closed long ago (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=3,
+            help='Messages seeded per ticket (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per operation and run (default: %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['closed'] <= 1:
+            raise CommandError('--closed must be between 0 and 1.')
+        # Never touch the real data: seed a throwaway test database.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            fixtures = self._seed(options['tickets'], options['closed'], options['messages'])
+            before = self._run(fixtures, options['requests'])
+
+            started = time.monotonic()
+            archived = [batch for batch in archive_closed_tickets(timezone.now() - timedelta(days=30))]
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Archived {sum(t for t, _ in archived)} tickets and {sum(m for _, m in archived)} '
+                f'messages in {elapsed:.1f}s; {Ticket.objects.count()} tickets left hot.'
+            )
+            fixtures['ticket_ids'] = list(Ticket.objects.values_list('pk', flat=True))
+            after = self._run(fixtures, options['requests'])
+
+            self.stdout.write(f'{"":<22}{"before p50":>12}{"after p50":>12}{"speedup":>10}')
+            for label, *_ in OPERATIONS:
+                self.stdout.write(
+                    f'{label:<22}{before[label]:>9.2f} ms{after[label]:>9.2f} ms'
+                    f'{before[label] / after[label]:>9.1f}x'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _seed(self, tickets, closed, messages):
+        User = get_user_model()
+        password = make_password(None)
+        agent = User.objects.create(
+            email='agent@example.com', username='agent', password=password, role=User.UserRole.AGENT,
+        )
+        customers = User.objects.bulk_create([
+            User(email=f'customer{i}@example.com', username=f'customer{i}', password=password)
+            for i in range(max(tickets // 10, 1))
+        ])
+        closed_count = int(tickets * closed)
+        Ticket.objects.bulk_create([
+            Ticket(
+                user=customers[i % len(customers)],
+                title=f'Printer issue {i}',
+                description='The printer on floor two is jammed again.',
+                priority=Ticket.Priority.values[i % 3],
+                status=Ticket.Status.CLOSED if i < closed_count else Ticket.Status.values[i % 2],
+            )
+            for i in range(tickets)
+        ], batch_size=1000)
+        Ticket.objects.filter(status=Ticket.Status.CLOSED).update(
+            created_at=timezone.now() - timedelta(days=3 * 365),
+            updated_at=timezone.now() - timedelta(days=2 * 365),
+            closed_at=timezone.now() - timedelta(days=2 * 365),
+        )
+        Message.objects.bulk_create([
+            Message(ticket_id=ticket_id, sender=agent, content='Looking into the printer.', is_admin_response=True)
+            for ticket_id in Ticket.objects.values_list('pk', flat=True) for _ in range(messages)
+        ], batch_size=1000)
+        # The closed tickets' threads ended before they closed.
+        Message.objects.filter(ticket__status=Ticket.Status.CLOSED).update(
+            created_at=timezone.now() - timedelta(days=2 * 365 + 1),
+        )
+        Ticket.objects.refresh_conversation_counters()
+        return {
+            'token': str(AccessToken.for_user(agent)),
+            'ticket_ids': list(Ticket.objects.exclude(status=Ticket.Status.CLOSED).values_list('pk', flat=True)),
+        }
+
+    def _run(self, fixtures, requests):
+        factory = RequestFactory()
+        headers = {'Authorization': f"Bearer {fixtures['token']}"}
+        # Throttling would cut the runs short.
+        views = {
+            'list': TicketViewSet.as_view({'get': 'list', 'post': 'create'}, throttle_classes=()),
+            'queue': TicketViewSet.as_view({'get': 'queue'}, throttle_classes=()),
+            'messages': MessageViewSet.as_view({'post': 'create'}, throttle_classes=()),
+        }
+        results = {}
+        for label, method, path, data in OPERATIONS:
+            latencies = []
+            for _ in range(requests):
+                if path is None:
+                    ticket_id = random.choice(fixtures['ticket_ids'])
+                    request = factory.post(
+                        f'/api/v1/tickets/{ticket_id}/messages/', data, content_type='application/json',
+                        headers=headers,
+                    )
+                    view, kwargs = views['messages'], {'ticket_pk': ticket_id}
+                elif method == 'post':
+                    request = factory.post(path, data, content_type='application/json', headers=headers)
+                    view, kwargs = views['list'], {}
+                else:
+                    request = factory.get(path, data, headers=headers)
+                    view, kwargs = views['queue' if path.endswith('queue/') else 'list'], {}
+                started = time.perf_counter()
+                response = view(request, **kwargs)
+                response.render()
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise CommandError(f'{label} returned {response.status_code}: {response.content[:200]!r}')
+            results[label] = statistics.median(latencies) * 1000
+        return results
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import statistics
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.views import UserDetailAsyncView, UserDetailView
+from conversations.models import Message
+from conversations.views import MessageAsyncView, MessageViewSet
+from tickets.models import Ticket
+from tickets.views import TicketDetailAsyncView, TicketListAsyncView, TicketViewSet
+
+ENDPOINTS = ('ticket-list', 'ticket-detail', 'message-list', 'message-create', 'me')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the hot endpoints through the sync viewsets and through the "
+        "async views (ASYNC_VIEWS) at several concurrency levels, on a scratch "
+        "test database. Reports requests/s and p50/p95 latency for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickets',
+            type=int,
+            default=1000,
+            help='Tickets to seed (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=20,
+            help='Messages seeded per ticket (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=300,
+            help='Requests per endpoint, path and concurrency level (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--concurrency',
+            default='1,10,50',
+            help='Comma-separated numbers of in-flight requests (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=0,
+            help=(
+                'Milliseconds added to every query, to model a database across '
+                'the network (default: %(default)s).'
+            ),
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=ENDPOINTS,
+            help='Endpoint to benchmark; repeat for several (default: all).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers.')
+
+        # Never touch the real data: seed a throwaway test database.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            fixtures = self._seed(options['tickets'], options['messages'])
+            # Run the event loop under async_to_sync so the views' ORM calls
+            # come back to this thread, whose connection holds the test
+            # database (and the latency wrapper).
+            with connection.execute_wrapper(_Latency(options['db_latency'] / 1000)):
+                for endpoint in options['endpoint'] or ENDPOINTS:
+                    for level in levels:
+                        for label, view in (('sync', False), ('async', True)):
+                            result = async_to_sync(self._run)(
+                                fixtures, endpoint, view, options['requests'], level
+                            )
+                            self.stdout.write(
+                                f'{endpoint:<15}{label:<6}concurrency {level:<5}'
+                                f'{result["rate"]:>8.0f} req/s   '
+                                f'p50 {result["p50"]:>7.1f} ms   p95 {result["p95"]:>7.1f} ms'
+                            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _seed(self, tickets, messages):
+        User = get_user_model()
+        password = make_password(None)
+        agent = User.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=User.UserRole.AGENT,
+        )
+        customers = User.objects.bulk_create([
+            User(email=f'customer{i}@example.com', username=f'customer{i}', password=password)
+            for i in range(max(tickets // 10, 1))
+        ])
+        Ticket.objects.bulk_create([
+            Ticket(
+                user=customers[i % len(customers)],
+                title=f'Printer issue {i}',
+                description='The printer on floor two is jammed again.',
+                priority=Ticket.Priority.values[i % 3],
+            )
+            for i in range(tickets)
+        ], batch_size=1000)
+        ticket_ids = list(Ticket.objects.values_list('pk', flat=True))
+        Message.objects.bulk_create([
+            Message(ticket_id=ticket_id, sender=agent, content='Looking into it.', is_admin_response=True)
+            for ticket_id in ticket_ids for _ in range(messages)
+        ], batch_size=1000)
+        Ticket.objects.refresh_conversation_counters()
+        return {
+            'token': str(AccessToken.for_user(agent)),
+            'ticket_ids': ticket_ids,
+        }
+
+    async def _run(self, fixtures, endpoint, use_async, total, concurrency):
+        view = _view(endpoint, use_async)
+        if not use_async:
+            # What Django's ASGI handler does with a sync view.
+            view = sync_to_async(view)
+        factory = AsyncRequestFactory()
+        headers = {'Authorization': f"Bearer {fixtures['token']}"}
+        ids = fixtures['ticket_ids']
+        latencies = []
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                ticket_id = random.choice(ids)
+                if endpoint == 'ticket-list':
+                    request, kwargs = factory.get('/api/v1/tickets/', headers=headers), {}
+                elif endpoint == 'ticket-detail':
+                    request, kwargs = factory.get(f'/api/v1/tickets/{ticket_id}/', headers=headers), {'pk': ticket_id}
+                elif endpoint == 'message-list':
+                    request = factory.get(f'/api/v1/tickets/{ticket_id}/messages/', headers=headers)
+                    kwargs = {'ticket_pk': ticket_id}
+                elif endpoint == 'message-create':
+                    request = factory.post(
+                        f'/api/v1/tickets/{ticket_id}/messages/', {'content': 'On it.'},
+                        content_type='application/json', headers=headers,
+                    )
+                    kwargs = {'ticket_pk': ticket_id}
+                else:
+                    request, kwargs = factory.get('/api/v1/accounts/me/', headers=headers), {}
+
+                started = time.perf_counter()
+                response = await view(request, **kwargs)
+                response.render()
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise CommandError(f'{endpoint} returned {response.status_code}: {response.content[:200]!r}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rate': total / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        }
+
+
+def _view(endpoint, use_async):
+    # Throttling would cut the runs short; it costs the same on both paths.
+    if endpoint == 'ticket-list':
+        if use_async:
+            return TicketListAsyncView.as_view(throttle_classes=())
+        return TicketViewSet.as_view({'get': 'list'}, throttle_classes=())
+    if endpoint == 'ticket-detail':
+        if use_async:
+            return TicketDetailAsyncView.as_view(throttle_classes=())
+        return TicketViewSet.as_view({'get': 'retrieve'}, throttle_classes=())
+    if endpoint in ('message-list', 'message-create'):
+        if use_async:
+            return MessageAsyncView.as_view(throttle_classes=())
+        return MessageViewSet.as_view({'get': 'list', 'post': 'create'}, throttle_classes=())
+    if use_async:
+        return UserDetailAsyncView.as_view(throttle_classes=())
+    return UserDetailView.as_view(throttle_classes=())
+
+
+class _Latency:
+    """connection.execute_wrapper that adds a fixed delay to every query"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.seconds:
+            time.sleep(self.seconds)
+        return execute(sql, params, many, context)
@@ -0,0 +1,164 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, close_old_connections, connections
+from conversations.models import Message
+from tickets.models import Ticket
+
+ALIAS = 'benchmark_sqlite'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SQLite read and write throughput under concurrent load with "
+        "Django's stock SQLite settings and with the configured profile "
+        "(settings.DATABASES, settings.SQLITE_PRAGMAS). Each run uses a fresh "
+        "database file in a temporary directory; the real database isn't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Threads reading a ticket and its messages back to back (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=4,
+            help='Threads posting messages back to back (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5,
+            help='Seconds per run (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--tickets',
+            type=int,
+            default=200,
+            help='Tickets to seed (default: %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        tuned = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if tuned['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The default database is not SQLite.')
+        profiles = (
+            ('stock', {'ENGINE': tuned['ENGINE']}),
+            ('tuned', {key: value for key, value in tuned.items() if key not in ('NAME', 'TEST')}),
+        )
+        directory = tempfile.mkdtemp(prefix='ticketing-benchmark-sqlite-')
+        try:
+            for label, profile in profiles:
+                self._connect({**profile, 'NAME': Path(directory) / f'{label}.sqlite3'})
+                try:
+                    call_command('migrate', database=ALIAS, verbosity=0, interactive=False)
+                    fixtures = self._seed(options['tickets'])
+                    result = self._run(fixtures, options['readers'], options['writers'], options['duration'])
+                finally:
+                    connections[ALIAS].close()
+                self.stdout.write(
+                    f'{label:<7}reads {result["reads"]:>7.0f}/s  p95 {result["read_p95"]:>7.1f} ms   '
+                    f'writes {result["writes"]:>6.0f}/s  p95 {result["write_p95"]:>7.1f} ms   '
+                    f'{result["locked"]} "database is locked" errors'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _connect(self, profile):
+        # Point the benchmark alias at this run's file; each thread opens its
+        # own connection to it.
+        databases = connections.configure_settings({
+            DEFAULT_DB_ALIAS: dict(settings.DATABASES[DEFAULT_DB_ALIAS]),
+            ALIAS: profile,
+        })
+        connections.settings[ALIAS] = databases[ALIAS]
+        try:
+            del connections[ALIAS]
+        except AttributeError:
+            pass
+
+    def _seed(self, tickets):
+        User = get_user_model()
+        users = User.objects.using(ALIAS)
+        password = make_password(None)
+        agent = users.create(
+            email='agent@example.com', username='agent', password=password, role=User.UserRole.AGENT,
+        )
+        customer = users.create(email='customer@example.com', username='customer', password=password)
+        Ticket.objects.using(ALIAS).bulk_create([
+            Ticket(user=customer, title=f'Printer issue {i}', description='The printer is jammed again.')
+            for i in range(tickets)
+        ])
+        ticket_ids = list(Ticket.objects.using(ALIAS).values_list('pk', flat=True))
+        Message.objects.using(ALIAS).bulk_create([
+            Message(ticket_id=ticket_id, sender=agent, content='Looking into it.', is_admin_response=True)
+            for ticket_id in ticket_ids for _ in range(10)
+        ])
+        return {'agent': agent, 'ticket_ids': ticket_ids}
+
+    def _run(self, fixtures, readers, writers, duration):
+        ids = fixtures['ticket_ids']
+        deadline = time.monotonic() + duration
+        reads, writes = [], []
+        locked = []
+
+        def read():
+            ticket = Ticket.objects.using(ALIAS).get(pk=random.choice(ids))
+            list(Message.objects.using(ALIAS).filter(ticket=ticket).select_related('sender')[:20])
+
+        def write():
+            # What MessageViewSet.perform_create does.
+            ticket = Ticket.objects.using(ALIAS).get(pk=random.choice(ids))
+            Message(ticket=ticket, sender=fixtures['agent'], content='On it.').save(using=ALIAS)
+
+        def loop(operation, latencies):
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation()
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        locked.append(1)
+                    else:
+                        latencies.append(time.perf_counter() - started)
+                    # The end of a request: closes the connection unless
+                    # CONN_MAX_AGE keeps it.
+                    close_old_connections()
+            finally:
+                connections[ALIAS].close()
+
+        threads = [threading.Thread(target=loop, args=(read, reads)) for _ in range(readers)]
+        threads += [threading.Thread(target=loop, args=(write, writes)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            'reads': len(reads) / duration,
+            'read_p95': _p95(reads),
+            'writes': len(writes) / duration,
+            'write_p95': _p95(writes),
+            'locked': len(locked),
+        }
+
+
+def _p95(latencies):
+    if not latencies:
+        return float('nan')
+    latencies.sort()
+    return latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
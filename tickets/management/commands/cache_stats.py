@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ticketing_system.cache import METRICS_FLUSH, Namespace
+
+
+class Command(BaseCommand):
+    help = (
+        "Report hit/miss counts of each shared cache namespace, summed over "
+        f"every process (each process reports every {METRICS_FLUSH} lookups)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the counters after reporting them.',
+        )
+
+    def handle(self, *args, **options):
+        for name, timeout in settings.CACHE_NAMESPACES.items():
+            namespace = Namespace(name)
+            stats = namespace.stats()
+            lookups = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / lookups if lookups else 0
+            self.stdout.write(
+                f"{name:<10}TTL {timeout:>5}s   {stats['hits']:>10} hits   "
+                f"{stats['misses']:>10} misses   {ratio:>6.1%} hit rate"
+            )
+            if options['reset']:
+                namespace.reset_stats()
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from tickets.exporter import FORMATS, export_tickets
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Stream tickets, optionally with their messages, as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            choices=FORMATS,
+            default='ndjson',
+            help='Export format (default: %(default)s).',
+        )
+        parser.add_argument('--file', help='Write to this file instead of stdout.')
+        parser.add_argument(
+            '--messages',
+            action='store_true',
+            help="Inline each ticket's messages.",
+        )
+        parser.add_argument('--status', choices=Ticket.Status.values)
+        parser.add_argument('--priority', choices=Ticket.Priority.values)
+        parser.add_argument(
+            '--as-user',
+            help='Only export the tickets this user (by email) can access.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Tickets fetched per query (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Ticket.objects.using(options['database']).order_by('id')
+        if options['as_user']:
+            User = get_user_model()
+            try:
+                user = User.objects.using(options['database']).get(email=options['as_user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {options['as_user']}.")
+            queryset = queryset.accessible_to(user)
+        for field in ('status', 'priority'):
+            if options[field]:
+                queryset = queryset.filter(**{field: options[field]})
+
+        chunks = export_tickets(
+            queryset, options['output'], options['messages'], chunk_size=options['chunk_size']
+        )
+        if not options['file']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['file'], 'w', newline='') as stream:
+            for chunk in chunks:
+                stream.write(chunk)
@@ -0,0 +1,61 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from tickets.importer import NDJSONImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream tickets (with inline message threads) and messages from an "
+        "NDJSON file into the database in bulk batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file to import, or "-" for stdin.')
+        parser.add_argument(
+            '--actor',
+            required=True,
+            help='Email of the staff user the import runs as.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=NDJSONImporter.batch_size,
+            help='Lines per bulk insert transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            actor = User.objects.using(options['database']).get(email=options['actor'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No staff user with email {options['actor']}.")
+
+        importer = NDJSONImporter(actor, batch_size=options['batch_size'], using=options['database'])
+        started = time.monotonic()
+        stream = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        with stream:
+            for result in importer.run(stream):
+                if 'batch' in result:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(json.dumps(result))
+                elif 'summary' in result:
+                    elapsed = time.monotonic() - started
+                    rows = importer.tickets + importer.messages
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Imported {importer.tickets} tickets and {importer.messages} messages "
+                        f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s), "
+                        f"{importer.errors} errors."
+                    ))
+                else:
+                    self.stderr.write(json.dumps(result, default=str))
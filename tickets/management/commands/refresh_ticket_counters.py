@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from tickets import cache
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized conversation counters (message count, last "
+        "message, last staff response) on every ticket, in id-range batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Tickets per UPDATE/transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        batch_size = options['batch_size']
+        tickets = Ticket.objects.using(using)
+        last_id = tickets.aggregate(last=Max('pk'))['last'] or 0
+
+        started = time.monotonic()
+        refreshed = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic(using=using):
+                refreshed += tickets.filter(
+                    pk__gte=start, pk__lt=start + batch_size
+                ).refresh_conversation_counters()
+                cache.invalidate(range(start, start + batch_size), using=using)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Refreshed tickets up to id {start + batch_size - 1}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed counters on {refreshed} tickets in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from ticketing_system.seeding import BATCH_SIZE, EMAIL_DOMAIN, PASSWORD, Seeder, already_seeded, parse_until
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, tickets and message threads for "
+        "benchmarking: realistic status/priority mixes, long-tailed thread "
+        "lengths, the same rows for the same --seed. Written with bulk "
+        "inserts, a batch per transaction; reports rows per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help='Default: %(default)s.')
+        parser.add_argument('--agents', type=int, default=20, help='Default: %(default)s.')
+        parser.add_argument('--admins', type=int, default=2, help='Default: %(default)s.')
+        parser.add_argument('--tickets', type=int, default=10000, help='Default: %(default)s.')
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=100000,
+            help='Messages in all, spread over the tickets (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Tickets are created over this many days up to --until (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--until',
+            type=parse_until,
+            metavar='YYYY-MM-DD',
+            help='End of the time window, at midnight UTC; pin it to seed the same rows on any day (default: today).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: %(default)s).')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Tickets (with their messages) per transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help='Specifies the database to use. Default is "default".',
+        )
+
+    def handle(self, *args, **options):
+        sizes = ('customers', 'agents', 'admins', 'tickets', 'messages', 'days', 'batch_size')
+        if any(options[name] < 0 for name in sizes) or options['batch_size'] < 1 or options['days'] < 1:
+            raise CommandError('Sizes must not be negative; --days and --batch-size must be positive.')
+        if already_seeded(options['database']):
+            raise CommandError(f'The database already has @{EMAIL_DOMAIN} users; seed an empty one.')
+        seeder = Seeder(
+            customers=options['customers'], agents=options['agents'], admins=options['admins'],
+            tickets=options['tickets'], messages=options['messages'], days=options['days'],
+            seed=options['seed'], until=options['until'], batch_size=options['batch_size'],
+            using=options['database'],
+        )
+
+        started = phase_started = time.monotonic()
+        totals = {'users': 0, 'tickets': 0, 'messages': 0}
+        try:
+            for result in seeder.run():
+                now = time.monotonic()
+                if 'users' in result:
+                    totals['users'] = result['users']
+                    self.report('users', result['users'], now - phase_started)
+                    phase_started = now
+                elif 'tickets' in result:
+                    totals['tickets'] += result['tickets']
+                    totals['messages'] += result['messages']
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"{totals['tickets']} tickets, {totals['messages']} messages")
+                else:
+                    rows = totals['tickets'] + totals['messages']
+                    self.report('tickets and messages', rows, now - phase_started)
+                    self.stdout.write(f"Updated {result['statistics']} statistics rows.")
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        elapsed = time.monotonic() - started
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {totals['users']} users, {totals['tickets']} tickets and {totals['messages']} "
+            f"messages in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s). "
+            f"Users log in with the password {PASSWORD!r}."
+        ))
+
+    def report(self, label, rows, elapsed):
+        self.stdout.write(f'{label}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)')
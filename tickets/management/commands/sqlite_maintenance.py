@@ -0,0 +1,86 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain a SQLite database: checkpoint the write-ahead log into the "
+        "database file, refresh the query planner's statistics (ANALYZE) and, "
+        "with --vacuum, rebuild the file to reclaim free pages. Safe while the "
+        "application runs; VACUUM holds the write lock until it's done."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--checkpoint-mode',
+            choices=CHECKPOINT_MODES,
+            default='TRUNCATE',
+            help=(
+                'wal_checkpoint mode; TRUNCATE waits for readers and empties '
+                'the log file (default: %(default)s).'
+            ),
+        )
+        parser.add_argument(
+            '--no-analyze',
+            action='store_false',
+            dest='analyze',
+            help='Skip ANALYZE.',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Also VACUUM, rewriting the whole database file.',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database {options['database']!r} is not SQLite.")
+        if connection.is_in_memory_db():
+            raise CommandError(f"Database {options['database']!r} is in memory.")
+        path = str(connection.settings_dict['NAME'])
+        self.stdout.write(f'{path}: {self._size(path)}')
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            if options['analyze']:
+                self._step('ANALYZE', cursor, 'ANALYZE')
+            if options['vacuum']:
+                self._step('VACUUM', cursor, 'VACUUM')
+            if journal_mode.lower() == 'wal':
+                busy, frames, checkpointed = self._step(
+                    'checkpoint', cursor, f"PRAGMA wal_checkpoint({options['checkpoint_mode']})",
+                )
+                self.stdout.write(
+                    f'  {checkpointed} of {frames} log frames checkpointed'
+                    + ('; readers kept the rest' if busy else '')
+                )
+            else:
+                self.stdout.write(f'  journal_mode is {journal_mode}: no log to checkpoint')
+        self.stdout.write(f'{path}: {self._size(path)}')
+
+    def _step(self, label, cursor, sql):
+        started = time.monotonic()
+        cursor.execute(sql)
+        row = cursor.fetchone()
+        self.stdout.write(f'  {label:<12}{(time.monotonic() - started) * 1000:>8.1f} ms')
+        return row
+
+    def _size(self, path):
+        sizes = [
+            f'{label} {os.path.getsize(path + suffix) / 1024:,.0f} KiB'
+            for label, suffix in (('database', ''), ('log', '-wal'))
+            if os.path.exists(path + suffix)
+        ]
+        return ', '.join(sizes)
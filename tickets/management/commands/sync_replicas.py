@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the files standing in for read "
+        "replicas (SQLITE_REPLICAS), with SQLite's online backup, so the "
+        "replica routing can be tried locally. With --interval, keep copying, "
+        "which makes the replicas lag like real ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Seconds between copies; copy once if omitted.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set SQLITE_REPLICAS.')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('The primary is not SQLite; replicate it with its own tools.')
+        while True:
+            primary.ensure_connection()
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: copied in {(time.monotonic() - started) * 1000:.1f} ms')
+            if options['interval'] is None:
+                break
+            # Don't hold the primary's connection (and a read snapshot) while waiting.
+            primary.close()
+            time.sleep(options['interval'])
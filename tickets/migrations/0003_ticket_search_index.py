@@ -0,0 +1,21 @@
+from django.db import migrations
+from tickets.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor, 'tickets_ticket')
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor, 'tickets_ticket')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_ticket_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Message = apps.get_model('conversations', 'Message')
+    messages = Message.objects.filter(ticket=OuterRef('pk')).order_by()
+    Ticket.objects.using(schema_editor.connection.alias).update(
+        message_count=Coalesce(
+            Subquery(messages.values('ticket').annotate(count=Count('pk')).values('count')),
+            0,
+        ),
+        last_message_at=Subquery(messages.order_by('-created_at').values('created_at')[:1]),
+        last_staff_response_at=Subquery(
+            messages.filter(is_admin_response=True).order_by('-created_at').values('created_at')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_search_index'),
+        ('conversations', '0002_message_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last message at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_staff_response_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last staff response at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='message count'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', 'last_staff_response_at', 'created_at'], name='tickets_tic_status_0e1f41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['last_message_at'], name='tickets_tic_last_me_6ee6a9_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticket_conversation_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='high', then=models.Value(3)), models.When(priority='medium', then=models.Value(2)), default=models.Value(1)), output_field=models.PositiveSmallIntegerField(), verbose_name='priority rank'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='queue_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('status__in', ['open', 'pending']), _negated=True), then=models.Value(0)), models.When(priority='high', then=models.Value(3)), models.When(priority='medium', then=models.Value(2)), default=models.Value(1)), output_field=models.PositiveSmallIntegerField(), verbose_name='queue rank'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-queue_rank', 'created_at', 'id'], name='tickets_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_statuses(apps, schema_editor):
+    # The current counts are one GROUP BY away; the daily history is left to
+    # ``manage.py rebuild_ticket_stats``, which backfills it in batches.
+    Ticket = apps.get_model('tickets', 'Ticket')
+    ArchivedTicket = apps.get_model('tickets', 'ArchivedTicket')
+    TicketStatusCount = apps.get_model('tickets', 'TicketStatusCount')
+    using = schema_editor.connection.alias
+    counts = {
+        (status, priority): 0
+        for status in ('open', 'pending', 'closed') for priority in ('low', 'medium', 'high')
+    }
+    rows = Ticket.objects.using(using).order_by().values_list('status', 'priority').annotate(count=Count('pk'))
+    for status, priority, count in rows:
+        counts[status, priority] += count
+    rows = ArchivedTicket.objects.using(using).order_by().values_list('priority').annotate(count=Count('pk'))
+    for priority, count in rows:
+        counts['closed', priority] += count
+    TicketStatusCount.objects.using(using).bulk_create([
+        TicketStatusCount(status=status, priority=priority, count=count)
+        for (status, priority), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_archivedticket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedticket',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='closed at'),
+        ),
+        migrations.AddField(
+            model_name='archivedticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='first response at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='closed at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='first response at'),
+        ),
+        migrations.CreateModel(
+            name='DailyTicketStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=20, verbose_name='priority')),
+                ('created', models.IntegerField(default=0, verbose_name='created')),
+                ('closed', models.IntegerField(default=0, verbose_name='closed')),
+                ('resolution_seconds', models.BigIntegerField(default=0, verbose_name='resolution seconds')),
+                ('first_responses', models.IntegerField(default=0, verbose_name='first responses')),
+                ('first_response_seconds', models.BigIntegerField(default=0, verbose_name='first response seconds')),
+            ],
+            options={
+                'verbose_name': 'daily ticket statistics',
+                'verbose_name_plural': 'daily ticket statistics',
+                'constraints': [models.UniqueConstraint(fields=('day', 'priority'), name='tickets_daily_stats_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('pending', 'Pending'), ('closed', 'Closed')], max_length=20, verbose_name='status')),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=20, verbose_name='priority')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'ticket status count',
+                'verbose_name_plural': 'ticket status counts',
+                'constraints': [models.UniqueConstraint(fields=('status', 'priority'), name='tickets_status_count_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('first_responses', models.IntegerField(default=0, verbose_name='first responses')),
+                ('first_response_seconds', models.BigIntegerField(default=0, verbose_name='first response seconds')),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='agent')),
+            ],
+            options={
+                'verbose_name': 'daily agent statistics',
+                'verbose_name_plural': 'daily agent statistics',
+                'constraints': [models.UniqueConstraint(fields=('day', 'agent'), name='tickets_agent_daily_stats_key')],
+            },
+        ),
+        migrations.RunPython(count_statuses, migrations.RunPython.noop),
+    ]
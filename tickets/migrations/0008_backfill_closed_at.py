@@ -0,0 +1,34 @@
+from django.db import migrations, transaction
+from django.db.models import F, Max, Min
+
+BATCH_SIZE = 2000
+
+
+def backfill_closed_at(apps, schema_editor):
+    # Tickets closed before closed_at was recorded: their last update is the
+    # best estimate there is. Tickets closed since (or imported without a
+    # closing time) are left alone; a batch per transaction.
+    using = schema_editor.connection.alias
+    for name in ('Ticket', 'ArchivedTicket'):
+        tickets = apps.get_model('tickets', name).objects.using(using).order_by()
+        closed = tickets.filter(status='closed') if name == 'Ticket' else tickets
+        bounds = tickets.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            continue
+        for low in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+            with transaction.atomic(using=using):
+                closed.filter(pk__range=(low, low + BATCH_SIZE - 1), closed_at__isnull=True).update(
+                    closed_at=F('updated_at'),
+                )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0007_ticket_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_closed_at, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,55 @@
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Case, Count, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from . import cache, events, stats
+
+class TicketQuerySet(models.QuerySet):
+    def accessible_to(self, user):
+        """
+        Restrict to the tickets ``user`` may access: every ticket for staff
+        and agents, otherwise only their own.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_staff or user.is_agent:
+            return self
+        # By id: ``user`` may be a ClaimsUser, which a model lookup would load.
+        return self.filter(user_id=user.pk)
+
+    def work_queue(self):
+        """
+        Open and pending tickets, most urgent first and then oldest first:
+        the order agents should pick them up in. A range scan of the
+        ``(queue_rank, created_at, id)`` index, so the head of the queue is
+        one index probe however many tickets there are.
+        """
+        return self.filter(queue_rank__gt=0).order_by(*Ticket.QUEUE_ORDERING)
+
+    def refresh_conversation_counters(self):
+        """
+        Recompute the denormalized conversation counters of these tickets
+        from the messages table in one UPDATE (each subquery is an index
+        lookup on ``(ticket, created_at)``). Returns the number of tickets.
+        """
+        Message = apps.get_model('conversations', 'Message')
+        messages = Message.objects.filter(ticket=OuterRef('pk')).order_by()
+        return self.update(
+            message_count=Coalesce(
+                Subquery(messages.values('ticket').annotate(count=Count('pk')).values('count')),
+                0,
+            ),
+            last_message_at=Subquery(
+                messages.order_by('-created_at').values('created_at')[:1]
+            ),
+            last_staff_response_at=Subquery(
+                messages.filter(is_admin_response=True).order_by('-created_at').values('created_at')[:1]
+            ),
+        )
+
 
 class Ticket(models.Model):
     class Status(models.TextChoices):
@@ -43,9 +92,67 @@ class Ticket(models.Model):
         default=Priority.MEDIUM,
         help_text=_('Urgency level of the ticket')
     )
+    # ``priority`` sorts alphabetically (high, low, medium); this column
+    # orders by urgency instead. Computed by the database, so every write
+    # path (save(), bulk_create, QuerySet.update) keeps it in sync.
+    priority_rank = models.GeneratedField(
+        expression=Case(
+            When(priority=Priority.HIGH, then=Value(3)),
+            When(priority=Priority.MEDIUM, then=Value(2)),
+            default=Value(1),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        verbose_name=_('priority rank'),
+    )
+    # priority_rank for open/pending tickets and 0 once closed, so the work
+    # queue is a plain range (queue_rank > 0) on one composite index.
+    queue_rank = models.GeneratedField(
+        expression=Case(
+            When(~Q(status__in=[Status.OPEN, Status.PENDING]), then=Value(0)),
+            When(priority=Priority.HIGH, then=Value(3)),
+            When(priority=Priority.MEDIUM, then=Value(2)),
+            default=Value(1),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        verbose_name=_('queue rank'),
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
+    # Denormalized from conversations.Message; maintained by Message.save(),
+    # Message deletes and the bulk importer, rebuilt by refresh_ticket_counters.
+    message_count = models.PositiveIntegerField(
+        _('message count'),
+        default=0,
+        editable=False
+    )
+    last_message_at = models.DateTimeField(
+        _('last message at'),
+        null=True,
+        blank=True,
+        editable=False
+    )
+    last_staff_response_at = models.DateTimeField(
+        _('last staff response at'),
+        null=True,
+        blank=True,
+        editable=False
+    )
+    # For the statistics rollups (tickets.stats): set by save() and bulk
+    # updates when the ticket closes (cleared if it reopens), and by the
+    # first staff message.
+    closed_at = models.DateTimeField(_('closed at'), null=True, blank=True, editable=False)
+    first_response_at = models.DateTimeField(_('first response at'), null=True, blank=True, editable=False)
+
+    objects = TicketQuerySet.as_manager()
+
+    # True on the read-only stand-ins ArchivedTicket.as_ticket() returns.
+    archived = False
+
+    QUEUE_ORDERING = ('-queue_rank', 'created_at', 'id')
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -53,9 +160,185 @@ class Ticket(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['priority']),
             models.Index(fields=['created_at']),
+            # Keyset pagination: a customer's own tickets by recency, and
+            # staff listings ordered by last update.
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['updated_at']),
+            # Agent inbox: "oldest unanswered open ticket first" is a range
+            # scan on (status, NULL last_staff_response_at) in created_at order.
+            models.Index(fields=['status', 'last_staff_response_at', 'created_at']),
+            models.Index(fields=['last_message_at']),
+            # Agent work queue (TicketQuerySet.work_queue), already in queue
+            # order; closed tickets sort to the end and are never scanned.
+            models.Index(fields=['-queue_rank', 'created_at', 'id'], name='tickets_queue_idx'),
         ]
         verbose_name = _('ticket')
         verbose_name_plural = _('tickets')
 
     def __str__(self):
-        return f"{self.title} ({self.get_status_display()})"
\ No newline at end of file
+        return f"{self.title} ({self.get_status_display()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save() can tell a status/priority change.
+        instance._loaded_state = (instance.__dict__.get('status'), instance.__dict__.get('priority'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save and update the statistics rollups in one transaction, drop the
+        cached copy, and announce new tickets and status/priority changes
+        to live streams
+        """
+        adding = self._state.adding
+        loaded = getattr(self, '_loaded_state', None)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'closed_at'}
+        # Without the loaded state (or with status/priority deferred), a
+        # change can't be told apart.
+        changed = not adding and loaded is not None and None not in loaded and (
+            loaded != (self.status, self.priority)
+        ) and (update_fields is None or {'status', 'priority'} & set(update_fields))
+        before = stats.Facts.of(self, status=loaded[0], priority=loaded[1]) if changed else None
+        if self.status != self.Status.CLOSED:
+            self.closed_at = None
+        elif (adding and self.closed_at is None) or (loaded is not None and loaded[0] != self.Status.CLOSED):
+            self.closed_at = timezone.now()
+
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+            if adding:
+                stats.ticket_added(self, using=self._state.db)
+            elif changed:
+                stats.ticket_changed(before, self, using=self._state.db)
+        if adding:
+            self._loaded_state = (self.status, self.priority)
+            events.ticket_created(self, using=self._state.db)
+            return
+        cache.invalidate([self.pk], using=self._state.db)
+        if getattr(self, '_loaded_state', None) != (self.status, self.priority):
+            self._loaded_state = (self.status, self.priority)
+            events.ticket_updated(self, using=self._state.db)
+
+
+class ArchivedTicketQuerySet(models.QuerySet):
+    accessible_to = TicketQuerySet.accessible_to
+
+
+class ArchivedTicket(models.Model):
+    """
+    A closed ticket moved out of the hot table by tickets.archive, under its
+    original id. Keeps what TicketSerializer shows, with no status, no
+    generated columns and no index but the owner's. Read-only: the ticket
+    endpoints serve it through as_ticket().
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_tickets',
+        verbose_name=_('user'),
+    )
+    title = models.CharField(_('title'), max_length=255)
+    description = models.TextField(_('description'))
+    priority = models.CharField(_('priority'), max_length=20, choices=Ticket.Priority.choices)
+    created_at = models.DateTimeField(_('created at'))
+    updated_at = models.DateTimeField(_('updated at'))
+    message_count = models.PositiveIntegerField(_('message count'), default=0)
+    last_message_at = models.DateTimeField(_('last message at'), null=True, blank=True)
+    last_staff_response_at = models.DateTimeField(_('last staff response at'), null=True, blank=True)
+    closed_at = models.DateTimeField(_('closed at'), null=True, blank=True)
+    first_response_at = models.DateTimeField(_('first response at'), null=True, blank=True)
+    archived_at = models.DateTimeField(_('archived at'), auto_now_add=True)
+
+    objects = ArchivedTicketQuerySet.as_manager()
+
+    # Copied from the Ticket as-is.
+    COPIED_FIELDS = (
+        'id', 'user_id', 'title', 'description', 'priority', 'created_at', 'updated_at',
+        'message_count', 'last_message_at', 'last_staff_response_at', 'closed_at', 'first_response_at',
+    )
+
+    class Meta:
+        verbose_name = _('archived ticket')
+        verbose_name_plural = _('archived tickets')
+
+    def __str__(self):
+        return f"{self.title} ({_('Archived')})"
+
+    @classmethod
+    def from_ticket(cls, ticket):
+        return cls(**{name: getattr(ticket, name) for name in cls.COPIED_FIELDS})
+
+    def as_ticket(self):
+        """The closed Ticket this was, unsaved and marked ``archived``"""
+        ticket = Ticket(
+            status=Ticket.Status.CLOSED,
+            **{name: getattr(self, name) for name in self.COPIED_FIELDS},
+        )
+        if ArchivedTicket.user.is_cached(self):
+            ticket.user = self.user
+        ticket.archived = True
+        ticket._state.db = self._state.db
+        return ticket
+
+
+class DailyTicketStats(models.Model):
+    """Per day and priority: tickets created, closed and first answered (tickets.stats)"""
+    day = models.DateField(_('day'))
+    priority = models.CharField(_('priority'), max_length=20, choices=Ticket.Priority.choices)
+    created = models.IntegerField(_('created'), default=0)
+    closed = models.IntegerField(_('closed'), default=0)
+    # Summed over the tickets closed that day, from their creation.
+    resolution_seconds = models.BigIntegerField(_('resolution seconds'), default=0)
+    first_responses = models.IntegerField(_('first responses'), default=0)
+    first_response_seconds = models.BigIntegerField(_('first response seconds'), default=0)
+
+    ROLLUP_KEY = ('day', 'priority')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'priority'], name='tickets_daily_stats_key'),
+        ]
+        verbose_name = _('daily ticket statistics')
+        verbose_name_plural = _('daily ticket statistics')
+
+
+class AgentDailyStats(models.Model):
+    """Per day and staff member: tickets they answered first, and how fast (tickets.stats)"""
+    day = models.DateField(_('day'))
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name=_('agent'),
+    )
+    first_responses = models.IntegerField(_('first responses'), default=0)
+    first_response_seconds = models.BigIntegerField(_('first response seconds'), default=0)
+
+    ROLLUP_KEY = ('day', 'agent_id')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'agent'], name='tickets_agent_daily_stats_key'),
+        ]
+        verbose_name = _('daily agent statistics')
+        verbose_name_plural = _('daily agent statistics')
+
+
+class TicketStatusCount(models.Model):
+    """How many tickets have each status and priority now (tickets.stats)"""
+    status = models.CharField(_('status'), max_length=20, choices=Ticket.Status.choices)
+    priority = models.CharField(_('priority'), max_length=20, choices=Ticket.Priority.choices)
+    count = models.IntegerField(_('count'), default=0)
+
+    ROLLUP_KEY = ('status', 'priority')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'priority'], name='tickets_status_count_key'),
+        ]
+        verbose_name = _('ticket status count')
+        verbose_name_plural = _('ticket status counts')
@@ -0,0 +1,14 @@
+from ticketing_system.pagination import KeysetPagination
+from .models import Ticket
+
+
+class WorkQueuePagination(KeysetPagination):
+    """
+    Keyset pagination in work-queue order. The ordering is fixed (the
+    ``ordering`` query parameter is ignored) so every page is a range scan
+    on the queue index.
+    """
+    ordering = Ticket.QUEUE_ORDERING
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
@@ -4,14 +4,22 @@ from django.utils.translation import gettext_lazy as _
 class TicketPermission(BasePermission):
     """
     Ticket object-level permission:
-    - All authenticated users can create tickets
+    - All authenticated users can create tickets, and bulk-update or
+      export the tickets they can access
     - Owners can read/update their own tickets
     - Admins/Agents have full access to all tickets
+    - Only staff can run bulk imports
+    - Only Admins/Agents can read the work queue and the statistics
     - Unauthenticated users have no access
     """
     
     def has_permission(self, request, view):
-        if view.action == 'create':
+        if view.action == 'import_records':
+            return request.user.is_authenticated and request.user.is_staff
+        if view.action in ('queue', 'queue_next', 'stats'):
+            user = request.user
+            return user.is_authenticated and (user.is_staff or user.is_agent)
+        if view.action in ('create', 'bulk_update', 'export'):
             return request.user.is_authenticated
         return True  # List/retrieve handled by object permissions
 
@@ -24,5 +32,5 @@ class TicketPermission(BasePermission):
         if request.user.is_staff or request.user.is_agent:
             return True
             
-        # Users can only access their own tickets
-        return obj.user == request.user
\ No newline at end of file
+        # Users can only access their own tickets (compare ids, no user fetch)
+        return obj.user_id == request.user.id
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Full-text search over tickets and their conversations.
+
+The index lives in the database and is maintained by the database itself,
+so every write path (ORM saves, ``bulk_create``, ``QuerySet.update``, raw
+SQL) keeps it in sync:
+
+- SQLite: FTS5 external-content tables ``tickets_ticket_fts`` and
+  ``conversations_message_fts`` updated by triggers, ranked with ``bm25``.
+- PostgreSQL: GIN indexes on ``to_tsvector`` expressions, ranked with
+  ``ts_rank``.
+
+Other backends fall back to DRF's ``icontains`` search.
+"""
+import re
+
+from django.db import connections
+
+SEARCH_CONFIG = 'english'
+
+# Title matches weigh more than description or message matches.
+POSTGRES_TICKET_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', description), 'B')"
+)
+POSTGRES_MESSAGE_VECTOR = f"to_tsvector('{SEARCH_CONFIG}', content)"
+
+SQLITE_TICKET_SQL = """
+    SELECT ticket_id FROM (
+        SELECT rowid AS ticket_id, bm25(tickets_ticket_fts, 10.0, 1.0) AS score
+        FROM tickets_ticket_fts
+        WHERE tickets_ticket_fts MATCH %s
+        UNION ALL
+        SELECT m.ticket_id, bm25(conversations_message_fts) AS score
+        FROM conversations_message_fts
+        JOIN conversations_message m ON m.id = conversations_message_fts.rowid
+        WHERE conversations_message_fts MATCH %s
+    ) matches
+    {scope}
+    GROUP BY ticket_id
+    ORDER BY MIN(score), ticket_id
+    LIMIT %s
+"""
+
+SQLITE_MESSAGE_SQL = """
+    SELECT rowid FROM conversations_message_fts
+    WHERE conversations_message_fts MATCH %s {scope}
+    ORDER BY bm25(conversations_message_fts), rowid
+    LIMIT %s
+"""
+
+POSTGRES_TICKET_SQL = f"""
+    SELECT ticket_id FROM (
+        SELECT id AS ticket_id, ts_rank({POSTGRES_TICKET_VECTOR}, query) AS score
+        FROM tickets_ticket, websearch_to_tsquery('{SEARCH_CONFIG}', %s) query
+        WHERE {POSTGRES_TICKET_VECTOR} @@ query
+        UNION ALL
+        SELECT ticket_id, ts_rank({POSTGRES_MESSAGE_VECTOR}, query) AS score
+        FROM conversations_message, websearch_to_tsquery('{SEARCH_CONFIG}', %s) query
+        WHERE {POSTGRES_MESSAGE_VECTOR} @@ query
+    ) matches
+    {{scope}}
+    GROUP BY ticket_id
+    ORDER BY MAX(score) DESC, ticket_id
+    LIMIT %s
+"""
+
+POSTGRES_MESSAGE_SQL = f"""
+    SELECT id FROM conversations_message, websearch_to_tsquery('{SEARCH_CONFIG}', %s) query
+    WHERE {POSTGRES_MESSAGE_VECTOR} @@ query {{scope}}
+    ORDER BY ts_rank({POSTGRES_MESSAGE_VECTOR}, query) DESC, id
+    LIMIT %s
+"""
+
+
+TICKET_SCOPE = 'WHERE ticket_id IN ({})'
+
+# Per-table DDL. The SQLite triggers are created with IF NOT EXISTS so
+# ensure_search_indexes() can restore them after Django rebuilds a table
+# (SQLite schema changes drop and recreate the table, and its triggers).
+SQLITE_INDEXES = {
+    'tickets_ticket': {
+        'create': [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS tickets_ticket_fts USING fts5(
+                title, description,
+                content='tickets_ticket', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_insert
+            AFTER INSERT ON tickets_ticket BEGIN
+                INSERT INTO tickets_ticket_fts(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_delete
+            AFTER DELETE ON tickets_ticket BEGIN
+                INSERT INTO tickets_ticket_fts(tickets_ticket_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_update
+            AFTER UPDATE OF title, description ON tickets_ticket BEGIN
+                INSERT INTO tickets_ticket_fts(tickets_ticket_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO tickets_ticket_fts(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+            """,
+        ],
+        'rebuild': "INSERT INTO tickets_ticket_fts(tickets_ticket_fts) VALUES ('rebuild')",
+        'drop': [
+            'DROP TRIGGER IF EXISTS tickets_ticket_fts_update',
+            'DROP TRIGGER IF EXISTS tickets_ticket_fts_delete',
+            'DROP TRIGGER IF EXISTS tickets_ticket_fts_insert',
+            'DROP TABLE IF EXISTS tickets_ticket_fts',
+        ],
+        'triggers': [
+            'tickets_ticket_fts_insert',
+            'tickets_ticket_fts_delete',
+            'tickets_ticket_fts_update',
+        ],
+    },
+    'conversations_message': {
+        'create': [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS conversations_message_fts USING fts5(
+                content,
+                content='conversations_message', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS conversations_message_fts_insert
+            AFTER INSERT ON conversations_message BEGIN
+                INSERT INTO conversations_message_fts(rowid, content)
+                VALUES (new.id, new.content);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS conversations_message_fts_delete
+            AFTER DELETE ON conversations_message BEGIN
+                INSERT INTO conversations_message_fts(conversations_message_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS conversations_message_fts_update
+            AFTER UPDATE OF content ON conversations_message BEGIN
+                INSERT INTO conversations_message_fts(conversations_message_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+                INSERT INTO conversations_message_fts(rowid, content)
+                VALUES (new.id, new.content);
+            END
+            """,
+        ],
+        'rebuild': "INSERT INTO conversations_message_fts(conversations_message_fts) VALUES ('rebuild')",
+        'drop': [
+            'DROP TRIGGER IF EXISTS conversations_message_fts_update',
+            'DROP TRIGGER IF EXISTS conversations_message_fts_delete',
+            'DROP TRIGGER IF EXISTS conversations_message_fts_insert',
+            'DROP TABLE IF EXISTS conversations_message_fts',
+        ],
+        'triggers': [
+            'conversations_message_fts_insert',
+            'conversations_message_fts_delete',
+            'conversations_message_fts_update',
+        ],
+    },
+}
+
+POSTGRES_INDEXES = {
+    'tickets_ticket': {
+        'create': [
+            f"""
+            CREATE INDEX IF NOT EXISTS tickets_ticket_search_idx
+            ON tickets_ticket USING gin (({POSTGRES_TICKET_VECTOR}))
+            """,
+        ],
+        'drop': ['DROP INDEX IF EXISTS tickets_ticket_search_idx'],
+    },
+    'conversations_message': {
+        'create': [
+            f"""
+            CREATE INDEX IF NOT EXISTS conversations_message_search_idx
+            ON conversations_message USING gin (({POSTGRES_MESSAGE_VECTOR}))
+            """,
+        ],
+        'drop': ['DROP INDEX IF EXISTS conversations_message_search_idx'],
+    },
+}
+
+
+def supports_full_text(using):
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def create_search_index(schema_editor, table):
+    """Create the full-text index for ``table`` and fill it from existing rows."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_INDEXES[table]['create']:
+            schema_editor.execute(statement)
+        schema_editor.execute(SQLITE_INDEXES[table]['rebuild'])
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_INDEXES[table]['create']:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(schema_editor, table):
+    indexes = {'sqlite': SQLITE_INDEXES, 'postgresql': POSTGRES_INDEXES}.get(
+        schema_editor.connection.vendor
+    )
+    if indexes:
+        for statement in indexes[table]['drop']:
+            schema_editor.execute(statement)
+
+
+def ensure_search_indexes(using='default', **kwargs):
+    """
+    post_migrate hook: restore SQLite FTS triggers lost to a table rebuild
+    and resync the index, since rows may have changed while they were gone.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+        for table, ddl in SQLITE_INDEXES.items():
+            if f'{table}_fts' not in tables or set(ddl['triggers']) <= triggers:
+                continue
+            for statement in ddl['create']:
+                cursor.execute(statement)
+            cursor.execute(ddl['rebuild'])
+
+
+def rank_tickets(queryset, term, limit):
+    """
+    Return the ids of up to ``limit`` tickets in ``queryset`` whose title,
+    description or messages match ``term``, most relevant first.
+    """
+    if connections[queryset.db].vendor == 'sqlite':
+        match = _fts5_query(term)
+        if not match:
+            return []
+        return _ranked_ids(queryset, SQLITE_TICKET_SQL, [match, match], limit, TICKET_SCOPE)
+    return _ranked_ids(queryset, POSTGRES_TICKET_SQL, [term, term], limit, TICKET_SCOPE)
+
+
+def rank_messages(queryset, term, limit):
+    """Return the ids of up to ``limit`` messages in ``queryset`` matching ``term``."""
+    if connections[queryset.db].vendor == 'sqlite':
+        match = _fts5_query(term)
+        if not match:
+            return []
+        return _ranked_ids(queryset, SQLITE_MESSAGE_SQL, [match], limit, 'AND rowid IN ({})')
+    return _ranked_ids(queryset, POSTGRES_MESSAGE_SQL, [term], limit, 'AND id IN ({})')
+
+
+def _ranked_ids(queryset, sql, params, limit, scope_template):
+    # The caller's queryset (permission scoping, status/priority filters)
+    # is pushed into the search query so the limit applies after filtering.
+    # An unfiltered queryset needs no scope, which spares materializing
+    # every id in the table.
+    scope, scope_params = '', []
+    if queryset.query.where:
+        scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+        scope = scope_template.format(scope_sql)
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql.format(scope=scope), [*params, *scope_params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fts5_query(term):
+    """
+    Turn free text into an FTS5 query: every word quoted (so user input
+    can't inject FTS5 syntax) and implicitly AND-ed, the last one as a prefix.
+    """
+    words = re.findall(r'\w+', term)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
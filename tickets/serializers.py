@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Ticket
 from accounts.serializers import UserSerializer
@@ -21,9 +24,13 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'title', 'description',
             'status', 'status_display', 'priority', 'priority_display',
-            'created_at', 'updated_at'
+            'created_at', 'updated_at',
+            'message_count', 'last_message_at', 'last_staff_response_at'
+        ]
+        read_only_fields = [
+            'user', 'created_at', 'updated_at',
+            'message_count', 'last_message_at', 'last_staff_response_at'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
         extra_kwargs = {
             'status': {'help_text': _('Set ticket resolution state')},
             'priority': {'help_text': _('Set urgency level')},
@@ -35,4 +42,60 @@ class TicketSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 _('Only staff or agents can close tickets.')
             )
-        return value
\ No newline at end of file
+        return value
+
+class TicketBulkPatchSerializer(TicketSerializer):
+    """The fields a bulk update may change, with the same validation rules"""
+
+    class Meta(TicketSerializer.Meta):
+        fields = ['status', 'priority']
+        read_only_fields = []
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(_('Patch must set status and/or priority.'))
+        return attrs
+
+
+class TicketBulkUpdateSerializer(serializers.Serializer):
+    """Select tickets by id list or by status/priority filter, and a patch to apply"""
+    MAX_IDS = 10000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_IDS,
+        help_text=_('Ticket ids to update')
+    )
+    filter = serializers.DictField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=False,
+        help_text=_('Status/priority filter selecting the tickets to update')
+    )
+    patch = TicketBulkPatchSerializer()
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(_('Provide exactly one of "ids" or "filter".'))
+        return attrs
+
+class TicketStatsQuerySerializer(serializers.Serializer):
+    """The day range of the statistics endpoint: the last 30 days unless given"""
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 366
+
+    start = serializers.DateField(required=False, help_text=_('First day (default: 29 days before end)'))
+    end = serializers.DateField(required=False, help_text=_('Last day (default: today)'))
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=self.DEFAULT_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError(_('start must not be after end.'))
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                _('At most %(days)d days at a time.') % {'days': self.MAX_DAYS}
+            )
+        return {'start': start, 'end': end}
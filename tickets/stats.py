@@ -0,0 +1,400 @@
+"""
+Ticket statistics, kept in rollup tables so dashboards read a row per day
+(and priority, or agent) instead of aggregating every ticket:
+
+- DailyTicketStats, per day and priority: tickets created, tickets closed
+  with the total time they took to resolve, first staff responses with the
+  total time they took,
+- AgentDailyStats, per day and agent: first responses and their total time,
+- TicketStatusCount, per status and priority: the tickets there now
+  (archived tickets count as closed).
+
+Each ticket contributes to them according to its created_at, priority,
+status, closed_at and first_response_at (and first responder). The write
+paths that change those add the difference in the same transaction:
+Ticket.save(), the delete receivers (however the ticket is deleted),
+bulk updates, the importer, and Message.save() for a ticket's first staff
+response. Archiving a ticket changes nothing. ``manage.py
+rebuild_ticket_stats`` recomputes them from the tickets, archived ones
+included.
+"""
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, DateTimeField, F, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+# Backends with INSERT ... ON CONFLICT DO UPDATE; others take an UPDATE
+# (and, for a new row, an INSERT) per row.
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+# Rows per upsert statement: 100 rows of 7 columns stay under SQLite's 999
+# parameters.
+UPSERT_CHUNK_SIZE = 100
+
+# DailyTicketStats' figures, summed over days and priorities by report().
+# Set by kept() around deletes that don't take tickets out of the rollups.
+_kept = contextvars.ContextVar('rollups_kept', default=False)
+
+DAILY_FIELDS = ('created', 'closed', 'resolution_seconds', 'first_responses', 'first_response_seconds')
+
+
+class Facts:
+    """What a ticket contributes to the rollups"""
+    __slots__ = ('created_at', 'priority', 'status', 'closed_at', 'first_response_at', 'first_responder_id')
+
+    def __init__(self, created_at, priority, status, closed_at=None, first_response_at=None, first_responder_id=None):
+        self.created_at = created_at
+        self.priority = priority
+        self.status = status
+        self.closed_at = closed_at
+        self.first_response_at = first_response_at
+        self.first_responder_id = first_responder_id
+
+    @classmethod
+    def of(cls, ticket, **overrides):
+        values = {name: getattr(ticket, name, None) for name in cls.__slots__}
+        return cls(**{**values, **overrides})
+
+
+class Rollup:
+    """Deltas to the rollup tables, accumulated and then written with apply()"""
+
+    def __init__(self):
+        self.deltas = defaultdict(Counter)
+
+    def add(self, facts, sign=1, agent=True):
+        """Add (``sign`` -1: remove) a ticket's contribution; ``agent``: its first responder's too"""
+        from .models import DailyTicketStats, Ticket, TicketStatusCount
+
+        self.deltas[TicketStatusCount, (facts.status, facts.priority)]['count'] += sign
+        self._daily(DailyTicketStats, facts.created_at, facts.priority, created=sign)
+        if facts.status == Ticket.Status.CLOSED and facts.closed_at is not None:
+            self._daily(
+                DailyTicketStats, facts.closed_at, facts.priority,
+                closed=sign, resolution_seconds=sign * _seconds(facts.closed_at - facts.created_at),
+            )
+        if facts.first_response_at is not None:
+            self.add_first_response(facts, sign, agent)
+
+    def add_first_response(self, facts, sign=1, agent=True):
+        from .models import AgentDailyStats, DailyTicketStats
+
+        seconds = _seconds(facts.first_response_at - facts.created_at)
+        self._daily(
+            DailyTicketStats, facts.first_response_at, facts.priority,
+            first_responses=sign, first_response_seconds=sign * seconds,
+        )
+        if agent and facts.first_responder_id is not None:
+            self._daily(
+                AgentDailyStats, facts.first_response_at, facts.first_responder_id,
+                first_responses=sign, first_response_seconds=sign * seconds,
+            )
+
+    def change(self, before, after):
+        """A ticket's status or priority changed from ``before`` to ``after`` (its first responder didn't)"""
+        self.add(before, -1, agent=False)
+        self.add(after, agent=False)
+
+    def apply(self, using=None):
+        """
+        Write the deltas, one statement per table where the backend can
+        upsert; call in the transaction that made the changes
+        """
+        rows = defaultdict(list)
+        # In key order, so concurrent writers lock rows in the same order.
+        for (model, key), values in sorted(self.deltas.items(), key=lambda item: (item[0][0].__name__, item[0][1])):
+            values = {field: value for field, value in values.items() if value}
+            if values:
+                rows[model].append((dict(zip(model.ROLLUP_KEY, key)), values))
+        for model, model_rows in rows.items():
+            if connections[using or DEFAULT_DB_ALIAS].vendor in UPSERT_VENDORS:
+                _upsert(model, model_rows, using)
+            else:
+                for key, values in model_rows:
+                    _increment(model, key, values, using)
+        self.deltas.clear()
+
+    def _daily(self, model, moment, key, **values):
+        self.deltas[model, (timezone.localdate(moment), key)].update(values)
+
+
+def ticket_added(ticket, using=None):
+    rollup = Rollup()
+    rollup.add(Facts.of(ticket))
+    rollup.apply(using)
+
+
+def ticket_changed(before, ticket, using=None):
+    rollup = Rollup()
+    rollup.change(before, Facts.of(ticket))
+    rollup.apply(using)
+
+
+@contextmanager
+def kept():
+    """Leave the rollups alone for tickets deleted in the block (archiving moves them, they still count)"""
+    token = _kept.set(True)
+    try:
+        yield
+    finally:
+        _kept.reset(token)
+
+
+def ticket_deleting(sender, instance, using, **kwargs):
+    """
+    pre_delete receiver for Ticket: note the first responder while the
+    thread, deleted in the same cascade, is still there.
+    """
+    if instance.first_response_at and not _kept.get():
+        instance._first_responder_id = instance.messages.using(using).filter(is_admin_response=True).order_by(
+            'created_at'
+        ).values_list('sender_id', flat=True).first()
+
+
+def ticket_deleted(sender, instance, using, **kwargs):
+    """post_delete receiver for Ticket: take it out of the rollups"""
+    if _kept.get():
+        return
+    rollup = Rollup()
+    rollup.add(Facts.of(instance, first_responder_id=getattr(instance, '_first_responder_id', None)), -1)
+    rollup.apply(using)
+
+
+def update_tickets(ids, patch, using=None):
+    """
+    Apply a bulk status/priority ``patch`` to the (locked) tickets ``ids``
+    with one UPDATE, setting or clearing closed_at, and the rollups from
+    one read of the rows. Returns the number of tickets updated.
+    """
+    from .models import Ticket
+
+    tickets = Ticket.objects.using(using).filter(pk__in=ids)
+    if 'status' not in patch and 'priority' not in patch:
+        return tickets.update(**patch)
+    closed = Ticket.Status.CLOSED
+    now = patch.get('updated_at') or timezone.now()
+    rollup = Rollup()
+    rows = tickets.order_by().values_list('created_at', 'priority', 'status', 'closed_at', 'first_response_at')
+    for row in rows:
+        before = Facts(*row)
+        status = patch.get('status', before.status)
+        closed_at = None if status != closed else before.closed_at if before.status == closed else now
+        after = Facts(before.created_at, patch.get('priority', before.priority), status, closed_at, before.first_response_at)
+        rollup.change(before, after)
+    if 'status' in patch:
+        # Tickets already closed keep their closed_at (the right-hand side
+        # sees the row as it was).
+        patch = dict(patch, closed_at=Case(
+            When(status=closed, then=F('closed_at')), default=Value(now), output_field=DateTimeField(),
+        ) if patch['status'] == closed else None)
+    count = tickets.update(**patch)
+    rollup.apply(using)
+    return count
+
+
+def first_response(ticket_id, sender_id, responded_at, using=None):
+    """
+    Record ``responded_at`` as the ticket's first staff response unless it
+    has one. One conditional UPDATE when it has; returns whether it was the first.
+    """
+    from .models import Ticket
+
+    tickets = Ticket.objects.using(using).filter(pk=ticket_id)
+    if not tickets.filter(first_response_at__isnull=True).update(first_response_at=responded_at):
+        return False
+    created_at, priority, status = tickets.values_list('created_at', 'priority', 'status').get()
+    rollup = Rollup()
+    rollup.add_first_response(Facts(created_at, priority, status, None, responded_at, sender_id))
+    rollup.apply(using)
+    return True
+
+
+def rebuild(batch_size=BATCH_SIZE, using=None):
+    """
+    Recompute the rollups from the tickets, archived ones included.
+
+    First fills in first_response_at on tickets from before it was recorded,
+    from their threads, ``batch_size`` tickets per transaction (migration
+    0008 estimated closed_at once; a closed ticket without one counts as
+    closed, with no closing day or resolution time). Then reads every
+    ticket's contribution and replaces the tables in one transaction, so
+    changes made meanwhile are neither lost nor counted twice. Returns the
+    number of tickets counted.
+    """
+    from conversations.models import ArchivedMessage, Message
+    from .models import AgentDailyStats, ArchivedTicket, DailyTicketStats, Ticket, TicketStatusCount
+
+    sources = []
+    for model, message_model in ((Ticket, Message), (ArchivedTicket, ArchivedMessage)):
+        # A scan of the message's (ticket, created_at) index per ticket.
+        first_response = message_model.objects.using(using).filter(
+            ticket=OuterRef('pk'), is_admin_response=True,
+        ).order_by('created_at')
+        tickets = model.objects.using(using).order_by()
+        for low, high in _pk_ranges(tickets, batch_size):
+            with transaction.atomic(using=using):
+                tickets.filter(pk__range=(low, high), first_response_at__isnull=True).update(
+                    first_response_at=Subquery(first_response.values('created_at')[:1]),
+                )
+        sources.append(tickets.annotate(
+            first_responder=Subquery(first_response.values('sender_id')[:1]),
+            **({} if model is Ticket else {'current_status': Value(Ticket.Status.CLOSED)}),
+        ).values_list(
+            'created_at', 'priority', 'status' if model is Ticket else 'current_status',
+            'closed_at', 'first_response_at', 'first_responder',
+        ))
+
+    rollup = Rollup()
+    # Every status and priority gets its row, at zero if need be.
+    for status in Ticket.Status.values:
+        for priority in Ticket.Priority.values:
+            rollup.deltas[TicketStatusCount, (status, priority)]['count'] += 0
+    counted = 0
+    with transaction.atomic(using=using):
+        for rows in sources:
+            for row in rows.iterator(chunk_size=batch_size):
+                rollup.add(Facts(*row))
+                counted += 1
+        for model in (DailyTicketStats, AgentDailyStats, TicketStatusCount):
+            model.objects.using(using).all().delete()
+            model.objects.using(using).bulk_create([
+                model(**dict(zip(model.ROLLUP_KEY, key)), **values)
+                for (deltas_model, key), values in rollup.deltas.items() if deltas_model is model
+            ], batch_size=batch_size)
+    return counted
+
+
+def report(start, end, using=None):
+    """
+    The statistics for the days ``start`` to ``end`` (inclusive): current
+    counts per status, per-day figures (every day, zeros included) with a
+    per-priority breakdown, and first responses per agent. Three queries,
+    each reading a row per status, day or agent.
+    """
+    from .models import AgentDailyStats, DailyTicketStats, Ticket, TicketStatusCount
+
+    statuses = {
+        status: {'total': 0, 'by_priority': dict.fromkeys(Ticket.Priority.values, 0)}
+        for status in Ticket.Status.values
+    }
+    for status, priority, count in TicketStatusCount.objects.using(using).values_list('status', 'priority', 'count'):
+        statuses[status]['total'] += count
+        statuses[status]['by_priority'][priority] = count
+
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        days[day] = {'day': day, **_figures(), 'by_priority': {}}
+    totals = _figures()
+    rows = DailyTicketStats.objects.using(using).filter(day__range=(start, end)).values_list(
+        'day', 'priority', *DAILY_FIELDS
+    )
+    for day, priority, *values in rows:
+        days[day]['by_priority'][priority] = _figures(*values)
+        for figures in (days[day], totals):
+            for field, value in zip(DAILY_FIELDS, values):
+                figures[field] += value
+
+    agents = AgentDailyStats.objects.using(using).filter(day__range=(start, end)).values(
+        'agent_id', 'agent__email',
+    ).annotate(
+        responses=Sum('first_responses'), seconds=Sum('first_response_seconds'),
+    ).filter(responses__gt=0).order_by('-responses', 'agent_id')
+    return {
+        'start': start,
+        'end': end,
+        'statuses': statuses,
+        'totals': _averaged(totals),
+        'days': [
+            dict(_averaged(figures), by_priority={
+                priority: _averaged(values) for priority, values in figures['by_priority'].items()
+            })
+            for figures in days.values()
+        ],
+        'agents': [
+            {
+                'id': agent['agent_id'],
+                'email': agent['agent__email'],
+                'first_responses': agent['responses'],
+                'avg_first_response_seconds': _average(agent['seconds'], agent['responses']),
+            }
+            for agent in agents
+        ],
+    }
+
+
+def _figures(*values):
+    return dict(zip(DAILY_FIELDS, values or [0] * len(DAILY_FIELDS)))
+
+
+def _averaged(figures):
+    """Report the summed seconds as averages"""
+    figures = dict(figures)
+    figures['avg_resolution_seconds'] = _average(figures.pop('resolution_seconds'), figures['closed'])
+    figures['avg_first_response_seconds'] = _average(figures.pop('first_response_seconds'), figures['first_responses'])
+    return figures
+
+
+def _average(total, count):
+    return round(total / count) if count else None
+
+
+def _upsert(model, rows, using):
+    """
+    Add ``rows`` of ``(key, values)`` to the table, creating the missing
+    ones: INSERT ... ON CONFLICT DO UPDATE, which SQLite and PostgreSQL
+    spell the same way
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    quote = connection.ops.quote_name
+    fields = {field.attname: field for field in model._meta.concrete_fields if not field.primary_key}
+    value_fields = [name for name in fields if name not in model.ROLLUP_KEY]
+    columns = [*model.ROLLUP_KEY, *value_fields]
+    table = quote(model._meta.db_table)
+    template = 'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({key}) DO UPDATE SET {updates}'
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+        params = [
+            fields[name].get_db_prep_save({**key, **values}.get(name, 0), connection)
+            for key, values in chunk for name in columns
+        ]
+        sql = template.format(
+            table=table,
+            columns=', '.join(quote(fields[name].column) for name in columns),
+            values=', '.join([f"({', '.join(['%s'] * len(columns))})"] * len(chunk)),
+            key=', '.join(quote(fields[name].column) for name in model.ROLLUP_KEY),
+            updates=', '.join(
+                f'{quote(fields[name].column)} = {table}.{quote(fields[name].column)} + excluded.{quote(fields[name].column)}'
+                for name in value_fields
+            ),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def _increment(model, key, values, using):
+    rows = model.objects.using(using).filter(**key)
+    increments = {field: F(field) + value for field, value in values.items()}
+    if not rows.update(**increments):
+        # First change to the row (today's, usually): create it at zero,
+        # unless a concurrent transaction just did, and increment that.
+        model.objects.using(using).bulk_create([model(**key)], ignore_conflicts=True)
+        rows.update(**increments)
+
+
+def _pk_ranges(queryset, size):
+    """Cover the queryset's primary keys with ranges of ``size`` values"""
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, size):
+        yield low, low + size - 1
+
+
+def _seconds(duration):
+    return int(duration.total_seconds())
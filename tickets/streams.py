@@ -0,0 +1,125 @@
+"""
+Server-Sent Events streams (served under ASGI, see ticketing_system.asgi).
+
+- ``GET tickets/<id>/events/``: new messages and status/priority changes of
+  one ticket, for whoever may read its messages (same rule as
+  HasTicketAccess). Message events carry their id, so a reconnecting
+  client's ``Last-Event-ID`` replays the messages it missed.
+- ``GET tickets/queue/events/``: new tickets and status/priority changes for
+  the agent work queue; Admins/Agents only.
+
+Authentication is the API's JWT ``Authorization: Bearer`` header. The
+database is only touched while the stream opens; after that a connection
+waits on the in-process broadcaster and costs no thread or DB connection.
+"""
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import AuthenticationFailed
+from accounts.authentication import JWTAuthentication
+from ticketing_system.events import get_broadcaster
+from .events import QUEUE_CHANNEL, ticket_channel
+from .models import Ticket
+
+# Reconnect delay suggested to clients, in milliseconds.
+RETRY = 3000
+# Most messages replayed from Last-Event-ID; a client further behind should
+# refetch the thread from the messages endpoint.
+MAX_REPLAY = 100
+
+
+async def ticket_events(request, ticket_pk):
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    if not await Ticket.objects.accessible_to(user).filter(pk=ticket_pk).aexists():
+        return JsonResponse({'detail': _('Ticket not found or access denied.')}, status=404)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    replay_after = int(last_event_id) if last_event_id.isdigit() else None
+    return _event_stream(ticket_channel(ticket_pk), _missed_messages(ticket_pk, replay_after))
+
+
+async def queue_events(request):
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    if not (user.is_staff or user.is_agent):
+        return JsonResponse(
+            {'detail': _('You do not have permission to perform this action.')}, status=403
+        )
+    return _event_stream(QUEUE_CHANNEL)
+
+
+async def _authenticate(request):
+    """Return ``(user, None)``, or ``(None, error response)``"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for as long as the client listens.
+        return None, JsonResponse({'detail': _('Event streams require an ASGI server.')}, status=501)
+    try:
+        result = await JWTAuthentication().aauthenticate(request)
+    except AuthenticationFailed as exc:
+        return None, JsonResponse({'detail': exc.detail}, status=401)
+    if result is None:
+        return None, JsonResponse(
+            {'detail': _('Authentication credentials were not provided.')}, status=401
+        )
+    return result[0], None
+
+
+async def _missed_messages(ticket_pk, after):
+    if after is None:
+        return
+    # Imported here: conversations depends on tickets, not the other way round.
+    from conversations.models import Message
+    from conversations.serializers import MessageSerializer
+    queryset = (
+        Message.objects.filter(ticket_id=ticket_pk, pk__gt=after)
+        .select_related('sender').order_by('pk')[:MAX_REPLAY]
+    )
+    async for message in queryset:
+        yield {'event': 'message.created', 'id': message.pk, 'data': MessageSerializer(message).data}
+
+
+def _event_stream(channel, replay=None):
+    broadcaster = get_broadcaster()
+
+    async def stream():
+        # Subscribe before replaying so nothing published in between is
+        # lost; events already replayed are skipped by id.
+        subscription = await broadcaster.subscribe(channel)
+        try:
+            yield f'retry: {RETRY}\n\n'
+            replayed = 0
+            if replay is not None:
+                async for event in replay:
+                    replayed = event['id']
+                    yield _format(event)
+            while True:
+                try:
+                    event = await subscription.get(timeout=broadcaster.heartbeat)
+                except ConnectionResetError:
+                    return
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif event.get('id', replayed + 1) > replayed:
+                    yield _format(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let a reverse proxy buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _format(event):
+    lines = [f"event: {event['event']}"]
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append('data: ' + json.dumps(event['data'], cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
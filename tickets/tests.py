@@ -1,3 +1,1307 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from base64 import b64decode, b64encode
+from datetime import UTC, date, datetime, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlencode, urlparse
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import ResolverMatch
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser
+from accounts.serializers import CustomTokenObtainPairSerializer
+from conversations.admin import MessageAdmin
+from conversations.models import ArchivedMessage, Message
+from .admin import TicketAdmin
+from .archive import archive_closed_tickets
+from . import exporter, search, stats
+from .models import AgentDailyStats, ArchivedTicket, DailyTicketStats, Ticket, TicketQuerySet, TicketStatusCount
+from .views import TicketDetailAsyncView, TicketListAsyncView
+from ticketing_system import benchmarks
+from ticketing_system.seeding import Seeder
+from ticketing_system.routers import ReplicaRouter, ReplicaRoutingMiddleware, primary_reads, read_from_primary
+
+
+class TicketQueryBudgetTests(APITestCase):
+    """
+    Query budgets for the ticket endpoints.
+
+    Lists are measured on a full page of tickets owned by many different
+    users, so any per-row query (an N+1) blows the budget. Authentication is
+    forced, so the budgets cover the view alone.
+    """
+    PAGE_SIZE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', password=password,
+            is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        customers = CustomUser.objects.bulk_create([
+            CustomUser(email=f'customer{i}@example.com', username=f'customer{i}', password=password)
+            for i in range(cls.PAGE_SIZE + 10)
+        ])
+        cls.customer = customers[0]
+        Ticket.objects.bulk_create([
+            Ticket(
+                user=customers[i % len(customers)],
+                title=f'Printer issue {i}',
+                description='The printer on floor two is jammed again.',
+                priority=Ticket.Priority.values[i % 3],
+            )
+            for i in range(cls.PAGE_SIZE * 3)
+        ])
+        cls.ticket = Ticket.objects.filter(user=cls.customer).first()
+        Message.objects.bulk_create([
+            Message(ticket=cls.ticket, sender=cls.agent, content='Looking into the printer.')
+            for _ in range(5)
+        ])
+
+    def setUp(self):
+        # Cached users and tickets are keyed by ids the test database reuses.
+        cache.clear()
+
+    def get(self, user, url, params=None, budget=1):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_as_staff(self):
+        response = self.get(self.staff, reverse('ticket-list'))
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_list_as_agent_second_page(self):
+        first = self.get(self.agent, reverse('ticket-list'))
+        self.get(self.agent, first.data['next'])
+
+    def test_list_as_customer(self):
+        response = self.get(self.customer, reverse('ticket-list'))
+        self.assertTrue(all(t['user']['id'] == self.customer.id for t in response.data['results']))
+
+    def test_filtered_and_ordered_list(self):
+        self.get(self.staff, reverse('ticket-list'), {'status': 'open', 'priority': 'high', 'ordering': '-updated_at'})
+
+    def test_search(self):
+        # One full-text lookup plus the page itself.
+        response = self.get(self.staff, reverse('ticket-list'), {'search': 'printer'}, budget=2)
+        self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_retrieve(self):
+        self.get(self.customer, reverse('ticket-detail', args=[self.ticket.pk]))
+
+    def test_conditional_retrieve(self):
+        url = reverse('ticket-detail', args=[self.ticket.pk])
+        first = self.get(self.customer, url)
+        etag = first['ETag']
+
+        # Straight from the cache: no query, no body.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(url, headers={'If-Modified-Since': first['Last-Modified']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A new message moves the ticket's counters, not its updated_at.
+        Message.objects.create(ticket=self.ticket, sender=self.agent, content='Fixed.')
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Not cached: one narrow lookup, no body.
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Validators never leak tickets the caller can't see.
+        other = Ticket.objects.exclude(user=self.customer).first()
+        response = self.client.get(reverse('ticket-detail', args=[other.pk]), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_list(self):
+        url = reverse('ticket-list')
+        first = self.get(self.staff, url, {'ordering': '-updated_at'})
+        etag = first['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ordering': '-updated_at'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Another page, or a change to a ticket on this one, is a new representation.
+        response = self.client.get(first.data['next'], headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ticket = Ticket.objects.get(pk=first.data['results'][-1]['id'])
+        ticket.title = 'Printer fixed'
+        ticket.save()
+        response = self.client.get(url, {'ordering': '-updated_at'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], 'Printer fixed')
+
+    def test_retrieve_is_cached(self):
+        url = reverse('ticket-detail', args=[self.ticket.pk])
+        self.get(self.customer, url)
+        self.get(self.customer, url, budget=0)
+
+        # Writes invalidate the entry.
+        self.client.force_authenticate(self.agent)
+        self.client.patch(url, {'priority': 'low'})
+        self.assertEqual(self.get(self.customer, url).data['priority'], 'low')
+        self.customer.first_name = 'Ada'
+        self.customer.save()
+        self.assertEqual(self.get(self.customer, url).data['user']['name'], 'Ada')
+
+        # Cached or not, other customers can't see it.
+        self.client.force_authenticate(Ticket.objects.exclude(user=self.customer).first().user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create(self):
+        # The insert, and an upsert per statistics table: status counts and days.
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('ticket-list'), {
+                'title': 'New ticket', 'description': 'Details',
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_partial_update(self):
+        # Closing: the ticket, and an upsert per statistics table.
+        self.client.force_authenticate(self.agent)
+        with self.assertNumQueries(4):
+            response = self.client.patch(
+                reverse('ticket-detail', args=[self.ticket.pk]), {'status': 'closed'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_update(self):
+        # A SELECT ... FOR UPDATE, a read of the rows, an UPDATE and an
+        # upsert per statistics table per chunk, inside a savepoint.
+        ids = list(Ticket.objects.values_list('pk', flat=True))
+        self.client.force_authenticate(self.agent)
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse('ticket-bulk-update'), {
+                'ids': ids, 'patch': {'status': 'closed'},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], len(ids))
+
+    def test_work_queue(self):
+        # 50 high priority tickets fill the first page, oldest first; the
+        # second page moves on to medium.
+        response = self.get(self.agent, reverse('ticket-queue'))
+        results = response.data['results']
+        self.assertEqual([t['priority'] for t in results], ['high'] * self.PAGE_SIZE)
+        self.assertEqual(results, sorted(results, key=lambda t: (t['created_at'], t['id'])))
+        response = self.get(self.agent, response.data['next'])
+        self.assertEqual(response.data['results'][0]['priority'], 'medium')
+
+    def test_work_queue_next(self):
+        response = self.get(self.agent, reverse('ticket-queue-next'))
+        expected = Ticket.objects.filter(priority='high').order_by('created_at', 'id').first()
+        self.assertEqual(response.data['id'], expected.pk)
+
+    def test_work_queue_is_staff_only(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(reverse('ticket-queue'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_ordering_by_priority_uses_urgency(self):
+        response = self.get(self.staff, reverse('ticket-list'), {'ordering': '-priority'})
+        priorities = [t['priority'] for t in response.data['results']]
+        self.assertEqual(priorities, ['high'] * self.PAGE_SIZE)
+        response = self.get(self.staff, reverse('ticket-list'), {'ordering': 'priority'})
+        self.assertEqual(response.data['results'][0]['priority'], 'low')
+
+
+class TicketEventStreamTests(TestCase):
+    """Server-Sent Events: access rules and live delivery of new messages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=password,
+        )
+        cls.other = CustomUser.objects.create(
+            email='other@example.com', username='other', password=password,
+        )
+        cls.ticket = Ticket.objects.create(user=cls.customer, title='Printer', description='Jammed')
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('ticket-events', args=[self.ticket.pk]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_other_customers_ticket_is_hidden(self):
+        response = await self.async_client.get(
+            reverse('ticket-events', args=[self.ticket.pk]), headers=self.auth(self.other)
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_queue_is_staff_only(self):
+        response = await self.async_client.get(
+            reverse('ticket-queue-events'), headers=self.auth(self.customer)
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_new_message_is_pushed(self):
+        earlier = await Message.objects.acreate(ticket=self.ticket, sender=self.agent, content='Hello')
+        response = await self.async_client.get(
+            reverse('ticket-events', args=[self.ticket.pk]),
+            headers={**self.auth(self.customer), 'Last-Event-ID': str(earlier.pk - 1)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            self.assertIn(f'id: {earlier.pk}'.encode(), await anext(stream))
+
+            def reply():
+                with self.captureOnCommitCallbacks(execute=True):
+                    return Message.objects.create(ticket=self.ticket, sender=self.agent, content='On it')
+
+            message = await sync_to_async(reply)()
+            event = await anext(stream)
+        finally:
+            await stream.aclose()
+        self.assertIn(b'event: message.created', event)
+        self.assertIn(f'id: {message.pk}'.encode(), event)
+        self.assertIn(b'"content": "On it"', event)
+
+
+class TicketAsyncViewTests(TestCase):
+    """The async list/retrieve views match the viewset, at the same query cost"""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=password,
+        )
+        cls.other = CustomUser.objects.create(
+            email='other@example.com', username='other', password=password,
+        )
+        Ticket.objects.bulk_create([
+            Ticket(user=cls.customer if i % 2 else cls.other, title=f'Printer {i}', description='Jammed')
+            for i in range(60)
+        ])
+        cls.ticket = Ticket.objects.filter(user=cls.customer).first()
+
+    def setUp(self):
+        # Cached users and tickets are keyed by ids the test database reuses.
+        cache.clear()
+
+    def get(self, view, user, path, params=None, headers=None, **kwargs):
+        # The view runs on an event loop; its ORM calls come back to this
+        # thread, so assertNumQueries still sees them.
+        headers = dict(headers or {})
+        if user:
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        request = AsyncRequestFactory().get(path, params, headers=headers)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_list(self):
+        # The user behind the token, the full-text lookup and the page.
+        with self.assertNumQueries(3):
+            response = self.get(TicketListAsyncView, self.agent, '/api/v1/tickets/', {
+                'search': 'printer', 'ordering': '-priority',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_list_is_scoped_to_the_customer(self):
+        response = self.get(TicketListAsyncView, self.customer, '/api/v1/tickets/')
+        self.assertEqual({t['user']['id'] for t in response.data['results']}, {self.customer.id})
+
+    def test_list_with_login_token(self):
+        # The token's claims scope the list: no user lookup, only the page
+        # (once the user's current claims are cached).
+        token = CustomTokenObtainPairSerializer.get_token(self.customer).access_token
+        request = AsyncRequestFactory().get('/api/v1/tickets/', headers={'Authorization': f'Bearer {token}'})
+        async_to_sync(TicketListAsyncView.as_view())(request)
+        with self.assertNumQueries(1):
+            response = async_to_sync(TicketListAsyncView.as_view())(request)
+        self.assertEqual({t['user']['id'] for t in response.data['results']}, {self.customer.id})
+
+    def test_anonymous_sees_nothing(self):
+        response = self.get(TicketListAsyncView, None, '/api/v1/tickets/')
+        self.assertEqual(response.data['results'], [])
+
+    def test_retrieve(self):
+        path = f'/api/v1/tickets/{self.ticket.pk}/'
+        with self.assertNumQueries(2):
+            response = self.get(TicketDetailAsyncView, self.customer, path, pk=self.ticket.pk)
+        self.assertEqual(response.data['id'], self.ticket.pk)
+        response = self.get(TicketDetailAsyncView, self.other, path, pk=self.ticket.pk)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_get(self):
+        path = f'/api/v1/tickets/{self.ticket.pk}/'
+        etag = self.get(TicketDetailAsyncView, self.customer, path, pk=self.ticket.pk)['ETag']
+        # The user and the ticket both come from the cache now.
+        with self.assertNumQueries(0):
+            response = self.get(
+                TicketDetailAsyncView, self.customer, path, headers={'If-None-Match': etag}, pk=self.ticket.pk
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        etag = self.get(TicketListAsyncView, self.agent, '/api/v1/tickets/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(TicketListAsyncView, self.agent, '/api/v1/tickets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SQLiteProfileTests(TestCase):
+    """Connections come up with the SQLITE_PRAGMAS profile"""
+
+    def test_connection_settings(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Safe requests read from a replica, unless the client just wrote"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def route(self, method='get', view=None, write=False, token='alice'):
+        """The alias a read goes to in a request handled by ``view``"""
+        aliases = []
+
+        def get_response(request):
+            if view is not None:
+                request.resolver_match = ResolverMatch(view, (), {})
+            if write:
+                self.assertEqual(self.router.db_for_write(Ticket), 'default')
+            aliases.append(self.router.db_for_read(Ticket))
+            return HttpResponse()
+
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        ReplicaRoutingMiddleware(get_response)(getattr(self.factory, method)('/', headers=headers))
+        return aliases[0]
+
+    def test_reads_follow_the_method(self):
+        self.assertEqual(self.route('get'), 'replica')
+        self.assertEqual(self.route('get', token=None), 'replica')
+        self.assertEqual(self.route('post'), 'default')
+        # Outside requests (commands), Django's default applies.
+        self.assertIsNone(self.router.db_for_read(Ticket))
+
+    def test_writers_read_their_writes(self):
+        self.assertEqual(self.route('post', write=True), 'default')
+        self.assertEqual(self.route('get'), 'default')
+        self.assertEqual(self.route('get', token='bob'), 'replica')
+        # A request that writes reads from the primary from then on.
+        self.assertEqual(self.route('get', token='bob', write=True), 'default')
+
+    def test_session_login_reads_its_writes(self):
+        # A login arrives without a session cookie: the one it sets is pinned.
+        def login(request):
+            self.router.db_for_write(Ticket)
+            response = HttpResponse()
+            response.set_cookie(settings.SESSION_COOKIE_NAME, 'new-session')
+            return response
+
+        ReplicaRoutingMiddleware(login)(self.factory.post('/'))
+        self.factory.cookies[settings.SESSION_COOKIE_NAME] = 'new-session'
+        self.assertEqual(self.route('get', token=None), 'default')
+        self.factory.cookies[settings.SESSION_COOKIE_NAME] = 'other-session'
+        self.assertEqual(self.route('get', token=None), 'replica')
+
+    def test_primary_overrides(self):
+        self.assertEqual(self.route(view=read_from_primary(lambda request: None)), 'default')
+        with primary_reads():
+            self.assertEqual(self.route(), 'default')
+
+
+class KeysetPaginationTests(APITestCase):
+    """ticketing_system.pagination.KeysetPagination, walked through the ticket list"""
+    PAGE_SIZE = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        tickets = Ticket.objects.bulk_create([
+            Ticket(
+                user=cls.staff,
+                title=f'Printer issue {i}' if i % 5 else f'Scanner issue {i}',
+                description='The printer on floor two is jammed again.' * (1 + i % 4),
+                priority=Ticket.Priority.values[i % 3],
+            )
+            for i in range(40)
+        ])
+        # Three creation times for 40 tickets: most positions tie on the
+        # leading ordering field.
+        now = timezone.now()
+        for i in range(3):
+            Ticket.objects.filter(pk__in=[t.pk for t in tickets[i::3]]).update(
+                created_at=now - timedelta(hours=i)
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.staff)
+
+    def walk(self, url, params=None, link='next'):
+        """The pages from ``url`` on, following ``link``, and the last response"""
+        pages = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([t['id'] for t in response.data['results']])
+            url, params = response.data[link], None
+        return pages, response
+
+    def assertWalks(self, params, expected):
+        pages, last = self.walk(reverse('ticket-list'), {'page_size': self.PAGE_SIZE, **params})
+        self.assertTrue(all(len(page) == self.PAGE_SIZE for page in pages[:-1]))
+        self.assertEqual(sum(pages, []), expected)
+        # And back again from the last page.
+        backward, first = self.walk(last.data['previous'], link='previous')
+        self.assertEqual(backward[::-1] + pages[-1:], pages)
+        self.assertIsNone(first.data['previous'])
+        self.assertIsNotNone(first.data['next'])
+
+    def test_ties_on_the_ordering_field(self):
+        self.assertWalks({}, list(Ticket.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+        self.assertWalks(
+            {'ordering': 'created_at'},
+            list(Ticket.objects.order_by('created_at', 'id').values_list('id', flat=True)),
+        )
+
+    def test_ordering_by_a_generated_field(self):
+        # ``priority`` sorts by the priority_rank GeneratedField.
+        self.assertWalks(
+            {'ordering': '-priority'},
+            list(Ticket.objects.order_by('-priority_rank', '-id').values_list('id', flat=True)),
+        )
+
+    def test_ordering_by_an_annotation(self):
+        # A search orders by the search_rank annotation.
+        response = self.client.get(reverse('ticket-list'), {'search': 'printer', 'page_size': 100})
+        ranked = [t['id'] for t in response.data['results']]
+        self.assertEqual(len(ranked), 40)
+        self.assertWalks({'search': 'printer'}, ranked)
+
+    def test_rows_added_while_walking(self):
+        expected = list(Ticket.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        response = self.client.get(reverse('ticket-list'), {'page_size': self.PAGE_SIZE})
+        # New tickets sort before the cursor: an offset would repeat rows.
+        for i in range(3):
+            Ticket.objects.create(user=self.staff, title=f'Late {i}', description='Jammed')
+        pages, _ = self.walk(response.data['next'])
+        self.assertEqual([t['id'] for t in response.data['results']] + sum(pages, []), expected)
+
+    def test_tampered_cursor(self):
+        response = self.client.get(reverse('ticket-list'), {'page_size': self.PAGE_SIZE})
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        tokens = parse_qs(b64decode(cursor).decode())
+
+        def with_position(position):
+            return b64encode(urlencode({**tokens, 'p': position}, doseq=True).encode()).decode()
+
+        for cursor in (
+            'not-a-cursor',
+            with_position('not json'),
+            with_position('["2026-01-01T00:00:00+00:00"]'),
+            with_position('["yesterday",1]'),
+            with_position('["2026-01-01T00:00:00+00:00","one"]'),
+            with_position('{"created_at":1}'),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('ticket-list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TicketBulkUpdateTests(APITestCase):
+    """The bulk-update endpoint: selection, access rules and what it changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(email='customer@example.com', username='customer')
+        cls.other = CustomUser.objects.create(email='other@example.com', username='other')
+        cls.high, cls.low, cls.pending, cls.others = [
+            Ticket.objects.create(user=user, title='Printer', description='Jammed', priority=priority, status=status_)
+            for user, priority, status_ in (
+                (cls.customer, Ticket.Priority.HIGH, Ticket.Status.OPEN),
+                (cls.customer, Ticket.Priority.LOW, Ticket.Status.OPEN),
+                (cls.customer, Ticket.Priority.MEDIUM, Ticket.Status.PENDING),
+                (cls.other, Ticket.Priority.MEDIUM, Ticket.Status.OPEN),
+            )
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def bulk_update(self, user, data, expected=status.HTTP_200_OK):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('ticket-bulk-update'), data, format='json')
+        self.assertEqual(response.status_code, expected)
+        return response.data
+
+    def assertRollupsMatchRebuild(self):
+        incremental = rollup_tables()
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), incremental)
+
+    def test_update_by_ids(self):
+        missing = self.others.pk + 100
+        data = self.bulk_update(self.agent, {
+            'ids': [self.high.pk, missing, self.low.pk, self.high.pk], 'patch': {'status': 'closed'},
+        })
+        self.assertEqual(data, {'updated': 2, 'results': [
+            {'id': self.high.pk, 'result': 'updated'},
+            {'id': missing, 'result': 'not_found'},
+            {'id': self.low.pk, 'result': 'updated'},
+        ]})
+        for ticket in (self.high, self.low):
+            ticket.refresh_from_db()
+            self.assertEqual(ticket.status, Ticket.Status.CLOSED)
+            self.assertEqual(ticket.closed_at, ticket.updated_at)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, Ticket.Status.PENDING)
+        self.assertEqual(
+            dict(TicketStatusCount.objects.filter(status=Ticket.Status.CLOSED, count__gt=0).values_list('priority', 'count')),
+            {'high': 1, 'low': 1},
+        )
+        self.assertRollupsMatchRebuild()
+
+        # Reopening clears the closing time; the rollups follow.
+        self.bulk_update(self.agent, {'ids': [self.high.pk], 'patch': {'status': 'open', 'priority': 'low'}})
+        self.high.refresh_from_db()
+        self.assertIsNone(self.high.closed_at)
+        self.assertEqual(self.high.priority, Ticket.Priority.LOW)
+        self.assertRollupsMatchRebuild()
+
+    def test_update_by_filter(self):
+        data = self.bulk_update(self.agent, {'filter': {'status': 'open'}, 'patch': {'status': 'pending'}})
+        opened = sorted([self.high.pk, self.low.pk, self.others.pk])
+        self.assertEqual(data['updated'], 3)
+        self.assertEqual(data['results'], [{'id': pk, 'result': 'updated'} for pk in opened])
+        self.assertEqual(Ticket.objects.filter(status=Ticket.Status.PENDING).count(), 4)
+        self.assertRollupsMatchRebuild()
+
+        data = self.bulk_update(self.agent, {'filter': {'owner': 'me'}, 'patch': {'status': 'open'}},
+                                expected=status.HTTP_400_BAD_REQUEST)
+        self.assertIn('owner', data['filter'])
+
+    def test_customer_scope(self):
+        # Someone else's ticket looks just like a missing one.
+        data = self.bulk_update(self.customer, {
+            'ids': [self.low.pk, self.others.pk], 'patch': {'priority': 'high'},
+        })
+        self.assertEqual(data['results'], [
+            {'id': self.low.pk, 'result': 'updated'},
+            {'id': self.others.pk, 'result': 'not_found'},
+        ])
+        data = self.bulk_update(self.customer, {'filter': {'priority': 'medium'}, 'patch': {'priority': 'low'}})
+        self.assertEqual(data['results'], [{'id': self.pending.pk, 'result': 'updated'}])
+        self.others.refresh_from_db()
+        self.assertEqual(self.others.priority, Ticket.Priority.MEDIUM)
+
+    def test_customer_may_not_close(self):
+        data = self.bulk_update(self.customer, {'ids': [self.high.pk], 'patch': {'status': 'closed'}},
+                                expected=status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', data['patch'])
+        self.high.refresh_from_db()
+        self.assertEqual(self.high.status, Ticket.Status.OPEN)
+        self.assertIsNone(self.high.closed_at)
+
+
+class TicketExportTests(APITestCase):
+    """Streamed CSV/NDJSON exports: contents, filters and access scope"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(email='customer@example.com', username='customer')
+        cls.other = CustomUser.objects.create(email='other@example.com', username='other')
+        cls.open, cls.closed, cls.others = [
+            Ticket.objects.create(user=user, title=title, description='Jammed, "again"\nsince Monday', status=status_)
+            for user, title, status_ in (
+                (cls.customer, 'Printer', Ticket.Status.OPEN),
+                (cls.customer, 'Scanner', Ticket.Status.CLOSED),
+                (cls.other, 'Fax', Ticket.Status.OPEN),
+            )
+        ]
+        for content in ('Looking into it.', 'Fixed.'):
+            Message.objects.create(ticket=cls.closed, sender=cls.agent, content=content, is_admin_response=True)
+
+    def export(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('ticket-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def records(self, user, **params):
+        lines = self.export(user, **params).splitlines()
+        return {record['id']: record for record in map(json.loads, lines)}
+
+    def test_ndjson(self):
+        records = self.records(self.agent, messages='1')
+        self.assertEqual(set(records), {self.open.pk, self.closed.pk, self.others.pk})
+        self.closed.refresh_from_db()
+        messages = list(self.closed.messages.order_by('created_at', 'id'))
+        self.assertEqual(records[self.closed.pk], {
+            'type': 'ticket',
+            'id': self.closed.pk,
+            'user': 'customer@example.com',
+            'title': 'Scanner',
+            'description': 'Jammed, "again"\nsince Monday',
+            'status': 'closed',
+            'priority': 'medium',
+            'created_at': self.closed.created_at.isoformat(),
+            'updated_at': self.closed.updated_at.isoformat(),
+            'messages': [
+                {
+                    'id': message.pk, 'sender': 'agent@example.com', 'content': message.content,
+                    'is_admin_response': True, 'created_at': message.created_at.isoformat(),
+                }
+                for message in messages
+            ],
+        })
+        self.assertNotIn('messages', self.records(self.agent)[self.closed.pk])
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export(self.agent, output='csv', messages='1'))))
+        self.assertEqual(rows[0], exporter.CSV_COLUMNS + ['messages'])
+        rows = {int(row[0]): dict(zip(rows[0], row)) for row in rows[1:]}
+        self.assertEqual(set(rows), {self.open.pk, self.closed.pk, self.others.pk})
+        self.assertEqual(rows[self.closed.pk]['description'], 'Jammed, "again"\nsince Monday')
+        self.assertEqual(rows[self.closed.pk]['user'], 'customer@example.com')
+        self.assertEqual(
+            [m['content'] for m in json.loads(rows[self.closed.pk]['messages'])], ['Looking into it.', 'Fixed.']
+        )
+        self.assertEqual(json.loads(rows[self.open.pk]['messages']), [])
+
+    def test_filters(self):
+        self.assertEqual(set(self.records(self.agent, status='open')), {self.open.pk, self.others.pk})
+        self.assertEqual(set(self.records(self.agent, search='scanner')), {self.closed.pk})
+        self.client.force_authenticate(self.agent)
+        response = self.client.get(reverse('ticket-export'), {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_scope(self):
+        self.assertEqual(set(self.records(self.customer)), {self.open.pk, self.closed.pk})
+        self.assertEqual(set(self.records(self.other, messages='1')), {self.others.pk})
+
+    def test_chunks(self):
+        # One ticket query, read a chunk at a time, and a query per chunk
+        # for its messages.
+        queryset = Ticket.objects.order_by('id')
+        with self.assertNumQueries(3):
+            blocks = list(exporter.export_tickets(queryset, with_messages=True, chunk_size=2))
+        self.assertEqual([block.count('\n') for block in blocks], [2, 1])
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('export_tickets', '--as-user', 'customer@example.com', '--status', 'closed', stdout=stdout)
+        self.assertEqual([json.loads(line)['id'] for line in stdout.getvalue().splitlines()], [self.closed.pk])
+
+
+class TicketSearchTests(APITestCase):
+    """Full-text search: the result limit and the index following every write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        cls.tickets = Ticket.objects.bulk_create([
+            Ticket(user=cls.staff, title=f'Printer issue {i}', description='Jammed again.')
+            for i in range(5)
+        ])
+        cls.message = Message.objects.create(ticket=cls.tickets[0], sender=cls.staff, content='Toner is low.')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.staff)
+
+    def matches(self, term):
+        return set(search.rank_tickets(Ticket.objects.all(), term, limit=100))
+
+    def test_results_over_the_limit(self):
+        with self.settings(TICKET_SEARCH_MAX_RESULTS=3):
+            response = self.client.get(reverse('ticket-list'), {'search': 'printer'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response['Search-Limit'], '3')
+        with self.settings(TICKET_SEARCH_MAX_RESULTS=5):
+            response = self.client.get(reverse('ticket-list'), {'search': 'printer'})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertNotIn('Search-Limit', response)
+
+    def test_admin_search(self):
+        request = RequestFactory().get('/')
+        tickets, _ = TicketAdmin(Ticket, site).get_search_results(request, Ticket.objects.all(), 'staff@')
+        self.assertEqual(set(tickets), set(self.tickets))
+        messages, _ = MessageAdmin(Message, site).get_search_results(request, Message.objects.all(), 'issue 0')
+        self.assertEqual(list(messages), [self.message])
+        messages, _ = MessageAdmin(Message, site).get_search_results(request, Message.objects.all(), 'sta')
+        self.assertEqual(list(messages), [self.message])
+
+    def test_index_follows_updates(self):
+        first, second = self.tickets[:2]
+        first.title = 'Scanner issue'
+        first.save()
+        Ticket.objects.filter(pk=second.pk).update(description='Paper feed is stuck.')
+        Message.objects.filter(pk=self.message.pk).update(content='Drum is worn.')
+        self.assertEqual(self.matches('scanner'), {first.pk})
+        self.assertNotIn(first.pk, self.matches('printer'))
+        self.assertEqual(self.matches('stuck'), {second.pk})
+        self.assertNotIn(second.pk, self.matches('jammed'))
+        self.assertEqual(self.matches('drum'), {first.pk})
+        self.assertEqual(self.matches('toner'), set())
+
+    def test_index_follows_deletes(self):
+        self.message.delete()
+        self.assertEqual(self.matches('toner'), set())
+        Ticket.objects.filter(pk=self.tickets[1].pk).delete()
+        self.assertEqual(self.matches('printer'), {t.pk for t in self.tickets} - {self.tickets[1].pk})
+
+
+class TicketArchiveTests(APITestCase):
+    """Closed tickets move to the archive tables and stay readable"""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=password,
+        )
+        cls.other = CustomUser.objects.create(
+            email='other@example.com', username='other', password=password,
+        )
+        cls.closed, cls.recent, cls.open = Ticket.objects.bulk_create([
+            Ticket(user=cls.customer, title=f'Printer {i}', description='Jammed', status=status_)
+            for i, status_ in enumerate((Ticket.Status.CLOSED, Ticket.Status.CLOSED, Ticket.Status.OPEN))
+        ])
+        for content in ('Looking into it.', 'Fixed, closing.'):
+            Message.objects.create(ticket=cls.closed, sender=cls.agent, content=content, is_admin_response=True)
+        long_ago = timezone.now() - timedelta(days=400)
+        Message.objects.update(created_at=F('created_at') - timedelta(days=400))
+        Ticket.objects.filter(pk=cls.closed.pk).update(
+            closed_at=long_ago,
+            last_message_at=F('last_message_at') - timedelta(days=400),
+            last_staff_response_at=F('last_staff_response_at') - timedelta(days=400),
+        )
+        # ``recent`` has no closing time (as some imports): its last update counts.
+        Ticket.objects.exclude(pk=cls.recent.pk).update(updated_at=long_ago)
+        cls.closed.refresh_from_db()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_archive(self):
+        expected = self.client_data(self.closed)
+        self.assertEqual(list(archive_closed_tickets(batch_size=1)), [(1, 2)])
+        self.assertFalse(Ticket.objects.filter(pk=self.closed.pk).exists())
+        self.assertEqual(set(Ticket.objects.values_list('pk', flat=True)), {self.recent.pk, self.open.pk})
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(ArchivedMessage.objects.filter(ticket_id=self.closed.pk).count(), 2)
+
+        # Served read-only under the same id, as it was.
+        self.assertEqual(self.client_data(self.closed), expected)
+        url = reverse('ticket-detail', args=[self.closed.pk])
+        self.assertEqual(self.client.patch(url, {'title': 'Reopened'}).status_code, status.HTTP_403_FORBIDDEN)
+        url = reverse('conversations:message-list', args=[self.closed.pk])
+        response = self.client.get(url)
+        self.assertEqual([m['content'] for m in response.data['results']], ['Fixed, closing.', 'Looking into it.'])
+        self.assertEqual(self.client.post(url, {'content': 'Hello?'}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        url = reverse('ticket-detail', args=[self.closed.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reply_after_closing(self):
+        # Closed long ago, but a reply came in since: messages don't bump
+        # updated_at, closed_at or the status.
+        replied = Ticket.objects.create(user=self.customer, title='Scanner', description='Offline')
+        Ticket.objects.filter(pk=replied.pk).update(
+            status=Ticket.Status.CLOSED,
+            closed_at=self.closed.closed_at,
+            updated_at=self.closed.updated_at,
+        )
+        Message.objects.create(ticket=replied, sender=self.customer, content='It is broken again.')
+        self.assertEqual(list(archive_closed_tickets()), [(1, 2)])
+        self.assertTrue(Ticket.objects.filter(pk=replied.pk).exists())
+        self.assertFalse(ArchivedTicket.objects.filter(pk=replied.pk).exists())
+
+    def test_archived_detail_async(self):
+        list(archive_closed_tickets())
+        request = AsyncRequestFactory().get(
+            f'/api/v1/tickets/{self.closed.pk}/',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(self.customer)}'},
+        )
+        response = async_to_sync(TicketDetailAsyncView.as_view())(request, pk=self.closed.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Ticket.Status.CLOSED)
+        self.assertTrue(ArchivedTicket.objects.filter(pk=self.closed.pk).exists())
+
+    def client_data(self, ticket):
+        self.client.force_authenticate(self.customer)
+        cache.clear()
+        response = self.client.get(reverse('ticket-detail', args=[ticket.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+
+class TicketImportTests(APITestCase):
+    """NDJSON import: records with their history, rejected lines, and the statistics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password(None)
+        cls.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', password=password,
+            is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password, role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(email='customer@example.com', username='customer', password=password)
+        cls.other = CustomUser.objects.create(email='other@example.com', username='other', password=password)
+        cls.existing = Ticket.objects.create(user=cls.customer, title='Printer', description='Jammed')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.staff)
+
+    def post(self, *records):
+        body = '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+        response = self.client.generic(
+            'POST', reverse('ticket-import-records'), body, content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [json.loads(line) for line in response.getvalue().splitlines()]
+
+    def ticket(self, **fields):
+        return {'type': 'ticket', 'user': 'customer@example.com', 'title': 'VPN down', 'description': 'Again', **fields}
+
+    def test_import(self):
+        report = self.post(
+            self.ticket(
+                status='closed', priority='high',
+                created_at='2026-01-05T10:00:00Z', closed_at='2026-01-07T10:00:00Z',
+                messages=[
+                    {'sender': 'agent@example.com', 'content': 'Looking.', 'created_at': '2026-01-05T11:00:00Z'},
+                    {'sender': 'customer@example.com', 'content': 'Thanks.', 'created_at': '2026-01-06T09:00:00Z'},
+                ],
+            ),
+            {'type': 'message', 'ticket': self.existing.pk, 'sender': 'customer@example.com', 'content': 'News?'},
+        )
+        self.assertEqual(report, [
+            {'batch': {'lines': [1, 2], 'tickets': 1, 'messages': 3}},
+            {'summary': {'tickets': 1, 'messages': 3, 'errors': 0}},
+        ])
+
+        # The history is restored, and what the write paths maintain is set.
+        ticket = Ticket.objects.get(title='VPN down')
+        at = datetime.fromisoformat
+        self.assertEqual(
+            (ticket.status, ticket.created_at, ticket.updated_at, ticket.closed_at, ticket.first_response_at),
+            ('closed', at('2026-01-05T10:00:00Z'), at('2026-01-07T10:00:00Z'), at('2026-01-07T10:00:00Z'),
+             at('2026-01-05T11:00:00Z')),
+        )
+        self.assertEqual(
+            list(ticket.messages.order_by('created_at').values_list('sender__email', 'created_at', 'is_admin_response')),
+            [('agent@example.com', at('2026-01-05T11:00:00Z'), True),
+             ('customer@example.com', at('2026-01-06T09:00:00Z'), False)],
+        )
+        self.assertEqual(
+            (ticket.message_count, ticket.last_message_at, ticket.last_staff_response_at),
+            (2, at('2026-01-06T09:00:00Z'), at('2026-01-05T11:00:00Z')),
+        )
+        self.assertEqual(Ticket.objects.get(pk=self.existing.pk).message_count, 1)
+
+        report = stats.report(date(2026, 1, 1), date(2026, 1, 31))
+        days = {day['day']: day for day in report['days']}
+        self.assertEqual(days[date(2026, 1, 5)]['by_priority']['high']['created'], 1)
+        self.assertEqual(days[date(2026, 1, 5)]['avg_first_response_seconds'], 3600)
+        self.assertEqual(days[date(2026, 1, 7)]['closed'], 1)
+        self.assertEqual(days[date(2026, 1, 7)]['avg_resolution_seconds'], 2 * 24 * 3600)
+        self.assertEqual(report['agents'][0]['email'], 'agent@example.com')
+        rollups = rollup_tables()
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), rollups)
+
+    def test_closed_without_a_closing_time(self):
+        self.post(self.ticket(status='closed', created_at='2026-01-05T10:00:00Z'))
+        ticket = Ticket.objects.get(title='VPN down')
+        self.assertIsNone(ticket.closed_at)
+        self.assertEqual(ticket.updated_at, ticket.created_at)
+        # Closed, but no resolution time is made up for it.
+        report = stats.report(date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(report['statuses']['closed']['total'], 1)
+        self.assertEqual((report['totals']['created'], report['totals']['closed']), (1, 0))
+        rollups = rollup_tables()
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), rollups)
+
+    def test_rejected_lines(self):
+        report = self.post(
+            '{',
+            {'type': 'comment'},
+            self.ticket(user='nobody@example.com'),
+            self.ticket(status='open', created_at='2026-01-05T10:00:00Z', closed_at='2026-01-06T10:00:00Z'),
+            self.ticket(status='closed', created_at='2026-01-05T10:00:00Z', closed_at='2026-01-04T10:00:00Z'),
+            self.ticket(created_at='yesterday'),
+            {'type': 'message', 'ticket': 10 ** 9, 'sender': 'agent@example.com', 'content': 'Hi'},
+            {'type': 'message', 'ticket': self.existing.pk, 'sender': 'other@example.com', 'content': 'Hi'},
+            self.ticket(messages=[{'sender': 'other@example.com', 'content': 'Me too'}]),
+            self.ticket(title='Accepted'),
+            self.ticket(title='Accepted'),
+        )
+        errors, batch, summary = report[:-2], report[-2], report[-1]
+        self.assertEqual([error['line'] for error in errors], list(range(1, 10)))
+        self.assertEqual(errors[3]['error'], {'closed_at': 'Only closed tickets have a closing time.'})
+        self.assertEqual(errors[4]['error'], {'closed_at': 'Must not be before created_at.'})
+        self.assertEqual(errors[6]['error'], {'ticket': 'Ticket not found.'})
+        self.assertEqual(errors[7]['error'], {'sender': 'Sender has no access to this ticket.'})
+        self.assertEqual(list(errors[8]['error']), ['messages[0]'])
+        # The valid lines of the batch are imported regardless; repeated
+        # lines are separate tickets, as they would be through the API.
+        self.assertEqual(batch['batch'], {'lines': [1, 11], 'tickets': 2, 'messages': 0})
+        self.assertEqual(summary['summary'], {'tickets': 2, 'messages': 0, 'errors': 9})
+        self.assertEqual(Ticket.objects.filter(title='Accepted').count(), 2)
+
+    def test_rows_the_database_refuses(self):
+        bulk_create = TicketQuerySet.bulk_create
+
+        def refuse(queryset, objs, *args, **kwargs):
+            if any(ticket.title == 'Refused' for ticket in objs):
+                raise IntegrityError('refused')
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        thread = [{'sender': 'agent@example.com', 'content': 'On it.', 'created_at': '2026-01-05T11:00:00Z'}]
+        with mock.patch.object(TicketQuerySet, 'bulk_create', refuse):
+            report = self.post(
+                self.ticket(title='First', created_at='2026-01-05T10:00:00Z', messages=thread),
+                self.ticket(title='Refused', messages=thread),
+                {'type': 'message', 'ticket': self.existing.pk, 'sender': 'agent@example.com', 'content': 'Hi'},
+            )
+        # Only the line at fault is lost, and it's reported.
+        self.assertEqual(report[0], {'line': 2, 'error': 'Not written: refused'})
+        self.assertEqual(report[1]['batch'], {'lines': [1, 3], 'tickets': 1, 'messages': 2})
+        first = Ticket.objects.get(title='First')
+        self.assertEqual((first.message_count, first.first_response_at), (1, datetime.fromisoformat('2026-01-05T11:00:00Z')))
+        self.assertFalse(Ticket.objects.filter(title='Refused').exists())
+        rollups = rollup_tables()
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), rollups)
+
+
+def rollup_tables():
+    """The statistics rollups' non-zero rows, by table"""
+    return {
+        model.__name__: sorted(
+            row for row in model.objects.values_list(*model.ROLLUP_KEY, *fields)
+            if any(row[len(model.ROLLUP_KEY):])
+        )
+        for model, fields in (
+            (DailyTicketStats, stats.DAILY_FIELDS),
+            (AgentDailyStats, ('first_responses', 'first_response_seconds')),
+            (TicketStatusCount, ('count',)),
+        )
+    }
+
+
+class TicketStatsTests(APITestCase):
+    """The statistics rollups follow every write path, and match a rebuild"""
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Sup3r-secret!')
+        cls.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', password=password,
+            is_staff=True, role=CustomUser.UserRole.ADMIN,
+        )
+        cls.agent = CustomUser.objects.create(
+            email='agent@example.com', username='agent', password=password,
+            role=CustomUser.UserRole.AGENT,
+        )
+        cls.customer = CustomUser.objects.create(
+            email='customer@example.com', username='customer', password=password,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_incremental_matches_rebuild(self):
+        self.client.force_authenticate(self.customer)
+        ids = [
+            self.client.post(reverse('ticket-list'), {
+                'title': f'Printer {i}', 'description': 'Jammed', 'priority': priority,
+            }).data['id']
+            for i, priority in enumerate(('high', 'high', 'low', 'medium'))
+        ]
+        self.client.force_authenticate(self.agent)
+        for pk in ids[:3]:
+            url = reverse('conversations:message-list', args=[pk])
+            self.client.post(url, {'content': 'On it.'})
+            self.client.post(url, {'content': 'Still on it.'})
+        self.client.patch(reverse('ticket-detail', args=[ids[0]]), {'status': 'closed'})
+        self.client.patch(reverse('ticket-detail', args=[ids[1]]), {'priority': 'low'})
+        self.client.post(reverse('ticket-bulk-update'), {
+            'ids': ids[1:3], 'patch': {'status': 'closed'},
+        }, format='json')
+        self.client.patch(reverse('ticket-detail', args=[ids[2]]), {'status': 'open'})
+        self.client.force_authenticate(self.staff)
+        lines = [
+            {'type': 'ticket', 'user': 'customer@example.com', 'title': 'Old', 'description': 'Fixed',
+             'status': 'closed', 'created_at': '2026-01-05T10:00:00Z', 'closed_at': '2026-01-06T10:00:00Z',
+             'messages': [{'sender': 'agent@example.com', 'content': 'Fixed.', 'created_at': '2026-01-05T12:00:00Z'}]},
+            {'type': 'message', 'ticket': ids[3], 'sender': 'staff@example.com', 'content': 'Seen.'},
+        ]
+        self.client.generic(
+            'POST', reverse('ticket-import-records'), '\n'.join(json.dumps(line) for line in lines),
+            content_type='application/x-ndjson',
+        ).getvalue()
+        Ticket.objects.get(pk=ids[3]).delete()
+
+        report = self.report(start='2026-01-01', end=str(timezone.localdate()))
+        self.assertEqual(report['statuses']['closed']['total'], 3)
+        self.assertEqual(report['statuses']['closed']['by_priority'], {'low': 1, 'medium': 1, 'high': 1})
+        self.assertEqual(report['statuses']['open']['by_priority'], {'low': 1, 'medium': 0, 'high': 0})
+        self.assertEqual(report['totals']['created'], 4)
+        self.assertEqual(report['totals']['closed'], 3)
+        self.assertEqual(report['totals']['first_responses'], 4)
+        imported = next(day for day in report['days'] if day['day'] == date(2026, 1, 5))
+        self.assertEqual(imported['by_priority']['medium']['avg_first_response_seconds'], 2 * 3600)
+        closed = next(day for day in report['days'] if day['day'] == date(2026, 1, 6))
+        self.assertEqual(closed['avg_resolution_seconds'], 24 * 3600)
+        self.assertEqual(
+            [(agent['email'], agent['first_responses']) for agent in report['agents']],
+            [('agent@example.com', 4)],
+        )
+
+        # Recomputing from the tickets finds the same numbers, and archiving
+        # changes none of them.
+        incremental = rollup_tables()
+        stats.rebuild(batch_size=2)
+        self.assertEqual(rollup_tables(), incremental)
+        list(archive_closed_tickets(before=timezone.now() + timedelta(days=1)))
+        self.assertEqual(rollup_tables(), incremental)
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), incremental)
+
+    def test_bulk_deletes(self):
+        other = CustomUser.objects.create(email='other@example.com', username='other')
+        tickets = [
+            Ticket.objects.create(user=user, title='Printer', description='Jammed', priority=priority)
+            for user, priority in ((self.customer, 'high'), (self.customer, 'low'), (other, 'low'), (other, 'medium'))
+        ]
+        for ticket in tickets[::2]:
+            Message.objects.create(ticket=ticket, sender=self.agent, content='On it.', is_admin_response=True)
+            ticket.refresh_from_db()
+            ticket.status = Ticket.Status.CLOSED
+            ticket.save()
+        # A queryset delete, and a user's tickets going with them.
+        Ticket.objects.filter(pk__in=[tickets[0].pk, tickets[1].pk]).delete()
+        other.delete()
+
+        self.assertEqual(Ticket.objects.count(), 0)
+        self.assertEqual(rollup_tables(), {'DailyTicketStats': [], 'AgentDailyStats': [], 'TicketStatusCount': []})
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), {'DailyTicketStats': [], 'AgentDailyStats': [], 'TicketStatusCount': []})
+
+    def test_rebuild_backfills_history(self):
+        ticket = Ticket.objects.create(user=self.customer, title='Printer', description='Jammed')
+        Message.objects.create(ticket=ticket, sender=self.agent, content='On it.', is_admin_response=True)
+        answered_at = Ticket.objects.get(pk=ticket.pk).first_response_at
+        Ticket.objects.filter(pk=ticket.pk).update(status=Ticket.Status.CLOSED, first_response_at=None)
+        stats.rebuild()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.first_response_at, answered_at)
+        # When it was closed isn't known, and isn't made up.
+        self.assertIsNone(ticket.closed_at)
+        report = self.report()
+        self.assertEqual(report['statuses']['closed']['total'], 1)
+        self.assertEqual(report['totals']['closed'], 0)
+        self.assertEqual(report['totals']['first_responses'], 1)
+
+    def test_report(self):
+        self.client.force_authenticate(self.agent)
+        # The status counts, the days and the agents: one query each.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('ticket-stats'), {'start': '2026-01-01', 'end': '2026-12-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['days']), 365)
+        self.assertEqual(len(self.client.get(reverse('ticket-stats')).data['days']), 30)
+        for params in ({'start': '2026-02-01', 'end': '2026-01-01'}, {'start': '2025-01-01', 'end': '2026-12-31'}):
+            self.assertEqual(self.client.get(reverse('ticket-stats'), params).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(reverse('ticket-stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def report(self, **params):
+        self.client.force_authenticate(self.agent)
+        response = self.client.get(reverse('ticket-stats'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+
+class SeedDataTests(TestCase):
+    """manage.py seed_data's generator: deterministic, and consistent with the write paths"""
+    SIZES = {'customers': 5, 'agents': 2, 'admins': 1, 'tickets': 40, 'messages': 300, 'days': 60}
+    UNTIL = timezone.now().replace(microsecond=0)
+
+    def seed(self, seed=7):
+        return list(Seeder(**self.SIZES, seed=seed, until=self.UNTIL, batch_size=16).run())
+
+    def snapshot(self):
+        tickets = Ticket.objects.order_by('created_at', 'pk').values_list(
+            'user__email', 'title', 'status', 'priority', 'created_at', 'closed_at', 'first_response_at',
+        )
+        messages = Message.objects.order_by('created_at', 'pk').values_list(
+            'ticket__title', 'ticket__created_at', 'sender__email', 'content', 'created_at',
+        )
+        return list(tickets), list(messages)
+
+    def test_timestamps_between_batches(self):
+        # Whatever the caller does between batches stamps times as usual.
+        run = Seeder(**self.SIZES, until=self.UNTIL, batch_size=16).run()
+        next(run)
+        self.assertIn('tickets', next(run))
+        ticket = Ticket.objects.create(user=CustomUser.objects.first(), title='Printer', description='Jammed')
+        self.assertGreater(ticket.created_at, self.UNTIL)
+        self.assertGreater(ticket.updated_at, self.UNTIL)
+        run.close()
+
+    def test_seed(self):
+        results = self.seed()
+        self.assertEqual(results[0], {'users': 8})
+        self.assertEqual(sum(result.get('messages', 0) for result in results), 300)
+        self.assertEqual(Ticket.objects.count(), 40)
+        self.assertEqual(Message.objects.count(), 300)
+        self.assertTrue(Ticket.objects.filter(created_at__lt=self.UNTIL - timedelta(days=30)).exists())
+        self.assertFalse(Message.objects.filter(created_at__gt=self.UNTIL).exists())
+
+        # The fields the write paths maintain are what they would have set.
+        derived = ('message_count', 'last_message_at', 'last_staff_response_at')
+        seeded = list(Ticket.objects.order_by('pk').values_list(*derived))
+        Ticket.objects.refresh_conversation_counters()
+        self.assertEqual(list(Ticket.objects.order_by('pk').values_list(*derived)), seeded)
+        closed = Ticket.objects.filter(status=Ticket.Status.CLOSED)
+        self.assertFalse(closed.filter(closed_at__isnull=True).exists())
+        self.assertFalse(Ticket.objects.exclude(status=Ticket.Status.CLOSED).filter(closed_at__isnull=False).exists())
+        rollups = rollup_tables()
+        stats.rebuild()
+        self.assertEqual(rollup_tables(), rollups)
+
+        # The same seed gives the same rows; another seed, others.
+        snapshot = self.snapshot()
+        for model in (Ticket, CustomUser):
+            model.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), snapshot)
+        for model in (Ticket, CustomUser):
+            model.objects.all().delete()
+        self.seed(seed=8)
+        self.assertNotEqual(self.snapshot(), snapshot)
+
+    def test_command_until(self):
+        call_command(
+            'seed_data', '--until=2026-01-01', customers=2, agents=1, admins=0, tickets=5, messages=10, days=10,
+            stdout=io.StringIO(),
+        )
+        self.assertFalse(Ticket.objects.filter(created_at__gte=datetime(2026, 1, 1, tzinfo=UTC)).exists())
+        self.assertTrue(Ticket.objects.filter(created_at__gte=datetime(2025, 12, 1, tzinfo=UTC)).exists())
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    """manage.py benchmark_api --compare: what counts as a regression"""
+
+    def report(self, p50=10.0, queries=3, memory=500.0, throughput=50.0):
+        operation = {'p50_ms': p50, 'p95_ms': p50 * 2, 'queries': queries, 'peak_memory_kib': memory}
+        return {'mixes': {'agent': {'throughput': throughput}}, 'operations': {'ticket-list': operation}}
+
+    def regressions(self, report, **thresholds):
+        return [metric for metric, *_ in benchmarks.compare(self.report(), report, thresholds)[1]]
+
+    def test_compare(self):
+        rows, regressions = benchmarks.compare(self.report(), self.report(p50=11.0))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(regressions, [])
+        self.assertEqual(self.regressions(self.report(p50=5.0, memory=100.0, throughput=100.0)), [])
+        self.assertEqual(
+            self.regressions(self.report(p50=13.0)), ['ticket-list p50_ms', 'ticket-list p95_ms'],
+        )
+        self.assertEqual(self.regressions(self.report(p50=13.0), latency=50), [])
+        self.assertEqual(self.regressions(self.report(throughput=30.0)), ['agent throughput'])
+        self.assertEqual(self.regressions(self.report(queries=4)), ['ticket-list queries'])
+        self.assertEqual(self.regressions(self.report(queries=4), queries=1), [])
+        self.assertEqual(self.regressions(self.report(memory=700.0)), ['ticket-list peak_memory_kib'])
+        # Operations missing from either report aren't compared.
+        self.assertEqual(benchmarks.compare(self.report(), {'mixes': {}, 'operations': {}}), ([], []))
+
+
+class BenchmarkRunTests(TestCase):
+    """manage.py benchmark_api's runner, against a tiny seeded database"""
+
+    def test_run(self):
+        for _ in Seeder(customers=3, agents=1, admins=1, tickets=6, messages=12, days=10, seed=3).run():
+            pass
+        runner = benchmarks.Runner(benchmarks.fixtures(), seed=3)
+        # Tokens as a login issues them, with the claims authentication trusts.
+        self.assertIn('role', AccessToken(runner.agent['Authorization'].split()[1]))
+        results = runner.run(requests=20, warmup=1, profile_requests=1)
+        self.assertEqual(set(results['mixes']), set(benchmarks.MIXES))
+        self.assertLessEqual(set(results['operations']), set(benchmarks.OPERATIONS))
+        for result in results['operations'].values():
+            self.assertGreater(result['count'], 0)
+            self.assertGreaterEqual(result['p99_ms'], result['p50_ms'])
@@ -1,11 +1,33 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TicketViewSet
+from ticketing_system.async_views import hot_path
+from .views import TicketViewSet, TicketListAsyncView, TicketDetailAsyncView
+from . import streams
 
 router = DefaultRouter()
 router.register(r'', TicketViewSet, basename='ticket')
 
 # Centralized version prefix handled in project urls.py
 urlpatterns = [
+    # Server-Sent Events (ASGI only)
+    path('queue/events/', streams.queue_events, name='ticket-queue-events'),
+    path('<int:ticket_pk>/events/', streams.ticket_events, name='ticket-events'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    # Async list/retrieve in front of the router; other methods fall through
+    # to the viewset.
+    urlpatterns = [
+        path('', hot_path(
+            TicketListAsyncView.as_view(),
+            TicketViewSet.as_view({'get': 'list', 'post': 'create'}),
+        ), name='ticket-list'),
+        path('<int:pk>/', hot_path(
+            TicketDetailAsyncView.as_view(),
+            TicketViewSet.as_view({
+                'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+            }),
+        ), name='ticket-detail'),
+    ] + urlpatterns
@@ -1,39 +1,436 @@
-from rest_framework import viewsets, filters
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import get_language, gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Ticket
-from .serializers import TicketSerializer
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from .models import ArchivedTicket, Ticket
+from .serializers import TicketSerializer, TicketBulkUpdateSerializer, TicketStatsQuerySerializer
+from .importer import NDJSONImporter
+from .exporter import FORMATS as EXPORT_FORMATS, export_tickets
 from .permissions import TicketPermission
+from . import cache, events, stats
+from .filters import FullTextSearchFilter, RelevanceOrderingFilter
+from .pagination import WorkQueuePagination
+from ticketing_system import conditional
+from ticketing_system.async_views import AsyncGenericAPIView
+from ticketing_system.pagination import KeysetPagination
+from ticketing_system.routers import primary_reads
 
-class TicketViewSet(viewsets.ModelViewSet):
-    """
-    API endpoint for managing tickets
-    
-    - Users can create and manage their own tickets
-    - Staff/Agents can manage all tickets
-    - Filtering available on status/priority
-    - Search by title/description
-    - Ordering by creation/update date and priority
-    """
-    queryset = Ticket.objects.all()
+class TicketViewMixin:
+    """Configuration shared by TicketViewSet and the async ticket views"""
+    queryset = Ticket.objects.select_related('user')
     serializer_class = TicketSerializer
     permission_classes = [TicketPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RelevanceOrderingFilter]
     filterset_fields = ['status', 'priority']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'priority']
+    ordering_aliases = {'priority': 'priority_rank'}
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    # Everything TicketSerializer reads that can change. Edits through
+    # save() and bulk updates bump updated_at; the conversation counters
+    # and the nested user don't, so they are listed too.
+    etag_fields = (
+        'pk', 'updated_at', 'message_count', 'last_message_at', 'last_staff_response_at',
+        'user_id', 'user__email', 'user__first_name', 'user__last_name', 'user__is_staff', 'user__role',
+    )
 
     def get_queryset(self):
         """Return queryset filtered by user permissions"""
+        # Admins/Agents see all tickets, regular users only their own
+        return self.queryset.accessible_to(self.request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Set by FullTextSearchFilter when a search matched more tickets
+        # than it returns.
+        search_limit = getattr(self, 'search_limit', None)
+        if search_limit is not None:
+            response['Search-Limit'] = str(search_limit)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_archived_queryset(self):
+        """The requested ticket's copy in the archive (tickets.archive), if the caller may see it"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return ArchivedTicket.objects.select_related('user').accessible_to(self.request.user).filter(
+            pk=self.kwargs[lookup_url_kwarg]
+        )
+
+    def get_archived_object(self, archived):
+        """
+        ``archived`` as a read-only Ticket, for a ticket not found among the
+        live ones: Http404 if it isn't archived either, PermissionDenied for
+        anything but a read.
+        """
+        if archived is None:
+            raise Http404
+        if self.action != 'retrieve':
+            raise PermissionDenied(_('Archived tickets are read-only.'))
+        ticket = archived.as_ticket()
+        self.check_object_permissions(self.request, ticket)
+        return ticket
+
+    def get_validator_queryset(self, queryset):
+        """
+        ``etag_fields`` of the requested list page, or of the requested
+        ticket: the same index scan as the full read, without the payload.
+        Scoped by get_queryset(), which applies the same rule as the
+        object permission.
+        """
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})[:1]
+        else:
+            queryset = self.paginator.get_page_queryset(queryset, self.request, self)
+        return queryset.values_list(*self.etag_fields)
+
+    def get_cache_key(self):
+        """Key of the requested ticket in tickets.cache, or None if this read can't use the cache"""
+        # Detail reads honour the list filters too; only plain reads are cached.
+        if self.request.query_params:
+            return None
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def get_cached_ticket(self, entry):
+        """A tickets.cache entry, if it was rendered in this language and the caller may see it"""
+        if entry is None or entry['language'] != get_language():
+            return None
+        # Same rule as TicketQuerySet.accessible_to; anything else takes the
+        # database path (and its 404).
         user = self.request.user
-        
-        # Admins/Agents see all tickets
-        if user.is_staff or user.is_agent:
-            return self.queryset.all()
-            
-        # Regular users see only their tickets
-        return self.queryset.filter(user=user)
+        owner_id = entry['row'][self.etag_fields.index('user_id')]
+        if not user.is_authenticated or not (user.is_staff or user.is_agent or owner_id == user.pk):
+            return None
+        return entry
+
+    def make_cache_entry(self, instance):
+        return {
+            'language': get_language(),
+            'row': conditional.field_values(instance, self.etag_fields),
+            'data': self.get_serializer(instance).data,
+        }
+
+    def get_ticket_response(self, entry):
+        validators = self.get_validators([entry['row']])
+        response = conditional.not_modified(self.request, *validators)
+        if response is None:
+            response = conditional.set_validators(Response(entry['data']), *validators)
+        return response
+
+    def get_validators(self, rows):
+        """
+        ``(ETag, Last-Modified)`` of a list page, or of a single ticket, given
+        as ``etag_fields`` rows or as Ticket instances
+        """
+        rows = [
+            conditional.field_values(row, self.etag_fields) if isinstance(row, Ticket) else row
+            for row in rows
+        ]
+        # The later of updated_at and last_message_at.
+        modified = [max(filter(None, (row[1], row[3]))) for row in rows]
+        if self.action == 'retrieve':
+            parts = rows
+        else:
+            parts = (rows, self.paginator.has_next, self.paginator.has_previous)
+        return conditional.make_etag(self.request, parts), max(modified, default=None)
+
+
+class TicketViewSet(TicketViewMixin, viewsets.ModelViewSet):
+    """
+    API endpoint for managing tickets
+    
+    - Users can create and manage their own tickets
+    - Staff/Agents can manage all tickets
+    - Filtering available on status/priority
+    - Full-text search over title/description and messages, ranked by relevance
+    - Ordering by creation/update date and priority (by urgency, not name)
+    - Keyset (cursor) pagination on the chosen ordering plus id
+    - Bulk status/priority updates for triage
+    - Streaming NDJSON import (staff only) and CSV/NDJSON export
+    - Agent work queue: open/pending tickets by priority, then age
+    - Statistics (Admins/Agents): status counts, daily volumes and response times
+    """
+    bulk_update_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        """A page of tickets; 304 Not Modified if the client's copy is current"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if conditional.is_conditional(request):
+            rows = self.paginator.set_page(list(self.get_validator_queryset(queryset)))
+            response = conditional.not_modified(request, *self.get_validators(rows))
+            if response is not None:
+                return response
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        return conditional.set_validators(response, *self.get_validators(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        """One ticket, from the shared cache when possible; 304 if the client's copy is current"""
+        key = self.get_cache_key()
+        entry = self.get_cached_ticket(cache.tickets.get(key)) if key is not None else None
+        if entry is None:
+            if conditional.is_conditional(request):
+                rows = list(self.get_validator_queryset(self.filter_queryset(self.get_queryset())))
+                response = conditional.not_modified(request, *self.get_validators(rows)) if rows else None
+                if response is not None:
+                    return response
+
+            # Cached for everyone: read it from the primary (see ticketing_system.routers).
+            with primary_reads():
+                entry = self.make_cache_entry(self.get_object())
+            if key is not None:
+                cache.tickets.set(key, entry)
+        return self.get_ticket_response(entry)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            try:
+                archived = self.get_archived_queryset().first()
+            except (TypeError, ValueError, ValidationError):
+                raise Http404
+            return self.get_archived_object(archived)
 
     def perform_create(self, serializer):
         """Automatically associate ticket with current user"""
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Apply one status/priority patch to many tickets, selected by id "
+            "list or by status/priority filter, in a single transaction"
+        ),
+        request_body=TicketBulkUpdateSerializer
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Set-based bulk update: ids are resolved against the caller's
+        accessible tickets and updated with chunked UPDATE statements in one
+        transaction. Returns a result per requested (or matched) id.
+        """
+        serializer = TicketBulkUpdateSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        patch = dict(serializer.validated_data['patch'], updated_at=timezone.now())
+        queryset = self.get_queryset()
+
+        with transaction.atomic():
+            if 'ids' in serializer.validated_data:
+                requested = list(dict.fromkeys(serializer.validated_data['ids']))
+            else:
+                queryset = self._filter_for_bulk_update(queryset, serializer.validated_data['filter'])
+                requested = None
+
+            updated = set()
+            for chunk in self._bulk_update_chunks(queryset, requested):
+                updated.update(chunk)
+                stats.update_tickets(chunk, patch)
+                cache.invalidate(chunk)
+                events.tickets_updated(chunk, patch)
+
+        ids = requested if requested is not None else sorted(updated)
+        return Response({
+            'updated': len(updated),
+            'results': [
+                {'id': pk, 'result': 'updated' if pk in updated else 'not_found'}
+                for pk in ids
+            ],
+        })
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Staff only. Stream NDJSON ticket/message records in the request body; "
+            "the response streams NDJSON results (per-line errors, per-batch counts, summary)"
+        ),
+        request_body=no_body
+    )
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_records(self, request):
+        """
+        Read the request body line by line (it is never buffered whole) and
+        stream back the importer's report as each batch is committed.
+        """
+        importer = NDJSONImporter(request.user)
+        report = (json.dumps(result, default=str) + '\n' for result in importer.run(request.stream or []))
+        return StreamingHttpResponse(report, content_type='application/x-ndjson')
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Stream the tickets visible to the caller as CSV or NDJSON, honouring "
+            "the list filters; `messages=true` inlines each ticket's thread"
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'output',
+                openapi.IN_QUERY,
+                description="Export format",
+                type=openapi.TYPE_STRING,
+                enum=[*EXPORT_FORMATS],
+                required=False
+            ),
+            openapi.Parameter(
+                'messages',
+                openapi.IN_QUERY,
+                description="Include each ticket's messages",
+                type=openapi.TYPE_BOOLEAN,
+                required=False
+            )
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered, permission-scoped tickets without buffering them"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise serializers.ValidationError({'output': f'Expected one of: {", ".join(EXPORT_FORMATS)}.'})
+        with_messages = request.query_params.get('messages', '').lower() in ('1', 'true', 'yes')
+
+        content_type = 'text/csv' if output == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            export_tickets(self.filter_queryset(self.get_queryset()), output, with_messages),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="tickets.{output}"'
+        return response
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Admins/Agents only. Open and pending tickets, highest priority "
+            "first and oldest first within a priority; filterable by status/priority"
+        )
+    )
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        """Cursor-paginated work queue, read in index order"""
+        paginator = WorkQueuePagination()
+        page = paginator.paginate_queryset(self._work_queue(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Admins/Agents only. The next ticket to work on, or 204 No Content "
+            "when the queue is empty"
+        )
+    )
+    @action(detail=False, methods=['get'], url_path='queue/next')
+    def queue_next(self, request):
+        """Head of the work queue: a single LIMIT 1 probe of the queue index"""
+        ticket = self._work_queue().first()
+        if ticket is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(self.get_serializer(ticket).data)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Admins/Agents only. Ticket statistics for a range of days (default: "
+            "the last 30, at most 366): tickets per status now, and per day the "
+            "tickets created and closed, first responses and average "
+            "resolution/first-response times, by priority; first responses per agent"
+        ),
+        query_serializer=TicketStatsQuerySerializer
+    )
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Read from the rollup tables (tickets.stats): a row per status, day and agent"""
+        serializer = TicketStatsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(stats.report(**serializer.validated_data))
+
+    def _work_queue(self):
+        queryset = DjangoFilterBackend().filter_queryset(self.request, self.get_queryset(), self)
+        return queryset.work_queue()
+
+    def _filter_for_bulk_update(self, queryset, filter_data):
+        """Apply the same status/priority filterset the list endpoint uses"""
+        filterset_class = DjangoFilterBackend().get_filterset_class(self, queryset)
+        unknown = set(filter_data) - set(filterset_class.base_filters)
+        filterset = filterset_class(data=filter_data, queryset=queryset, request=self.request)
+        if unknown or not filterset.is_valid():
+            errors = dict(filterset.errors)
+            errors.update({name: ['Unknown filter.'] for name in unknown})
+            raise serializers.ValidationError({'filter': errors})
+        return filterset.qs
+
+    def _bulk_update_chunks(self, queryset, requested):
+        """
+        Yield lists of accessible, locked ticket ids, at most
+        ``bulk_update_chunk_size`` at a time (bounded IN lists)
+        """
+        size = self.bulk_update_chunk_size
+        queryset = queryset.select_for_update().order_by('pk')
+        if requested is None:
+            ids = list(queryset.values_list('pk', flat=True))
+            for start in range(0, len(ids), size):
+                yield ids[start:start + size]
+            return
+        for start in range(0, len(requested), size):
+            yield list(
+                queryset.filter(pk__in=requested[start:start + size])
+                .values_list('pk', flat=True)
+            )
+
+
+class TicketListAsyncView(TicketViewMixin, AsyncGenericAPIView):
+    """
+    Async ticket list (see ticketing_system.async_views), routed in place of
+    TicketViewSet.list when ASYNC_VIEWS is on.
+    """
+    action = 'list'
+
+    async def get(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        if conditional.is_conditional(request):
+            rows = self.paginator.set_page([row async for row in self.get_validator_queryset(queryset)])
+            response = conditional.not_modified(request, *self.get_validators(rows))
+            if response is not None:
+                return response
+
+        page = await self.apaginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        return conditional.set_validators(response, *self.get_validators(page))
+
+
+class TicketDetailAsyncView(TicketViewMixin, AsyncGenericAPIView):
+    """Async ticket retrieve, routed in place of TicketViewSet.retrieve when ASYNC_VIEWS is on"""
+    action = 'retrieve'
+
+    async def get(self, request, *args, **kwargs):
+        key = self.get_cache_key()
+        entry = self.get_cached_ticket(await cache.tickets.aget(key)) if key is not None else None
+        if entry is None:
+            if conditional.is_conditional(request):
+                queryset = await self.afilter_queryset(self.get_queryset())
+                rows = [row async for row in self.get_validator_queryset(queryset)]
+                response = conditional.not_modified(request, *self.get_validators(rows)) if rows else None
+                if response is not None:
+                    return response
+
+            with primary_reads():
+                entry = self.make_cache_entry(await self.aget_object())
+            if key is not None:
+                await cache.tickets.aset(key, entry)
+        return self.get_ticket_response(entry)
+
+    async def aget_object(self):
+        try:
+            return await super().aget_object()
+        except Http404:
+            try:
+                archived = await self.get_archived_queryset().afirst()
+            except (TypeError, ValueError, ValidationError):
+                raise Http404
+            return self.get_archived_object(archived)